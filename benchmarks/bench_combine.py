@@ -0,0 +1,30 @@
+'''Benchmarks of Combiner.build with 2 to 100 inputs.'''
+import sox
+
+from .common import output_file
+from .common import synthetic_file
+
+
+class CombinerBuild(object):
+    params = [[2, 10, 100], ['concatenate', 'mix', 'merge']]
+    param_names = ['n_inputs', 'combine_type']
+    timeout = 300
+
+    def setup(self, n_inputs, combine_type):
+        self.cbn = sox.Combiner()
+        self.input_filepath_list = [
+            synthetic_file(1, 1, seed=seed) for seed in range(n_inputs)
+        ]
+        self.output_filepath = output_file('combine.wav')
+
+    def time_build(self, n_inputs, combine_type):
+        self.cbn.build(
+            self.input_filepath_list, self.output_filepath, combine_type
+        )
+
+    def time_build_cold_file_info(self, n_inputs, combine_type):
+        # Combiner.build validates every input with file_info
+        sox.file_info.clear_cache()
+        self.cbn.build(
+            self.input_filepath_list, self.output_filepath, combine_type
+        )
@@ -0,0 +1,93 @@
+'''Benchmarks of the file_info accessors and of stat / stats.'''
+import sox
+from sox import file_info
+from sox import transform
+
+from .common import DURATIONS
+from .common import N_CHANNELS
+from .common import SAMPLE_RATE
+from .common import synthetic_array
+from .common import synthetic_file
+
+ACCESSORS = [
+    'bitdepth', 'bitrate', 'channels', 'comments', 'duration', 'encoding',
+    'file_type', 'num_samples', 'sample_rate', 'silent', 'info', 'stat'
+]
+
+# wav and flac headers are read in Python, au files with SoXI
+FILE_TYPES = ['wav', 'flac', 'au']
+
+
+class FileInfo(object):
+    params = [ACCESSORS, FILE_TYPES]
+    param_names = ['accessor', 'file_type']
+
+    def setup(self, accessor, file_type):
+        self.input_filepath = synthetic_file(10, 2, file_type)
+        self.accessor = getattr(file_info, accessor)
+
+    def time_cold(self, accessor, file_type):
+        file_info.clear_cache()
+        self.accessor(self.input_filepath)
+
+    def time_cached(self, accessor, file_type):
+        self.accessor(self.input_filepath)
+
+
+class FileInfoNoSilent(object):
+    params = [FILE_TYPES]
+    param_names = ['file_type']
+
+    def setup(self, file_type):
+        self.input_filepath = synthetic_file(10, 2, file_type)
+
+    def time_info(self, file_type):
+        file_info.clear_cache()
+        file_info.info(self.input_filepath, include_silent=False)
+
+
+class Stat(object):
+    params = [DURATIONS, N_CHANNELS]
+    param_names = ['duration', 'n_channels']
+    timeout = 300
+
+    def setup(self, duration, n_channels):
+        self.tfm = sox.Transformer()
+        self.input_filepath = synthetic_file(duration, n_channels)
+        self.input_array = synthetic_array(duration, n_channels)
+
+    def time_file_info_stat(self, duration, n_channels):
+        file_info.stat(self.input_filepath)
+
+    def time_transformer_stat(self, duration, n_channels):
+        self.tfm.stat(self.input_filepath)
+
+    def time_transformer_stat_array(self, duration, n_channels):
+        self.tfm.stat(
+            input_array=self.input_array, sample_rate_in=SAMPLE_RATE
+        )
+
+    def time_transformer_stats(self, duration, n_channels):
+        self.tfm.stats(self.input_filepath)
+
+
+class StatParsing(object):
+    '''Parsing of captured stat and stats output, without running SoX.'''
+
+    def setup(self):
+        input_filepath = synthetic_file(1, 1)
+        self.soxi_output = sox.core.soxi(input_filepath, None)
+        self.stat_output = file_info._stat_call(input_filepath)
+        _, _, self.stats_output = sox.Transformer().build(
+            input_filepath, '-n', extra_args=['channels', '1', 'stats'],
+            return_output=True
+        )
+
+    def time_parse_stat(self):
+        file_info._parse_stat(self.stat_output)
+
+    def time_parse_stats(self):
+        transform._parse_stats(self.stats_output)
+
+    def time_parse_soxi_info(self):
+        file_info._parse_soxi_info(self.soxi_output)
@@ -0,0 +1,91 @@
+'''Benchmarks of Transformer.build for every combination of file and array
+input and output.
+'''
+import numpy as np
+
+import sox
+
+from .common import DURATIONS
+from .common import N_CHANNELS
+from .common import SAMPLE_RATE
+from .common import output_file
+from .common import synthetic_array
+from .common import synthetic_file
+
+IO_MODES = ['file_to_file', 'file_to_array', 'array_to_array', 'array_to_file']
+
+
+def _transformer():
+    tfm = sox.Transformer()
+    tfm.highpass(80.0)
+    tfm.gain(-3.0, normalize=False)
+    return tfm
+
+
+class TransformerBuild(object):
+    params = [IO_MODES, DURATIONS, N_CHANNELS]
+    param_names = ['io', 'duration', 'n_channels']
+    timeout = 300
+
+    def setup(self, io, duration, n_channels):
+        self.tfm = _transformer()
+        self.input_filepath = synthetic_file(duration, n_channels)
+        self.input_array = synthetic_array(duration, n_channels)
+        self.output_filepath = output_file('transform.wav')
+
+    def time_build(self, io, duration, n_channels):
+        if io == 'file_to_file':
+            self.tfm.build(self.input_filepath, self.output_filepath)
+        elif io == 'file_to_array':
+            self.tfm.build(self.input_filepath)
+        elif io == 'array_to_array':
+            self.tfm.build(
+                input_array=self.input_array, sample_rate_in=SAMPLE_RATE
+            )
+        else:
+            self.tfm.build(
+                input_array=self.input_array, sample_rate_in=SAMPLE_RATE,
+                output_filepath=self.output_filepath
+            )
+
+
+class TransformerBuildOut(object):
+    '''Array output into a preallocated buffer, against a fresh array.'''
+    params = [DURATIONS, N_CHANNELS]
+    param_names = ['duration', 'n_channels']
+
+    def setup(self, duration, n_channels):
+        self.tfm = _transformer()
+        self.input_array = synthetic_array(duration, n_channels)
+        self.out = np.empty_like(self.input_array)
+
+    def time_build_out(self, duration, n_channels):
+        self.tfm.build(
+            input_array=self.input_array, sample_rate_in=SAMPLE_RATE,
+            out=self.out
+        )
+
+
+class TransformerBuildEngine(object):
+    '''Array to array builds of a linear chain with each engine.'''
+    params = [['sox', 'numpy'], DURATIONS, N_CHANNELS]
+    param_names = ['engine', 'duration', 'n_channels']
+
+    def setup(self, engine, duration, n_channels):
+        self.tfm = sox.Transformer()
+        self.tfm.vol(0.5)
+        self.tfm.dcshift(0.01)
+        self.input_array = synthetic_array(duration, n_channels)
+
+    def time_build(self, engine, duration, n_channels):
+        self.tfm.build(
+            input_array=self.input_array, sample_rate_in=SAMPLE_RATE,
+            engine=engine
+        )
+
+
+class TransformerBuildOverhead(TransformerBuild):
+    '''Builds of very short inputs, dominated by argument building and
+    process startup.
+    '''
+    params = [IO_MODES, [0.01], [1]]
@@ -0,0 +1,71 @@
+'''Synthetic inputs shared by the benchmarks.
+
+Inputs are generated deterministically on first use and kept in a
+directory under the system's temporary directory, so that repeated
+benchmark runs (and the separate processes asv starts for each benchmark)
+do not pay for generating them again.
+'''
+import os
+import tempfile
+import wave
+
+import numpy as np
+
+from sox import core
+
+SAMPLE_RATE = 44100
+
+# input durations in seconds, and channel counts
+DURATIONS = [1, 10, 60]
+N_CHANNELS = [1, 2, 6]
+
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'pysox-benchmarks')
+
+
+def synthetic_array(duration, n_channels, dtype=np.float32, seed=0):
+    '''A harmonic tone per channel plus a little noise, with shape
+    (n_samples, n_channels).
+    '''
+    rng = np.random.RandomState(seed)
+    n_samples = int(duration * SAMPLE_RATE)
+    time = np.arange(n_samples) / float(SAMPLE_RATE)
+    frequencies = 220.0 * (1 + np.arange(n_channels))
+    array = 0.5 * np.sin(2 * np.pi * time[:, np.newaxis] * frequencies)
+    array += 0.01 * rng.standard_normal((n_samples, n_channels))
+    return array.astype(dtype)
+
+
+def synthetic_file(duration, n_channels, file_type='wav', seed=0):
+    '''Path to a 16 bit audio file holding synthetic_array, creating it if
+    it does not exist yet. Formats other than wav are converted with SoX.
+    '''
+    filepath = os.path.join(DATA_DIR, 'input_{}s_{}ch_{}.{}'.format(
+        duration, n_channels, seed, file_type
+    ))
+    if os.path.exists(filepath):
+        return filepath
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp_filepath = '{}.{}.tmp.{}'.format(filepath, os.getpid(), file_type)
+    if file_type == 'wav':
+        array = synthetic_array(duration, n_channels, seed=seed)
+        wav = wave.open(tmp_filepath, 'wb')
+        wav.setnchannels(n_channels)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((array * 32767).astype('<i2').tobytes())
+        wav.close()
+    else:
+        status, _, err = core.sox([
+            synthetic_file(duration, n_channels, seed=seed), tmp_filepath
+        ])
+        if status != 0:
+            raise core.SoxError(err)
+    os.rename(tmp_filepath, filepath)
+    return filepath
+
+
+def output_file(name):
+    '''Path for an output file of the current process.'''
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, 'output_{}_{}'.format(os.getpid(), name))
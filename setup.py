@@ -19,6 +19,7 @@ if __name__ == "__main__":
         long_description="""Python wrapper around SoX.""",
         keywords='audio effects SoX',
         license='BSD-3-Clause',
+        python_requires='>=3.7',
         install_requires=[
             'numpy >= 1.9.0',
         ],
@@ -1,26 +1,22 @@
 #!/usr/bin/env python
 """ init method for sox module """
 from .log import logger
-import os
-
-# Check that SoX is installed and callable
-NO_SOX = False
-stream_handler = os.popen('sox -h')
-if not len(stream_handler.readlines()):
-    logger.warning("""SoX could not be found!
-
-    If you do not have SoX, proceed here:
-     - - - http://sox.sourceforge.net/ - - -
-
-    If you do (or think that you should) have SoX, double-check your
-    path variables.
-    """)
-    NO_SOX = True
-stream_handler.close()
 
 from . import file_info
+from . import array_stat
+from . import core
+from . import metrics
 from .combine import Combiner
 from .transform import Transformer
 from .core import SoxError
 from .core import SoxiError
 from .version import version as __version__
+
+
+def __getattr__(name):
+    # SoX is looked up lazily so that importing sox starts no subprocess.
+    if name == 'NO_SOX':
+        return core._no_sox()
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name)
+    )
@@ -0,0 +1,846 @@
+'''In-process NumPy implementation of a subset of SoX's effects.
+
+Chains made only of the supported effects can be applied to arrays without
+starting a SoX process. Samples are processed like SoX does: converted to
+32 bit integer samples, rounded and clipped after each effect, and
+converted back to the output data type, so the results agree with SoX up to
+rounding.
+
+Batches of equally long clips, of shape (n_clips, n_samples, n_channels),
+are processed in a single call.
+'''
+import functools
+import re
+
+import numpy as np
+
+from .core import sox
+from .effect import Effect
+
+SOX_SAMPLE_MAX = 2147483647.0
+SOX_SAMPLE_MIN = -2147483648.0
+
+BIQUAD_EFFECTS = [
+    'allpass', 'bandpass', 'bandreject', 'bass', 'biquad', 'equalizer',
+    'highpass', 'lowpass', 'treble'
+]
+
+FIR_EFFECTS = ['fir', 'sinc']
+
+SUPPORTED_EFFECTS = [
+    'channels', 'dcshift', 'fade', 'gain', 'pad', 'remix', 'repeat',
+    'reverse', 'swap', 'trim', 'vol'
+] + BIQUAD_EFFECTS + FIR_EFFECTS
+
+SUPPORTED_DTYPES = [
+    np.int8, np.int16, np.int32, np.uint8, np.uint16, np.uint32, np.float32,
+    np.float64
+]
+
+FADE_SHAPES = ['q', 'h', 't', 'l', 'p']
+
+WIDTH_TYPES = ['q', 's', 'h', 'k', 'o']
+
+# number of samples per block in sosfilt
+BLOCK_SIZE = 128
+
+# FFT length used by fftfilt for filters shorter than half of it
+FFT_SIZE = 8192
+
+
+def parse_effects(effects):
+    '''Split a flat list of SoX effect arguments, as stored in
+    Transformer.effects, into effects and their parameters.
+
+    Parameters
+    ----------
+    effects : list of str or list of Effect
+        SoX effect arguments, or effect records as stored in
+        Transformer.effect_chain.
+
+    Returns
+    -------
+    parsed : list of tuples
+        One (name, parameters) pair per effect.
+
+    Raises
+    ------
+    ValueError
+        If the list contains an effect, or effect arguments, which are not
+        supported.
+
+    '''
+    if any(isinstance(effect, Effect) for effect in effects):
+        effects = [
+            arg for effect in effects for arg in (
+                effect.args if isinstance(effect, Effect) else [effect]
+            )
+        ]
+
+    groups = []
+    for arg in effects:
+        if arg in SUPPORTED_EFFECTS:
+            groups.append((arg, []))
+        elif not groups:
+            raise ValueError("Unsupported effect '{}'".format(arg))
+        else:
+            groups[-1][1].append(arg)
+
+    parsed = []
+    for name, args in groups:
+        try:
+            parsed.append((name, _PARSERS[name](args)))
+        except (ValueError, IndexError):
+            raise ValueError(
+                "Unsupported arguments for {}: {}".format(name, ' '.join(args))
+            )
+    return parsed
+
+
+def apply_effects(input_array, sample_rate, effects, channels_out=None,
+                  dtype_out=None):
+    '''Apply a chain of supported SoX effects to an array.
+
+    Parameters
+    ----------
+    input_array : np.ndarray
+        Audio of shape (n_samples, n_channels), or (n_samples, ) for mono,
+        or a batch of clips of shape (n_clips, n_samples, n_channels).
+    sample_rate : float
+        Sample rate of input_array.
+    effects : list of str or list of Effect
+        SoX effect arguments, as stored in Transformer.effects, or effect
+        records, as stored in Transformer.effect_chain.
+    channels_out : int or None, default=None
+        Number of output channels. If it differs from the number of channels
+        at the end of the chain, they are mixed or duplicated as SoX's
+        channels effect does. If None, it is left unchanged.
+    dtype_out : type or None, default=None
+        Output data type, one of SUPPORTED_DTYPES. If None, the dtype of
+        input_array is used.
+
+    Returns
+    -------
+    output_array : np.ndarray
+        Processed audio of shape (n_samples, n_channels), or (n_samples, )
+        if there is one output channel. Batches keep the shape
+        (n_clips, n_samples, n_channels).
+
+    '''
+    if not isinstance(input_array, np.ndarray):
+        raise TypeError("input_array must be a numpy array")
+    if input_array.ndim not in [1, 2, 3]:
+        raise ValueError("input_array must have 1, 2 or 3 dimensions")
+    if input_array.dtype.type not in SUPPORTED_DTYPES:
+        raise ValueError(
+            "input_array has unsupported dtype {}".format(input_array.dtype)
+        )
+    if dtype_out is None:
+        dtype_out = input_array.dtype.type
+    if dtype_out not in SUPPORTED_DTYPES:
+        raise ValueError("unsupported dtype_out {}".format(dtype_out))
+
+    samples = _to_samples(input_array)
+    for name, params in parse_effects(effects):
+        samples = _EFFECTS[name](samples, sample_rate, *params)
+
+    if channels_out is not None and channels_out != samples.shape[2]:
+        samples = _channels(samples, sample_rate, channels_out)
+
+    output_array = _from_samples(samples, dtype_out)
+    if input_array.ndim == 3:
+        return output_array
+    if output_array.shape[2] == 1:
+        return output_array[0, :, 0]
+    return output_array[0]
+
+
+def biquad_sections(effects, sample_rate):
+    '''Coefficients of the biquad filters SoX uses for a chain of EQ-type
+    effects (see BIQUAD_EFFECTS).
+
+    Parameters
+    ----------
+    effects : list of str
+        SoX effect arguments, as stored in Transformer.effects.
+    sample_rate : float
+        Sample rate of the audio.
+
+    Returns
+    -------
+    sos : np.ndarray
+        Array of shape (n_sections, 6) with one row [b0, b1, b2, 1, a1, a2]
+        per filter, normalized by a0.
+
+    '''
+    sos = []
+    for name, params in parse_effects(effects):
+        if name not in BIQUAD_EFFECTS:
+            raise ValueError("{} is not a biquad filter".format(name))
+        sos.append(_biquad_coefficients(name, params, sample_rate))
+    return np.array(sos).reshape(-1, 6)
+
+
+def fir_coefficients(effects, sample_rate):
+    '''Coefficients of the FIR filters SoX uses for a chain of fir and sinc
+    effects (see FIR_EFFECTS).
+
+    The sinc filters are designed by SoX itself, so that they are exactly
+    the ones it would apply; each design is computed once and memoized.
+
+    Parameters
+    ----------
+    effects : list of str
+        SoX effect arguments, as stored in Transformer.effects.
+    sample_rate : float
+        Sample rate of the audio.
+
+    Returns
+    -------
+    coefficients : list of np.ndarray
+        One array of filter taps per effect.
+
+    '''
+    coefficients = []
+    for name, params in parse_effects(effects):
+        if name not in FIR_EFFECTS:
+            raise ValueError("{} is not an FIR filter".format(name))
+        if name == 'sinc':
+            coefficients.append(_sinc_design(params[0], float(sample_rate)))
+        else:
+            coefficients.append(params[0])
+    return coefficients
+
+
+def fftfilt(h, x):
+    '''Filter along the first axis with an FIR filter, starting from a zero
+    state, using FFT overlap-add convolution.
+
+    The signal is cut into blocks which are transformed, multiplied by the
+    filter's spectrum and transformed back all at once; the tail of each
+    block's response is added to the next one. All trailing axes (channels,
+    clips) are filtered at once.
+
+    Parameters
+    ----------
+    h : array_like
+        Filter taps.
+    x : np.ndarray
+        Signal of shape (n_samples, ...).
+
+    Returns
+    -------
+    y : np.ndarray
+        Filtered float64 signal with the same shape as x.
+
+    '''
+    h = np.asarray(h, dtype=np.float64)
+    if h.ndim != 1 or len(h) == 0:
+        raise ValueError("h must be a non-empty 1 dimensional array")
+
+    x = np.asarray(x, dtype=np.float64)
+    shape = x.shape
+    n_samples, n_taps = len(x), len(h)
+    x = x.reshape(n_samples, int(np.prod(shape[1:])))
+    if n_samples == 0:
+        return x.copy().reshape(shape)
+
+    # blocks must be at least as long as a response's tail
+    n_fft = 1 << int(np.ceil(np.log2(
+        max(2 * n_taps, min(FFT_SIZE, n_samples + n_taps - 1))
+    )))
+    size = n_fft - n_taps + 1
+    n_blocks = -(-n_samples // size)
+    x = np.concatenate(
+        [x, np.zeros((n_blocks * size - n_samples, x.shape[1]))]
+    )
+
+    spectra = np.fft.rfft(
+        x.reshape(n_blocks, size, -1), n=n_fft, axis=1
+    )
+    spectra *= np.fft.rfft(h, n=n_fft)[:, np.newaxis]
+    responses = np.fft.irfft(spectra, n=n_fft, axis=1)
+
+    y = responses[:, :size].copy()
+    y[1:, :n_taps - 1] += responses[:-1, size:]
+    return y.reshape(-1, x.shape[1])[:n_samples].reshape(shape)
+
+
+def sosfilt(sos, x):
+    '''Filter along the first axis with cascaded second-order sections,
+    starting from a zero state.
+
+    The recursion is evaluated in blocks: the response of each block to its
+    input is one matrix product with the section's impulse response, and
+    only the two-sample state is carried from block to block. All trailing
+    axes (channels, clips) are filtered at once.
+
+    Parameters
+    ----------
+    sos : array_like
+        Array of shape (n_sections, 6), with rows [b0, b1, b2, a0, a1, a2].
+    x : np.ndarray
+        Signal of shape (n_samples, ...).
+
+    Returns
+    -------
+    y : np.ndarray
+        Filtered float64 signal with the same shape as x.
+
+    '''
+    sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+    if sos.ndim != 2 or sos.shape[1] != 6:
+        raise ValueError("sos must have shape (n_sections, 6)")
+    if np.any(sos[:, 3] == 0):
+        raise ValueError("a0 must be nonzero")
+
+    x = np.asarray(x, dtype=np.float64)
+    shape = x.shape
+    y = x.reshape(len(x), int(np.prod(shape[1:])))
+    for section in sos:
+        b, a = section[:3] / section[3], section[4:] / section[3]
+        y = _filter_section(b, a, y)
+    return y.reshape(shape)
+
+
+def _filter_section(b, a, x):
+    '''One biquad section applied to x of shape (n_samples, n_signals).'''
+    n_samples, n_signals = x.shape
+    if n_samples == 0:
+        return x.copy()
+
+    # moving-average part, with zero initial state
+    w = b[0] * x
+    w[1:] += b[1] * x[:-1]
+    w[2:] += b[2] * x[:-2]
+
+    # impulse response g of 1 / (1 + a1 z^-1 + a2 z^-2) and the responses
+    # h to a unit y[-1] and y[-2], all over one block
+    size = BLOCK_SIZE
+    resp = np.zeros((size + 2, 3))
+    resp[0, 2] = resp[1, 1] = 1.0
+    for k in range(2, size + 2):
+        resp[k] = -a[0] * resp[k - 1] - a[1] * resp[k - 2]
+        resp[k, 0] += k == 2
+    g, h = resp[2:, 0], resp[2:, 1:]
+    lag = np.arange(size)[:, np.newaxis] - np.arange(size)[np.newaxis, :]
+    toeplitz = np.where(lag >= 0, g[np.maximum(lag, 0)], 0.0)
+
+    n_blocks = -(-n_samples // size)
+    w = np.concatenate([w, np.zeros((n_blocks * size - n_samples, n_signals))])
+    # zero-state response of every block
+    z = toeplitz.dot(
+        w.reshape(n_blocks, size, n_signals).transpose(1, 0, 2).reshape(
+            size, -1
+        )
+    ).reshape(size, n_blocks, n_signals)
+
+    # carry the state (y[-1], y[-2]) from block to block
+    state = np.zeros((n_blocks, 2, n_signals))
+    h_end = h[[-1, -2]]
+    for i in range(1, n_blocks):
+        state[i] = z[[-1, -2], i - 1] + h_end.dot(state[i - 1])
+
+    y = z + np.einsum('kj,bjs->kbs', h, state)
+    return y.transpose(1, 0, 2).reshape(-1, n_signals)[:n_samples]
+
+
+def _biquad_coefficients(name, params, sample_rate):
+    '''Coefficients [b0, b1, b2, 1, a1, a2] of a biquad effect, computed as
+    in SoX's biquads.c.
+    '''
+    if name == 'biquad':
+        b0, b1, b2, a0, a1, a2 = params
+        return np.array([b0, b1, b2, a0, a1, a2]) / a0
+
+    n_poles, frequency, width, width_type, gain_db, constant_skirt = params
+    w0 = 2 * np.pi * frequency / sample_rate
+    if w0 > np.pi:
+        raise ValueError(
+            "frequency must be less than half the sample-rate (Nyquist rate)"
+        )
+    amp = np.exp(gain_db / 40.0 * np.log(10.0))
+    cos_w0 = np.cos(w0)
+
+    if width_type == 's':
+        alpha = np.sin(w0) / 2 * np.sqrt(
+            (amp + 1 / amp) * (1 / width - 1) + 2
+        )
+    elif width_type == 'q':
+        alpha = np.sin(w0) / (2 * width)
+    elif width_type == 'o':
+        alpha = np.sin(w0) * np.sinh(
+            np.log(2.0) / 2 * width * w0 / np.sin(w0)
+        )
+    else:
+        if width_type == 'k':
+            width = width * 1000.0
+        alpha = np.sin(w0) / (2 * frequency / width)
+
+    if name in ['lowpass', 'highpass'] and n_poles == 1:
+        a1 = -np.exp(-w0)
+        if name == 'lowpass':
+            return np.array([1 + a1, 0, 0, 1, a1, 0])
+        b0 = (1 - a1) / 2
+        return np.array([b0, -b0, 0, 1, a1, 0])
+
+    if name == 'lowpass':
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif name == 'highpass':
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif name == 'bandpass' and constant_skirt:
+        b = [np.sin(w0) / 2, 0, -np.sin(w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif name == 'bandpass':
+        b = [alpha, 0, -alpha]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif name == 'bandreject':
+        b = [1, -2 * cos_w0, 1]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif name == 'allpass':
+        b = [1 - alpha, -2 * cos_w0, 1 + alpha]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif name == 'equalizer':
+        b = [1 + alpha * amp, -2 * cos_w0, 1 - alpha * amp]
+        a = [1 + alpha / amp, -2 * cos_w0, 1 - alpha / amp]
+    elif name == 'bass':
+        sqrt_alpha = 2 * np.sqrt(amp) * alpha
+        b = [
+            amp * ((amp + 1) - (amp - 1) * cos_w0 + sqrt_alpha),
+            2 * amp * ((amp - 1) - (amp + 1) * cos_w0),
+            amp * ((amp + 1) - (amp - 1) * cos_w0 - sqrt_alpha)
+        ]
+        a = [
+            (amp + 1) + (amp - 1) * cos_w0 + sqrt_alpha,
+            -2 * ((amp - 1) + (amp + 1) * cos_w0),
+            (amp + 1) + (amp - 1) * cos_w0 - sqrt_alpha
+        ]
+    else:
+        sqrt_alpha = 2 * np.sqrt(amp) * alpha
+        b = [
+            amp * ((amp + 1) + (amp - 1) * cos_w0 + sqrt_alpha),
+            -2 * amp * ((amp - 1) + (amp + 1) * cos_w0),
+            amp * ((amp + 1) + (amp - 1) * cos_w0 - sqrt_alpha)
+        ]
+        a = [
+            (amp + 1) - (amp - 1) * cos_w0 + sqrt_alpha,
+            2 * ((amp - 1) - (amp + 1) * cos_w0),
+            (amp + 1) - (amp - 1) * cos_w0 - sqrt_alpha
+        ]
+    return np.array(b + a) / a[0]
+
+
+@functools.lru_cache(maxsize=64)
+def _sinc_design(args, sample_rate):
+    '''Taps of the filter of SoX's sinc effect with the given arguments,
+    read from the Octave script printed by SoX's --plot option.
+    '''
+    status, out, err = sox(
+        ['sox', '--plot', 'octave', '-r', '{:f}'.format(sample_rate), '-n',
+         '-n', 'sinc'] + list(args)
+    )
+    match = re.search(r'b=\[(.*?)\];', out or '', re.DOTALL)
+    if match is None:
+        raise ValueError("SoX could not design the sinc filter: {}".format(
+            err
+        ))
+    coefficients = np.array(match.group(1).split(), dtype=np.float64)
+    coefficients.setflags(write=False)
+    return coefficients
+
+
+def _to_samples(input_array):
+    '''Convert an array to SoX's internal representation: 32 bit integer
+    samples, stored as float64 with shape (n_clips, n_samples, n_channels).
+    '''
+    if input_array.ndim == 1:
+        input_array = input_array[np.newaxis, :, np.newaxis]
+    elif input_array.ndim == 2:
+        input_array = input_array[np.newaxis]
+    if input_array.dtype.kind == 'f':
+        return _round_clip(input_array * (SOX_SAMPLE_MAX + 1.0))
+    n_bits = input_array.dtype.itemsize * 8
+    samples = input_array.astype(np.float64)
+    if input_array.dtype.kind == 'u':
+        samples -= 2.0 ** (n_bits - 1)
+    return samples * 2.0 ** (32 - n_bits)
+
+
+def _from_samples(samples, dtype_out):
+    '''Convert 32 bit integer samples to dtype_out as SoX writes them.
+    '''
+    if np.dtype(dtype_out).kind == 'f':
+        output_array = (samples / (SOX_SAMPLE_MAX + 1.0)).astype(dtype_out)
+    else:
+        n_bits = np.dtype(dtype_out).itemsize * 8
+        half_step = 2.0 ** (31 - n_bits)
+        output_array = np.floor((samples + half_step) / (2 * half_step))
+        output_array = np.minimum(output_array, 2.0 ** (n_bits - 1) - 1)
+        if np.dtype(dtype_out).kind == 'u':
+            output_array += 2.0 ** (n_bits - 1)
+        output_array = output_array.astype(dtype_out)
+    return np.ascontiguousarray(output_array)
+
+
+def _round_clip(samples):
+    '''Round half away from zero and clip to the 32 bit sample range, like
+    SOX_ROUND_CLIP_COUNT.
+    '''
+    return np.clip(
+        np.trunc(samples + np.copysign(0.5, samples)),
+        SOX_SAMPLE_MIN, SOX_SAMPLE_MAX
+    )
+
+
+def _n_samples(seconds, sample_rate):
+    '''Convert a time in seconds to a number of samples, like SoX parses
+    time arguments.
+    '''
+    return int(seconds * sample_rate + 0.5)
+
+
+def _parse_biquad(args):
+    params = [float(arg) for arg in args]
+    if len(params) != 6 or params[3] == 0:
+        raise ValueError
+    return params
+
+
+def _parse_filter(n_args, default_width_type, gain_first=False):
+    '''Parser for filters with arguments [-c|-1|-2] frequency width[type]
+    and optionally a gain before (bass, treble) or after (equalizer) them.
+    '''
+    def parse(args):
+        n_poles = 2
+        constant_skirt = False
+        if args and args[0] in ['-1', '-2']:
+            n_poles = int(args[0][1])
+            args = args[1:]
+        elif args and args[0] == '-c':
+            constant_skirt = True
+            args = args[1:]
+        if len(args) != n_args and not (n_poles == 1 and len(args) == 1):
+            raise ValueError
+
+        gain_db = 0.0
+        if n_args == 3 and gain_first:
+            gain_db, args = float(args[0]), args[1:]
+        elif n_args == 3:
+            gain_db, args = float(args[2]), args[:2]
+
+        frequency = float(args[0])
+        width, width_type = 0.707, 'q'
+        if len(args) > 1:
+            width, width_type = args[1], default_width_type
+            if width[-1] in WIDTH_TYPES:
+                width, width_type = width[:-1], width[-1]
+            width = float(width)
+        if frequency <= 0 or width <= 0:
+            raise ValueError
+        return [n_poles, frequency, width, width_type, gain_db,
+                constant_skirt]
+    return parse
+
+
+def _parse_fir(args):
+    '''fir coefficients, or fir with the name of a file of coefficients
+    separated by whitespace, with # comments, as SoX reads it. Coefficients
+    which Transformer.fir passes in a file are taken from its argument.
+    '''
+    if len(args) == 1 and hasattr(args[0], 'coefficients'):
+        return [np.array(args[0].coefficients)]
+    if len(args) == 1:
+        try:
+            float(args[0])
+        except ValueError:
+            try:
+                with open(args[0]) as fhandle:
+                    lines = fhandle.readlines()
+            except (IOError, OSError):
+                raise ValueError
+            args = ' '.join(line.split('#')[0] for line in lines).split()
+    if not args:
+        raise ValueError
+    return [np.array([float(arg) for arg in args])]
+
+
+def _parse_sinc(args):
+    '''The arguments are passed to SoX to design the filter; only linear
+    phase filters, whose delay is known, are supported.
+    '''
+    for flag, value in zip(args[:-1], args[1:]):
+        if flag == '-p' and float(value) != 50:
+            raise ValueError
+    if any(arg in ['-M', '-I'] for arg in args):
+        raise ValueError
+    return [tuple(args)]
+
+
+def _parse_channels(args):
+    n_channels = int(args[0])
+    if len(args) != 1 or n_channels <= 0:
+        raise ValueError
+    return [n_channels]
+
+
+def _parse_dcshift(args):
+    if len(args) != 1:
+        raise ValueError
+    return [float(args[0])]
+
+
+def _parse_fade(args):
+    if len(args) != 2 or args[0] not in FADE_SHAPES:
+        raise ValueError
+    return [args[0], float(args[1])]
+
+
+def _parse_gain(args):
+    flags = args[:-1]
+    if any(flag not in ['-e', '-n'] for flag in flags):
+        raise ValueError
+    return [float(args[-1]), '-n' in flags, '-e' in flags]
+
+
+def _parse_pad(args):
+    if len(args) != 2:
+        raise ValueError
+    return [float(args[0]), float(args[1])]
+
+
+def _parse_remix(args):
+    if args == ['-']:
+        return [None]
+    if not args:
+        raise ValueError
+    out_specs = []
+    for spec in args:
+        in_channels = [int(channel) for channel in spec.split(',')]
+        if any(channel < 0 for channel in in_channels):
+            raise ValueError
+        out_specs.append([channel for channel in in_channels if channel])
+    return [out_specs]
+
+
+def _parse_repeat(args):
+    count = int(args[0])
+    if len(args) != 1 or count < 0:
+        raise ValueError
+    return [count]
+
+
+def _parse_none(args):
+    if args:
+        raise ValueError
+    return []
+
+
+def _parse_trim(args):
+    if len(args) not in [1, 2]:
+        raise ValueError
+    return [float(arg) for arg in args]
+
+
+def _parse_vol(args):
+    if len(args) != 2:
+        # a limiter gain is not supported
+        raise ValueError
+    gain = float(args[0])
+    if args[1] == 'amplitude':
+        return [gain]
+    if args[1] == 'power':
+        return [np.sqrt(gain)]
+    if args[1] == 'dB':
+        return [10.0 ** (gain / 20.0)]
+    raise ValueError
+
+
+def _biquad_effect(name):
+    '''Effect function for one of BIQUAD_EFFECTS.'''
+    def effect(samples, sample_rate, *params):
+        sos = _biquad_coefficients(name, params, sample_rate)
+        filtered = sosfilt(sos, samples.transpose(1, 0, 2))
+        return _round_clip(filtered.transpose(1, 0, 2))
+    return effect
+
+
+def _fir(samples, sample_rate, coefficients):
+    '''Apply an FIR filter with SoX's alignment: the output has the length
+    of the input and is advanced by all but n_taps // 2 taps.
+    '''
+    n_taps = len(coefficients)
+    delay = n_taps - 1 - n_taps // 2
+    padded = np.pad(samples, ((0, 0), (0, delay), (0, 0)), mode='constant')
+    filtered = fftfilt(coefficients, padded.transpose(1, 0, 2))[delay:]
+    return _round_clip(filtered.transpose(1, 0, 2))
+
+
+def _sinc(samples, sample_rate, args):
+    return _fir(samples, sample_rate, _sinc_design(args, float(sample_rate)))
+
+
+def _channels(samples, sample_rate, n_channels):
+    '''Mix down by averaging every n_channels-th input channel, or duplicate
+    channels cyclically.
+    '''
+    channels_in = samples.shape[2]
+    if n_channels == channels_in:
+        return samples
+    if n_channels > channels_in:
+        return samples[:, :, np.arange(n_channels) % channels_in]
+    mixed = np.stack([
+        samples[:, :, i::n_channels].mean(axis=2) for i in range(n_channels)
+    ], axis=2)
+    return _round_clip(mixed)
+
+
+def _dcshift(samples, sample_rate, shift):
+    return _round_clip(samples + shift * (SOX_SAMPLE_MAX + 1.0))
+
+
+def _fade(samples, sample_rate, shape, fade_len):
+    '''Fade in over fade_len seconds.'''
+    n_fade = min(_n_samples(fade_len, sample_rate), samples.shape[1])
+    if n_fade == 0:
+        return samples
+    position = np.arange(n_fade) / float(_n_samples(fade_len, sample_rate))
+    if shape == 't':
+        fade_gain = position
+    elif shape == 'q':
+        fade_gain = np.sin(position * np.pi / 2)
+    elif shape == 'h':
+        fade_gain = (1 - np.cos(position * np.pi)) / 2
+    elif shape == 'l':
+        fade_gain = np.power(0.1, (1 - position) * 5)
+    else:
+        fade_gain = 1 - (1 - position) * (1 - position)
+    samples = samples.copy()
+    samples[:, :n_fade] = np.trunc(
+        samples[:, :n_fade] * fade_gain[:, np.newaxis]
+    )
+    return samples
+
+
+def _gain(samples, sample_rate, gain_db, normalize, equalize):
+    '''gain [-e] [-n] gain_db'''
+    mult = 10.0 ** (gain_db / 20.0)
+    if (normalize or equalize) and samples.size > 0:
+        peaks = np.maximum(
+            samples.max(axis=1, keepdims=True),
+            -samples.min(axis=1, keepdims=True)
+        )
+        if not equalize:
+            peaks = np.broadcast_to(
+                peaks.max(axis=2, keepdims=True), peaks.shape
+            )
+        if normalize:
+            target = SOX_SAMPLE_MAX
+        else:
+            target = peaks.max(axis=2, keepdims=True)
+        mult = mult * np.where(
+            peaks > 0, target / np.maximum(peaks, 1.0), 1.0
+        )
+    return _round_clip(samples * mult)
+
+
+def _pad(samples, sample_rate, start_duration, end_duration):
+    return np.pad(
+        samples,
+        ((0, 0),
+         (_n_samples(start_duration, sample_rate),
+          _n_samples(end_duration, sample_rate)),
+         (0, 0)),
+        mode='constant'
+    )
+
+
+def _remix(samples, sample_rate, out_specs):
+    '''Each output channel is the average of the listed (1-indexed) input
+    channels, as in remix's default automatic mode.
+    '''
+    if out_specs is None:
+        return _round_clip(samples.mean(axis=2, keepdims=True))
+    if any(channel > samples.shape[2] for spec in out_specs
+           for channel in spec):
+        raise ValueError("remix refers to a channel which does not exist")
+    remixed = np.zeros(samples.shape[:2] + (len(out_specs), ))
+    for i, spec in enumerate(out_specs):
+        if spec:
+            remixed[:, :, i] = samples[:, :, [c - 1 for c in spec]].mean(
+                axis=2
+            )
+    return _round_clip(remixed)
+
+
+def _repeat(samples, sample_rate, count):
+    return np.tile(samples, (1, count + 1, 1))
+
+
+def _reverse(samples, sample_rate):
+    return samples[:, ::-1]
+
+
+def _swap(samples, sample_rate):
+    '''Swap pairs of channels; an odd last channel is left in place.'''
+    order = np.arange(samples.shape[2])
+    n_pairs = samples.shape[2] // 2
+    order[:2 * n_pairs] = order[:2 * n_pairs].reshape(-1, 2)[:, ::-1].ravel()
+    return samples[:, :, order]
+
+
+def _trim(samples, sample_rate, start_time, duration=None):
+    start = _n_samples(start_time, sample_rate)
+    if duration is None:
+        return samples[:, start:]
+    return samples[:, start:start + _n_samples(duration, sample_rate)]
+
+
+def _vol(samples, sample_rate, gain):
+    return _round_clip(samples * gain)
+
+
+_PARSERS = {
+    'allpass': _parse_filter(2, 'h'),
+    'bandpass': _parse_filter(2, 'h'),
+    'bandreject': _parse_filter(2, 'h'),
+    'bass': _parse_filter(3, 's', gain_first=True),
+    'biquad': _parse_biquad,
+    'channels': _parse_channels,
+    'dcshift': _parse_dcshift,
+    'equalizer': _parse_filter(3, 'h'),
+    'fade': _parse_fade,
+    'fir': _parse_fir,
+    'gain': _parse_gain,
+    'highpass': _parse_filter(2, 'q'),
+    'lowpass': _parse_filter(2, 'q'),
+    'pad': _parse_pad,
+    'remix': _parse_remix,
+    'repeat': _parse_repeat,
+    'reverse': _parse_none,
+    'sinc': _parse_sinc,
+    'swap': _parse_none,
+    'treble': _parse_filter(3, 's', gain_first=True),
+    'trim': _parse_trim,
+    'vol': _parse_vol,
+}
+
+_EFFECTS = {
+    'channels': _channels,
+    'dcshift': _dcshift,
+    'fade': _fade,
+    'fir': _fir,
+    'gain': _gain,
+    'pad': _pad,
+    'remix': _remix,
+    'repeat': _repeat,
+    'reverse': _reverse,
+    'sinc': _sinc,
+    'swap': _swap,
+    'trim': _trim,
+    'vol': _vol,
+}
+_EFFECTS.update(
+    (name, _biquad_effect(name)) for name in BIQUAD_EFFECTS
+)
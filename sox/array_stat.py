@@ -0,0 +1,271 @@
+'''NumPy implementation of SoX's stat effect.
+
+Computes the same statistics as ``sox <file> -n stat`` directly on arrays,
+without passing the audio through a SoX process.
+'''
+import numpy as np
+
+from .core import is_number
+from .core import sox_stream
+from .metrics import _measure
+
+SOX_SAMPLE_MAX = 2147483647.0
+
+
+class StatAccumulator(object):
+    '''Running computation of SoX's stat effect over consecutive blocks of
+    mono samples, so that long signals can be processed in bounded memory.
+
+    Parameters
+    ----------
+    sample_rate : float
+        Sample rate of the audio.
+    scale : float or None, default=None
+        Divisor applied to the samples, in units of 32 bit integer samples,
+        as with ``stat -s``. If None, samples are scaled to [-1, 1].
+    rms : bool, default=False
+        If True, all values are expressed in units of the RMS amplitude, as
+        with ``stat -rms``.
+
+    Examples
+    --------
+    >>> acc = sox.array_stat.StatAccumulator(44100)
+    >>> for block in blocks:
+    ...     acc.update(block)
+    >>> acc.result()['RMS     amplitude']
+
+    '''
+
+    def __init__(self, sample_rate, scale=None, rms=False):
+        if not is_number(sample_rate) or sample_rate <= 0:
+            raise ValueError("sample_rate must be a positive number.")
+
+        if scale is not None and (not is_number(scale) or scale <= 0):
+            raise ValueError("scale must be a positive number.")
+
+        if not isinstance(rms, bool):
+            raise ValueError("rms must be a boolean.")
+
+        self.sample_rate = float(sample_rate)
+        self.scale = SOX_SAMPLE_MAX if scale is None else float(scale)
+        self.rms = rms
+
+        self.n_samples = 0
+        self._min = np.inf
+        self._max = -np.inf
+        self._last = None
+        self._sums = np.zeros(3)
+        self._delta_min = np.inf
+        self._delta_max = -np.inf
+        self._delta_sums = np.zeros(2)
+
+    def update(self, samples):
+        '''Add a block of samples.
+
+        Parameters
+        ----------
+        samples : np.ndarray
+            1-d array of samples. Integer arrays are interpreted as PCM
+            values of their bit depth, float arrays as values in [-1, 1].
+        '''
+        samples = _to_unit_float(samples).ravel()
+        if samples.size == 0:
+            return self
+
+        samples = samples * (SOX_SAMPLE_MAX / self.scale)
+        if self._last is None:
+            self._last = samples[0]
+
+        deltas = np.abs(np.diff(samples, prepend=self._last))
+        self._last = samples[-1]
+
+        self._min = min(self._min, samples.min())
+        self._max = max(self._max, samples.max())
+        self._sums += [
+            np.abs(samples).sum(), samples.sum(), np.dot(samples, samples)
+        ]
+        self._delta_min = min(self._delta_min, deltas.min())
+        self._delta_max = max(self._delta_max, deltas.max())
+        self._delta_sums += [deltas.sum(), np.dot(deltas, deltas)]
+        self.n_samples += samples.size
+        return self
+
+    def result(self):
+        '''Statistics of all samples added so far.
+
+        Returns
+        -------
+        stat_dictionary : dict
+            Dictionary of audio statistics, with the same keys as
+            file_info.stat.
+        '''
+        count = self.n_samples
+        if count == 0:
+            return {}
+
+        scale = self.scale
+        min_val, max_val = self._min, self._max
+        abs_sum, total, sum_sq = self._sums
+        delta_min, delta_max = self._delta_min, self._delta_max
+        delta_sum, delta_sum_sq = self._delta_sums
+
+        if self.rms:
+            rms = np.sqrt(sum_sq / count)
+            factor = 1.0 / rms if rms > 0 else 1.0
+            min_val, max_val = min_val * factor, max_val * factor
+            abs_sum, total = abs_sum * factor, total * factor
+            sum_sq = sum_sq * factor ** 2
+            delta_min, delta_max = delta_min * factor, delta_max * factor
+            delta_sum = delta_sum * factor
+            delta_sum_sq = delta_sum_sq * factor ** 2
+            scale = scale * rms
+
+        n_deltas = max(count - 1, 1)
+        stat_dictionary = {
+            'Samples read': count,
+            'Length (seconds)': count / self.sample_rate,
+            'Scaled by rms' if self.rms else 'Scaled by': scale,
+            'Maximum amplitude': max_val,
+            'Minimum amplitude': min_val,
+            'Midline amplitude': min_val / 2 + max_val / 2,
+            'Mean    norm': abs_sum / count,
+            'Mean    amplitude': total / count,
+            'RMS     amplitude': np.sqrt(sum_sq / count),
+            'Maximum delta': delta_max,
+            'Minimum delta': delta_min,
+            'Mean    delta': delta_sum / n_deltas,
+            'RMS     delta': np.sqrt(delta_sum_sq / n_deltas),
+        }
+
+        if sum_sq > 0:
+            stat_dictionary['Rough   frequency'] = int(
+                np.sqrt(delta_sum_sq / sum_sq) * self.sample_rate /
+                (2 * np.pi)
+            )
+
+        amplitude = max(-min_val, max_val)
+        if amplitude > 0:
+            stat_dictionary['Volume adjustment'] = (
+                SOX_SAMPLE_MAX / (amplitude * scale)
+            )
+
+        return dict((key, float(val)) for key, val in stat_dictionary.items())
+
+
+def stat(input_array, sample_rate, scale=None, rms=False):
+    '''Compute the statistics of SoX's stat effect on an array.
+
+    Multi-channel audio is downmixed to mono first, as in
+    Transformer.stat.
+
+    Parameters
+    ----------
+    input_array : np.ndarray
+        Array of shape (n_samples, ) or (n_samples, n_channels).
+    sample_rate : float
+        Sample rate of input_array.
+    scale : float or None, default=None
+        Divisor applied to the samples, as with ``stat -s``.
+    rms : bool, default=False
+        If True, all values are expressed in units of the RMS amplitude.
+
+    Returns
+    -------
+    stat_dictionary : dict
+        Dictionary of audio statistics, with the same keys as
+        file_info.stat.
+    '''
+    if not isinstance(input_array, np.ndarray):
+        raise TypeError("input_array must be a numpy array.")
+
+    accumulator = StatAccumulator(sample_rate, scale, rms)
+    accumulator.update(_downmix(input_array))
+    return accumulator.result()
+
+
+def stat_file(filepath, scale=None, rms=False, blocksize=65536):
+    '''Compute the statistics of SoX's stat effect on an audio file. The file
+    is decoded once by SoX and the statistics are computed on blocks of
+    blocksize samples, so memory use does not depend on the file length.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to audio file.
+    scale : float or None, default=None
+        Divisor applied to the samples, as with ``stat -s``.
+    rms : bool, default=False
+        If True, all values are expressed in units of the RMS amplitude.
+    blocksize : int, default=65536
+        Number of samples processed at a time.
+
+    Returns
+    -------
+    stat_dictionary : dict
+        Dictionary of audio statistics, with the same keys as
+        file_info.stat.
+    '''
+    # imported here to avoid a circular import with file_info
+    from . import file_info
+
+    if not isinstance(blocksize, int) or blocksize <= 0:
+        raise ValueError("blocksize must be a positive integer.")
+
+    file_info.validate_input_file(filepath)
+    accumulator = StatAccumulator(
+        file_info.sample_rate(filepath), scale, rms
+    )
+
+    args = ['sox', '-D', '-V1', filepath, '-t', 'f64', '-c', '1', '-']
+    with _measure():
+        for chunk in sox_stream(args, chunk_size=8 * blocksize):
+            accumulator.update(np.frombuffer(chunk, dtype=np.float64))
+
+    return accumulator.result()
+
+
+def silent(input_array, threshold=0.001):
+    '''Determine if an array is silent, as file_info.silent does for files.
+
+    Parameters
+    ----------
+    input_array : np.ndarray
+        Array of shape (n_samples, ) or (n_samples, n_channels).
+    threshold : float
+        Threshold for determining silence
+
+    Returns
+    -------
+    is_silent : bool
+        True if the mean absolute amplitude is below threshold.
+    '''
+    if not isinstance(input_array, np.ndarray):
+        raise TypeError("input_array must be a numpy array.")
+
+    samples = _to_unit_float(_downmix(input_array))
+    if samples.size == 0:
+        return True
+    return bool(np.abs(samples).mean() < threshold)
+
+
+def _downmix(input_array):
+    '''Average all channels of a (n_samples, n_channels) array.'''
+    if input_array.ndim > 1:
+        return _to_unit_float(input_array).mean(axis=1)
+    return input_array
+
+
+def _to_unit_float(samples):
+    '''Convert samples to float64. Integer PCM is scaled the way SoX does,
+    by shifting to 32 bits and dividing by the maximum 32 bit sample.
+    '''
+    if np.issubdtype(samples.dtype, np.integer):
+        n_bits = samples.dtype.itemsize * 8
+        offset = 0
+        if np.issubdtype(samples.dtype, np.unsignedinteger):
+            offset = 2 ** (n_bits - 1)
+        return (
+            (samples.astype(np.float64) - offset) *
+            (2.0 ** (32 - n_bits) / SOX_SAMPLE_MAX)
+        )
+    return samples.astype(np.float64, copy=False)
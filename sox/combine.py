@@ -10,6 +10,9 @@ from __future__ import print_function
 from . import file_info
 from . import core
 from .log import logger
+from .metrics import _measure
+from .metrics import _phase
+from .core import asox
 from .core import ENCODING_VALS
 from .core import is_number
 from .core import sox
@@ -19,6 +22,8 @@ from .core import SoxiError
 from .core import VALID_FORMATS
 
 from .transform import Transformer
+from .transform import _remove_files
+from .transform import _write_fir_files
 
 
 COMBINE_VALS = [
@@ -35,8 +40,8 @@ class Combiner(Transformer):
     applied after combining.
     '''
 
-    def __init__(self):
-        super(Combiner, self).__init__()
+    def __init__(self, seed=None):
+        super(Combiner, self).__init__(seed)
 
     def build(self, input_filepath_list, output_filepath, combine_type,
               input_volumes=None):
@@ -73,6 +78,52 @@ class Combiner(Transformer):
             True on success.
 
         '''
+        with _measure(self.effects_log):
+            with _phase('args'):
+                args = self._build_args(
+                    input_filepath_list, output_filepath, combine_type,
+                    input_volumes
+                )
+            args, fir_files = _write_fir_files(args)
+            try:
+                status, out, err = sox(args)
+            finally:
+                _remove_files(fir_files)
+            with _phase('decode'):
+                return self._finish_build(
+                    output_filepath, combine_type, status, out, err
+                )
+
+    async def abuild(self, input_filepath_list, output_filepath, combine_type,
+                     input_volumes=None):
+        '''Asynchronous version of build, for use on an asyncio event loop.
+
+        SoX is run with core.asox: the event loop is not blocked while it
+        runs, the number of concurrent SoX processes is limited by
+        core.set_async_limit, and cancelling the calling task kills the SoX
+        process. The parameters and return values are the same as for
+        build.
+
+        '''
+        with _measure(self.effects_log):
+            with _phase('args'):
+                args = self._build_args(
+                    input_filepath_list, output_filepath, combine_type,
+                    input_volumes
+                )
+            args, fir_files = _write_fir_files(args)
+            try:
+                status, out, err = await asox(args)
+            finally:
+                _remove_files(fir_files)
+            with _phase('decode'):
+                return self._finish_build(
+                    output_filepath, combine_type, status, out, err
+                )
+
+    def _build_args(self, input_filepath_list, output_filepath, combine_type,
+                    input_volumes):
+        '''Validate the arguments of build and assemble the SoX command.'''
         file_info.validate_input_file_list(input_filepath_list)
         file_info.validate_output_file(output_filepath)
         _validate_combine_type(combine_type)
@@ -97,9 +148,9 @@ class Combiner(Transformer):
         args.extend(self.output_format)
         args.append(output_filepath)
         args.extend(self.effects)
+        return args
 
-        status, out, err = sox(args)
-
+    def _finish_build(self, output_filepath, combine_type, status, out, err):
         if status != 0:
             raise SoxError(
                 "Stdout: {}\nStderr: {}".format(out, err)
@@ -152,7 +203,11 @@ class Combiner(Transformer):
         args.extend(input_args)
         args.extend(self.effects)
 
-        play(args)
+        args, fir_files = _write_fir_files(args)
+        try:
+            play(args)
+        finally:
+            _remove_files(fir_files)
 
     def set_input_format(self, file_type=None, rate=None, bits=None,
                          channels=None, encoding=None, ignore_length=None):
@@ -1,14 +1,28 @@
 '''Base module for calling SoX '''
 from .log import logger
+from .metrics import _measure
+from .metrics import _phase
+from .metrics import _record_process
 
+from collections.abc import Iterator
+from collections.abc import Sequence
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import signal
 import subprocess
+import threading
+import time
+import weakref
 from subprocess import CalledProcessError
 import numpy as np
 
-from . import NO_SOX
-
 SOXI_ARGS = ['B', 'b', 'c', 'a', 'D', 'e', 't', 's', 'r']
 
+STDIN_CHUNK_SIZE = 1 << 20
+
 ENCODING_VALS = [
     'signed-integer', 'unsigned-integer', 'floating-point', 'a-law', 'u-law',
     'oki-adpcm', 'ima-adpcm', 'ms-adpcm', 'gsm-full-rate'
@@ -18,14 +32,23 @@ ENCODING_VALS = [
 def sox(args, src_array=None, decode_out_with_utf=True):
     '''Pass an argument list to SoX.
 
+    If a worker pool has been installed with `set_pool`, and neither
+    src_array is given nor binary output is read, the command is executed
+    by one of the pool's helper processes.
+
     Parameters
     ----------
     args : iterable
         Argument list for SoX. The first item can, but does not
         need to, be 'sox'.
-    src_array : np.ndarray, or None
+    src_array : np.ndarray, iterator of np.ndarray, or None
         If src_array is not None, then we make sure it's a numpy
-        array and pass it into stdin.
+        array and pass it into stdin. If it is an iterator of arrays, the
+        blocks are written to stdin one after another as SoX consumes
+        them, and the worker pool is not used. Blocks must all have the
+        dtype and number of channels of the first one; an exception raised
+        by the iterator is raised again once SoX has processed the blocks
+        before it.
     decode_out_with_utf : bool, default=True
         Whether or not sox is outputting a bytestring that should be
         decoded with utf-8.
@@ -47,43 +70,815 @@ def sox(args, src_array=None, decode_out_with_utf=True):
     else:
         args[0] = "sox"
 
+    src_array = _as_blocks(src_array)
+    with _measure():
+        try:
+            logger.info("Executing: %s", ' '.join(args))
+
+            if _POOL is not None and src_array is None and \
+                    decode_out_with_utf:
+                return _POOL.run(args, src_array, decode_out_with_utf)
+            result = _run_sox(args, src_array, decode_out_with_utf)
+
+        except OSError as error_msg:
+            logger.error("OSError: SoX failed! %s", error_msg)
+            return 1, None, None
+        except TypeError as error_msg:
+            logger.error("TypeError: %s", error_msg)
+            return 1, None, None
+
+    if isinstance(src_array, _Blocks):
+        src_array.raise_error()
+    return result
+
+
+async def asox(args, src_array=None, decode_out_with_utf=True):
+    '''Asynchronous version of `sox`, which runs SoX with
+    asyncio.create_subprocess_exec instead of blocking the event loop.
+
+    At most as many SoX processes as set with `set_async_limit` run at once
+    on each event loop; further calls wait for a slot. If the calling task
+    is cancelled, the SoX process is killed. The worker pool installed with
+    `set_pool` is not used.
+
+    Parameters
+    ----------
+    args : iterable
+        Argument list for SoX. The first item can, but does not
+        need to, be 'sox'.
+    src_array : np.ndarray, or None
+        If src_array is not None, it is written to stdin.
+    decode_out_with_utf : bool, default=True
+        Whether or not sox is outputting a bytestring that should be
+        decoded with utf-8.
+
+    Returns
+    -------
+    status : bool
+        True on success.
+    out : str, bytes, or None
+        The stdout produced by sox, or None if SoX could not be started.
+    err : str, or None
+        Returns stderr as a string.
+
+    '''
+    if args[0].lower() != "sox":
+        args.insert(0, "sox")
+    else:
+        args[0] = "sox"
+
+    if src_array is not None and not isinstance(src_array, np.ndarray):
+        logger.error("TypeError: src_array must be an np.ndarray!")
+        return 1, None, None
+
+    if src_array is None:
+        stdin_buffer = stdin_pipe = None
+    else:
+        stdin_buffer = _stdin_buffer(src_array)
+        stdin_pipe = subprocess.PIPE
+    with _measure():
+        async with _async_semaphore():
+            logger.info("Executing: %s", ' '.join(args))
+            try:
+                with _phase('spawn'):
+                    process_handle = await asyncio.create_subprocess_exec(
+                        *args,
+                        stdin=stdin_pipe,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE
+                    )
+            except OSError as error_msg:
+                logger.error("OSError: SoX failed! %s", error_msg)
+                return 1, None, None
+
+            try:
+                with _phase('sox'):
+                    out, err = await process_handle.communicate(stdin_buffer)
+            except asyncio.CancelledError:
+                if process_handle.returncode is None:
+                    process_handle.kill()
+                await process_handle.wait()
+                raise
+        _record_process(
+            args, process_handle.returncode,
+            0 if stdin_buffer is None else len(stdin_buffer), len(out)
+        )
+
+    if src_array is None and decode_out_with_utf:
+        out = out.decode("utf-8")
+    return process_handle.returncode, out, err.decode("utf-8")
+
+
+def set_async_limit(max_processes=None):
+    '''Set the maximum number of SoX processes started by the asynchronous
+    functions (`asox`, `asoxi`, Transformer.abuild, ...) which run at once
+    on an event loop.
+
+    Parameters
+    ----------
+    max_processes : int or None, default=None
+        Maximum number of concurrent processes. If None, the number of CPUs
+        is used (the default).
+
+    '''
+    global _ASYNC_LIMIT
+    if max_processes is None:
+        max_processes = multiprocessing.cpu_count()
+    if not isinstance(max_processes, int) or max_processes < 1:
+        raise ValueError("max_processes must be a positive integer.")
+    _ASYNC_LIMIT = max_processes
+    _ASYNC_SEMAPHORES.clear()
+
+
+def _async_semaphore():
+    '''Semaphore limiting the SoX processes of the running event loop.'''
+    loop = asyncio.get_running_loop()
+    semaphore = _ASYNC_SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_ASYNC_LIMIT)
+        _ASYNC_SEMAPHORES[loop] = semaphore
+    return semaphore
+
+
+_ASYNC_LIMIT = multiprocessing.cpu_count()
+_ASYNC_SEMAPHORES = weakref.WeakKeyDictionary()
+
+
+def sox_stream(args, src_array=None, chunk_size=65536):
+    '''Pass an argument list to SoX and read its stdout incrementally.
+
+    Parameters
+    ----------
+    args : iterable
+        Argument list for SoX. The first item can, but does not
+        need to, be 'sox'.
+    src_array : np.ndarray, iterator of np.ndarray, or None
+        If src_array is not None, it is written to stdin from a separate
+        thread while stdout is being read. An iterator of arrays is written
+        block by block as SoX consumes it (see `sox`).
+    chunk_size : int, default=65536
+        Number of bytes per chunk.
+
+    Yields
+    ------
+    chunk : bytes
+        Consecutive chunks of stdout of chunk_size bytes. The last chunk may
+        be shorter.
+
+    '''
+    src_array = _as_blocks(src_array)
+    logger.info("Executing: %s", ' '.join(args))
+    process_handle, threads, err = _start_sox(args, src_array)
+
+    n_bytes = 0
+    finished = False
     try:
+        while True:
+            chunk = process_handle.stdout.read(chunk_size)
+            if not chunk:
+                break
+            n_bytes += len(chunk)
+            yield chunk
+        finished = True
+    finally:
+        status, rusage = _wait_sox(process_handle, threads, finished)
+    _record_process(
+        args, status, 0 if src_array is None else src_array.nbytes,
+        n_bytes, rusage
+    )
+
+    if isinstance(src_array, _Blocks):
+        src_array.raise_error()
+    if status != 0:
+        raise SoxError("Stderr: {}".format(b''.join(err).decode("utf-8")))
+
+
+def sox_readinto(args, buffer, src_array=None):
+    '''Pass an argument list to SoX and read its stdout directly into a
+    preallocated buffer, without creating an intermediate bytes object.
+
+    Parameters
+    ----------
+    args : iterable
+        Argument list for SoX. The first item can, but does not
+        need to, be 'sox'.
+    buffer : np.ndarray
+        Writeable, C-contiguous array which receives stdout.
+    src_array : np.ndarray, iterator of np.ndarray, or None
+        If src_array is not None, it is written to stdin from a separate
+        thread while stdout is being read. An iterator of arrays is written
+        block by block as SoX consumes it (see `sox`).
+
+    Returns
+    -------
+    status : int
+        SoX's exit code.
+    n_bytes : int
+        Number of bytes written to the start of buffer.
+    err : str
+        Returns stderr as a string.
+
+    '''
+    if not isinstance(buffer, np.ndarray):
+        raise TypeError("buffer must be an np.ndarray!")
+    if not buffer.flags['C_CONTIGUOUS'] or not buffer.flags['WRITEABLE']:
+        raise ValueError("buffer must be writeable and C-contiguous.")
+
+    view = memoryview(buffer.reshape(-1).view(np.uint8))
+    src_array = _as_blocks(src_array)
+    with _measure():
         logger.info("Executing: %s", ' '.join(args))
+        process_handle, threads, err = _start_sox(args, src_array)
+
+        n_bytes = 0
+        finished = False
+        with _phase('sox'):
+            try:
+                while n_bytes < len(view):
+                    n_read = process_handle.stdout.readinto(view[n_bytes:])
+                    if not n_read:
+                        break
+                    n_bytes += n_read
+                if n_bytes == len(view) and process_handle.stdout.read(1):
+                    raise ValueError(
+                        "buffer is too small: SoX produced more than {} "
+                        "bytes".format(len(view))
+                    )
+                finished = True
+            finally:
+                status, rusage = _wait_sox(process_handle, threads, finished)
+        _record_process(
+            args, status, 0 if src_array is None else src_array.nbytes,
+            n_bytes, rusage
+        )
+
+    if isinstance(src_array, _Blocks):
+        src_array.raise_error()
+    return status, n_bytes, b''.join(err).decode("utf-8")
+
+
+def _start_sox(args, src_array=None):
+    '''Start SoX with stdout as a pipe. stderr is collected and src_array is
+    written to stdin on separate threads.
+
+    Returns
+    -------
+    process_handle : subprocess.Popen
+        The running process.
+    threads : list
+        Helper threads, to be joined by `_wait_sox`.
+    err : list
+        Receives the stderr of the process once it exits.
+
+    '''
+    if args[0].lower() != "sox":
+        args.insert(0, "sox")
+    else:
+        args[0] = "sox"
+
+    if src_array is not None and \
+            not isinstance(src_array, (np.ndarray, _Blocks)):
+        raise TypeError("src_array must be an np.ndarray!")
+
+    with _phase('spawn'):
+        process_handle = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE if src_array is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+
+    threads = []
+    err = []
+    threads.append(threading.Thread(
+        target=lambda: err.append(process_handle.stderr.read())
+    ))
+    if isinstance(src_array, _Blocks):
+        threads.append(threading.Thread(
+            target=_write_stdin_blocks, args=(process_handle, src_array)
+        ))
+    elif src_array is not None:
+        threads.append(threading.Thread(
+            target=_write_stdin,
+            args=(process_handle, _stdin_buffer(src_array))
+        ))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    return process_handle, threads, err
+
+
+def _wait_sox(process_handle, threads, finished):
+    '''Wait for a process started by `_start_sox` and release its pipes.
+    If finished is False, stdout was not read to the end, and the process is
+    killed.
+
+    Returns
+    -------
+    status : int
+        SoX's exit code.
+    rusage : resource.struct_rusage or None
+        Resource usage of the process (see `_reap`).
+
+    '''
+    if not finished and process_handle.returncode is None:
+        # the consumer stopped early, or an error was raised
+        process_handle.kill()
+    status, rusage = _reap(process_handle)
+    for thread in threads:
+        thread.join()
+    process_handle.stdout.close()
+    process_handle.stderr.close()
+    return status, rusage
+
+
+def _reap(process_handle):
+    '''Wait for a process and collect its resource usage with os.wait4.
+
+    Returns
+    -------
+    status : int
+        Exit code of the process, or minus the signal which ended it, as in
+        Popen.returncode.
+    rusage : resource.struct_rusage or None
+        Resource usage of the process, or None where os.wait4 is not
+        available or the process has already been waited for.
+
+    '''
+    if not hasattr(os, 'wait4') or process_handle.returncode is not None:
+        return process_handle.wait(), None
+    try:
+        _, wait_status, rusage = os.wait4(process_handle.pid, 0)
+    except ChildProcessError:
+        return process_handle.wait(), None
+
+    if os.WIFSIGNALED(wait_status):
+        process_handle.returncode = -os.WTERMSIG(wait_status)
+    else:
+        process_handle.returncode = os.WEXITSTATUS(wait_status)
+    return process_handle.returncode, rusage
+
+
+def _stdin_buffer(src_array):
+    '''Raw bytes of an array in the interleaved (frame-major) order SoX reads
+    from stdin.
+
+    Arrays of shape (n_samples, n_channels) which are already C-contiguous
+    are exposed without copying; any other layout is copied once.
+
+    Parameters
+    ----------
+    src_array : np.ndarray
+        Array to be written to SoX.
+
+    Returns
+    -------
+    buffer : memoryview
+        Unsigned byte view of the array data.
+
+    '''
+    if not src_array.flags['C_CONTIGUOUS']:
+        src_array = np.ascontiguousarray(src_array)
+    return memoryview(src_array.reshape(-1).view(np.uint8))
+
+
+def _write_stdin(process_handle, data, chunk_size=STDIN_CHUNK_SIZE):
+    '''Write data to a process's stdin in chunks and close it. Used on a
+    separate thread so that writing and reading do not deadlock.
+    '''
+    _write_stdin_blocks(process_handle, [data], chunk_size)
+
+
+def _write_stdin_blocks(process_handle, blocks, chunk_size=STDIN_CHUNK_SIZE):
+    '''Write each of an iterable of buffers or arrays to a process's stdin
+    in chunks and close it. The next block is only requested once the
+    previous one has been written, so a full pipe holds back the producer.
+    '''
+    try:
+        for block in blocks:
+            if isinstance(block, np.ndarray):
+                block = _stdin_buffer(block)
+            for start in range(0, len(block), chunk_size):
+                process_handle.stdin.write(block[start:start + chunk_size])
+    except (BrokenPipeError, ValueError):
+        # SoX exited before consuming all of its input
+        pass
+    finally:
+        try:
+            process_handle.stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def _as_blocks(src_array):
+    '''Wrap an iterator of arrays in `_Blocks`; other values are returned
+    unchanged.
+    '''
+    if isinstance(src_array, Iterator) and \
+            not isinstance(src_array, _Blocks):
+        return _Blocks(src_array)
+    return src_array
+
 
-        if src_array is None:
-            process_handle = subprocess.Popen(
-                args, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+class _Blocks(object):
+    '''Iterator of arrays which are written to SoX's stdin one after the
+    other.
+
+    The first block is read on creation, so that the dtype and number of
+    channels of the input are known before SoX is started. Iterating checks
+    that every block matches the first one. An exception raised by the
+    underlying iterator, or a mismatching block, ends the iteration (so that
+    SoX sees the end of its input) and is kept in `error`, to be raised on
+    the caller's thread by `raise_error`.
+
+    Parameters
+    ----------
+    blocks : iterator of np.ndarray
+        Blocks of shape (n_samples, n_channels), or (n_samples, ) for mono.
+
+    Attributes
+    ----------
+    first : np.ndarray
+        The first block.
+    nbytes : int
+        Number of bytes of the blocks iterated over so far.
+    error : Exception or None
+        Exception which ended the iteration early.
+
+    '''
+
+    def __init__(self, blocks):
+        self._blocks = blocks
+        self.first = next(blocks, None)
+        if self.first is None:
+            raise ValueError("the iterator of input blocks is empty.")
+        if not isinstance(self.first, np.ndarray) or self.first.ndim > 2:
+            raise TypeError(
+                "input blocks must be numpy arrays of shape "
+                "(n_samples, n_channels) or (n_samples, )."
             )
+        self.nbytes = 0
+        self.error = None
+        self._started = False
+
+    def __iter__(self):
+        if self._started:
+            raise ValueError("input blocks can only be iterated once.")
+        self._started = True
+        block = self.first
+        while True:
+            self.nbytes += block.nbytes
+            yield block
+            try:
+                block = next(self._blocks)
+            except StopIteration:
+                return
+            except Exception as error:
+                self.error = error
+                return
+            if not isinstance(block, np.ndarray) or \
+                    block.dtype != self.first.dtype or \
+                    block.shape[1:] != self.first.shape[1:]:
+                self.error = ValueError(
+                    "input block of type {} does not match the dtype {} "
+                    "and shape {} of the first block".format(
+                        getattr(block, 'dtype', type(block)),
+                        self.first.dtype, self.first.shape
+                    )
+                )
+                return
+
+    def raise_error(self):
+        '''Raise the exception which ended the iteration, if any.'''
+        if self.error is not None:
+            raise self.error
+
+
+def _run_sox(args, src_array=None, decode_out_with_utf=True):
+    '''Run a single SoX process. See `sox` for a description of the
+    parameters and return values.
+    '''
+    # stdout is read here and stderr and stdin are handled on helper
+    # threads, rather than with communicate, so that the process can be
+    # waited for with os.wait4 and its resource usage recorded
+    process_handle, threads, err = _start_sox(args, src_array)
+    finished = False
+    with _phase('sox'):
+        try:
+            out = process_handle.stdout.read()
+            finished = True
+        finally:
+            status, rusage = _wait_sox(process_handle, threads, finished)
+    _record_process(
+        args, status, 0 if src_array is None else src_array.nbytes,
+        len(out), rusage
+    )
+
+    if src_array is None and decode_out_with_utf:
+        out = out.decode("utf-8")
+    return status, out, b''.join(err).decode("utf-8")
+
+
+def _init_worker(barrier):
+    '''Initializer of pool workers: keep the barrier used by `_ping`, and
+    put the worker in a process group of its own, which the SoX processes it
+    starts belong to (see `_terminate_pool`).
+    '''
+    global _PING_BARRIER
+    _PING_BARRIER = barrier
+    if hasattr(os, 'setpgid'):
+        os.setpgid(0, 0)
+
+
+_PING_BARRIER = None
+
+
+def _ping(deadline):
+    '''Health check run inside a pool worker. Each worker waits on a barrier
+    shared by all workers, so one ping per worker only succeeds if every
+    worker picks one up before the deadline (time.time()).
+    '''
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        return False
+    try:
+        _PING_BARRIER.wait(remaining)
+    except threading.BrokenBarrierError:
+        return False
+    return True
+
+
+def _pool_context():
+    '''Multiprocessing context of pool workers. New workers are started
+    from a clean interpreter (or fork server) rather than by forking the
+    caller, which may hold large arrays and running threads.
+    '''
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _terminate_pool(pool):
+    '''Terminate the workers of a pool and the SoX processes they started.
+    Pool.terminate only stops the workers, so the process groups of the
+    workers, which their SoX processes belong to, are killed once the
+    workers are gone. Killing SoX first would wake the workers up while they
+    are terminated, and one killed while sending its result would leave the
+    result queue of the pool locked.
+    '''
+    pool.terminate()
+    pool.join()
+    if not hasattr(os, 'killpg'):
+        return
+    # the workers which were still running when the pool was terminated
+    for worker in pool._pool:
+        try:
+            os.killpg(worker.pid, signal.SIGKILL)
+        except OSError:
+            # no process is left in the group
+            pass
+
+
+class SoxPool(object):
+    '''Pool of helper processes which execute SoX commands.
+
+    SoX handles exactly one command per process, so each job still starts a
+    `sox` binary: the pool does not remove SoX's startup cost. It bounds the
+    number of SoX processes running at once, keeps slow or hung commands
+    from blocking the caller (see timeout), and starts its helpers from a
+    fork server (or a fresh interpreter) instead of forking the calling
+    process.
 
-            out, err = process_handle.communicate()
-            if decode_out_with_utf:
-                out = out.decode("utf-8")
-            err = err.decode("utf-8")
-
-            status = process_handle.returncode
-        elif isinstance(src_array, np.ndarray):
-            process_handle = subprocess.Popen(
-                args,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+    Install a pool with `set_pool` to route calls to `sox` (and hence
+    `Transformer.build` and `Combiner.build`) through it. Only calls which
+    neither pass an array to SoX nor read binary output from it use the
+    pool; array input and output would otherwise be pickled to and from
+    the helpers, which costs more than starting SoX directly.
+
+    Parameters
+    ----------
+    n_workers : int or None, default=None
+        Number of helper processes. If None, uses the number of CPUs.
+    max_jobs_per_worker : int or None, default=None
+        Number of jobs a helper runs before it is replaced by a fresh one.
+        If None, helpers live as long as the pool.
+    timeout : float or None, default=None
+        Maximum time in seconds to wait for a single job. A job which takes
+        longer raises SoxTimeoutError; its helper, and the SoX process it
+        started, are killed once the other jobs running on the pool have
+        finished, and new jobs go to a fresh set of helpers in the meantime.
+        If None, waits indefinitely.
+
+    Examples
+    --------
+    >>> import sox
+    >>> pool = sox.core.SoxPool(n_workers=4, max_jobs_per_worker=1000)
+    >>> sox.core.set_pool(pool)
+    >>> sox.Transformer().build('path/to/input.wav', 'path/to/output.wav')
+    >>> sox.core.set_pool(None)
+    >>> pool.close()
+
+    '''
+
+    def __init__(self, n_workers=None, max_jobs_per_worker=None,
+                 timeout=None):
+        if n_workers is not None and (
+                not isinstance(n_workers, int) or n_workers <= 0):
+            raise ValueError("n_workers must be a positive integer or None.")
+
+        if max_jobs_per_worker is not None and (
+                not isinstance(max_jobs_per_worker, int) or
+                max_jobs_per_worker <= 0):
+            raise ValueError(
+                "max_jobs_per_worker must be a positive integer or None."
             )
-            # We do order "F" for Fortran formatting of the numpy array, which is
-            # sox expects. When we reshape stdout later, we need to use the same
-            # order, otherwise tests fail.
-            out, err = process_handle.communicate(src_array.T.tobytes(order='F'))
-            err = err.decode("utf-8")
-            status = process_handle.returncode
-        else:
-            raise TypeError("src_array must be an np.ndarray!")
 
+        if timeout is not None and (not is_number(timeout) or timeout <= 0):
+            raise ValueError("timeout must be a positive number or None.")
+
+        self.n_workers = n_workers or multiprocessing.cpu_count()
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pool = None
+        self._barrier = None
+        # number of jobs waited for, per pool; pools retired after a
+        # timeout are terminated when their count drops to zero
+        self._n_running = {}
+        self.restart()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def run(self, args, src_array=None, decode_out_with_utf=True):
+        '''Execute a SoX argument list on one of the helper processes.
+
+        Parameters
+        ----------
+        args : list
+            Argument list for SoX, starting with 'sox'.
+        src_array : np.ndarray, or None
+            Array passed to SoX's stdin.
+        decode_out_with_utf : bool, default=True
+            Whether or not stdout should be decoded with utf-8.
+
+        Returns
+        -------
+        status : int
+            SoX's exit code.
+        out : str, bytes or None
+            The stdout produced by sox.
+        err : str, or None
+            Returns stderr as a string.
+
+        Raises
+        ------
+        SoxTimeoutError
+            If the job did not finish within the pool's timeout.
+
+        '''
+        with self._lock:
+            if self._pool is None:
+                raise SoxError("SoxPool has been closed.")
+            pool = self._pool
+            self._n_running[pool] += 1
+
+        try:
+            with _phase('sox'):
+                job = pool.apply_async(
+                    _run_sox, (args, src_array, decode_out_with_utf)
+                )
+                try:
+                    status, out, err = job.get(self.timeout)
+                except multiprocessing.TimeoutError:
+                    logger.warning(
+                        "SoX pool job timed out after %s seconds: %s",
+                        self.timeout, ' '.join(args)
+                    )
+                    self._retire(pool)
+                    raise SoxTimeoutError(
+                        "SoX did not finish within {} seconds".format(
+                            self.timeout
+                        )
+                    )
+        finally:
+            self._release(pool)
+
+        _record_process(
+            args, status, 0 if src_array is None else src_array.nbytes,
+            0 if out is None else len(out)
+        )
         return status, out, err
 
-    except OSError as error_msg:
-        logger.error("OSError: SoX failed! %s", error_msg)
-    except TypeError as error_msg:
-        logger.error("TypeError: %s", error_msg)
-    return 1, None, None
+    def is_healthy(self, timeout=5.0):
+        '''Check that every helper process responds.
+
+        Parameters
+        ----------
+        timeout : float, default=5.0
+            Time in seconds to wait for the helpers to respond.
+
+        Returns
+        -------
+        is_healthy : bool
+            True if all helpers answered within the timeout.
+        '''
+        with self._lock:
+            if self._pool is None:
+                return False
+            pool, barrier = self._pool, self._barrier
+
+        deadline = time.time() + timeout
+        jobs = [
+            pool.apply_async(_ping, (deadline, ))
+            for _ in range(self.n_workers)
+        ]
+        try:
+            healthy = all(job.get(timeout) for job in jobs)
+        except multiprocessing.TimeoutError:
+            healthy = False
+        if not healthy:
+            barrier.reset()
+        return healthy
+
+    def restart(self):
+        '''Terminate all helper processes and spawn a fresh set.'''
+        self.close()
+        with self._lock:
+            self._start_pool()
+        return self
+
+    def close(self):
+        '''Terminate all helper processes.'''
+        with self._lock:
+            pools = list(self._n_running)
+            self._pool = None
+            self._n_running = {}
+        for pool in pools:
+            _terminate_pool(pool)
+
+    def _start_pool(self):
+        context = _pool_context()
+        self._barrier = context.Barrier(self.n_workers)
+        self._pool = context.Pool(
+            processes=self.n_workers,
+            maxtasksperchild=self.max_jobs_per_worker,
+            initializer=_init_worker,
+            initargs=(self._barrier, )
+        )
+        self._n_running[self._pool] = 0
+
+    def _retire(self, pool):
+        '''Send new jobs to a fresh set of helpers, leaving the jobs still
+        running on pool to finish.
+        '''
+        with self._lock:
+            if self._pool is pool:
+                self._start_pool()
+
+    def _release(self, pool):
+        '''Count a job of pool as finished, and terminate pool if it has
+        been retired and this was its last job.
+        '''
+        with self._lock:
+            if pool not in self._n_running:
+                # the SoxPool was closed meanwhile
+                return
+            self._n_running[pool] -= 1
+            if pool is self._pool or self._n_running[pool] > 0:
+                return
+            del self._n_running[pool]
+        _terminate_pool(pool)
+
+
+_POOL = None
+
+
+def set_pool(pool):
+    '''Route SoX calls without array input or binary output through a
+    worker pool. The pool adds concurrency limits and timeouts; it does not
+    make starting SoX any cheaper (see SoxPool).
+
+    Parameters
+    ----------
+    pool : SoxPool or None
+        The pool to use. If None, SoX is spawned directly by the calling
+        process (the default).
+
+    '''
+    global _POOL
+    if pool is not None and not isinstance(pool, SoxPool):
+        raise TypeError("pool must be a SoxPool or None.")
+    _POOL = pool
+
+
+def get_pool():
+    '''Get the worker pool currently used for SoX calls, or None.'''
+    return _POOL
 
 
 class SoxError(Exception):
@@ -93,9 +888,64 @@ class SoxError(Exception):
         Exception.__init__(self, *args, **kwargs)
 
 
+class SoxTimeoutError(SoxError):
+    '''Exception to be raised when a SoX job on a SoxPool does not finish
+    within the pool's timeout.
+    '''
+
+
+NO_SOX = None
+
+
+def _no_sox():
+    '''Check whether SoX is missing, looking it up on the first call only.
+    This does not start any subprocess.
+
+    Returns
+    -------
+    no_sox : bool
+        True if the sox binary could not be found on the path.
+
+    '''
+    global NO_SOX
+    if NO_SOX is None:
+        NO_SOX = shutil.which('sox') is None
+        if NO_SOX:
+            logger.warning("""SoX could not be found!
+
+    If you do not have SoX, proceed here:
+     - - - http://sox.sourceforge.net/ - - -
+
+    If you do (or think that you should) have SoX, double-check your
+    path variables.
+    """)
+    return NO_SOX
+
+
+def _cache_dir():
+    '''Directory where pysox keeps its on-disk caches.
+
+    Returns
+    -------
+    cache_dir : str
+        $PYSOX_CACHE_DIR if set, otherwise a pysox directory inside
+        $XDG_CACHE_HOME (default ~/.cache).
+
+    '''
+    cache_dir = os.environ.get('PYSOX_CACHE_DIR')
+    if cache_dir is None:
+        cache_home = os.environ.get(
+            'XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')
+        )
+        cache_dir = os.path.join(cache_home, 'pysox')
+    return cache_dir
+
+
 def _get_valid_formats():
     ''' Calls SoX help for a lists of audio formats available with the current
-    install of SoX.
+    install of SoX. The result is cached on disk, keyed on the path and
+    modification time of the sox binary, so SoX is only called once per
+    install.
 
     Returns
     -------
@@ -103,9 +953,25 @@ def _get_valid_formats():
         List of audio file extensions that SoX can process.
 
     '''
-    if NO_SOX:
+    sox_path = shutil.which('sox')
+    if _no_sox() or sox_path is None:
         return []
 
+    try:
+        cache_key = [sox_path, os.stat(sox_path).st_mtime_ns]
+    except OSError:
+        cache_key = None
+
+    cache_file = os.path.join(_cache_dir(), 'formats.json')
+    if cache_key is not None:
+        try:
+            with open(cache_file) as fhandle:
+                cached = json.load(fhandle)
+            if cached['key'] == cache_key:
+                return cached['formats']
+        except (IOError, ValueError, KeyError, TypeError):
+            pass
+
     so = subprocess.check_output(['sox', '-h'])
     if type(so) is not str:
         so = str(so, encoding='UTF-8')
@@ -113,10 +979,62 @@ def _get_valid_formats():
     idx = [i for i in range(len(so)) if 'AUDIO FILE FORMATS:' in so[i]][0]
     formats = so[idx].split(' ')[3:]
 
+    if cache_key is not None:
+        try:
+            if not os.path.isdir(_cache_dir()):
+                os.makedirs(_cache_dir())
+            tmp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+            with open(tmp_file, 'w') as fhandle:
+                json.dump({'key': cache_key, 'formats': formats}, fhandle)
+            os.replace(tmp_file, cache_file)
+        except (IOError, OSError) as error_msg:
+            logger.info("Could not cache SoX formats: %s", error_msg)
+
     return formats
 
 
-VALID_FORMATS = _get_valid_formats()
+class _ValidFormats(Sequence):
+    '''List of valid file formats which is only computed on first use, so
+    that importing sox does not call SoX.
+    '''
+
+    def __init__(self):
+        self._formats = None
+
+    def _get(self):
+        if self._formats is None:
+            self._formats = _get_valid_formats()
+        return self._formats
+
+    def __getitem__(self, index):
+        return self._get()[index]
+
+    def __len__(self):
+        return len(self._get())
+
+    def __contains__(self, value):
+        return value in self._get()
+
+    def __iter__(self):
+        return iter(self._get())
+
+    def __add__(self, other):
+        return self._get() + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self._get()
+
+    def __eq__(self, other):
+        return self._get() == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self._get())
+
+
+VALID_FORMATS = _ValidFormats()
 
 
 def soxi(filepath, argument):
@@ -127,8 +1045,9 @@ def soxi(filepath, argument):
     filepath : str
         Path to audio file.
 
-    argument : str
-        Argument to pass to SoXI.
+    argument : str or None
+        Argument to pass to SoXI. If None, SoXI prints all of the header
+        information at once.
 
     Returns
     -------
@@ -136,11 +1055,12 @@ def soxi(filepath, argument):
         Command line output of SoXI
     '''
 
-    if argument not in SOXI_ARGS:
+    if argument is not None and argument not in SOXI_ARGS:
         raise ValueError("Invalid argument '{}' to SoXI".format(argument))
 
     args = ['sox', '--i']
-    args.append("-{}".format(argument))
+    if argument is not None:
+        args.append("-{}".format(argument))
     args.append(filepath)
 
     try:
@@ -157,6 +1077,39 @@ def soxi(filepath, argument):
     return str(shell_output).strip('\n')
 
 
+async def asoxi(filepath, argument):
+    '''Asynchronous version of `soxi`.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to audio file.
+
+    argument : str or None
+        Argument to pass to SoXI. If None, SoXI prints all of the header
+        information at once.
+
+    Returns
+    -------
+    shell_output : str
+        Command line output of SoXI
+    '''
+    if argument is not None and argument not in SOXI_ARGS:
+        raise ValueError("Invalid argument '{}' to SoXI".format(argument))
+
+    args = ['sox', '--i']
+    if argument is not None:
+        args.append("-{}".format(argument))
+    args.append(filepath)
+
+    status, shell_output, err = await asox(args)
+    if status != 0:
+        logger.info("SoXI error message: {}".format(err))
+        raise SoxiError("SoXI failed with exit code {}".format(status))
+
+    return str(shell_output).strip('\n')
+
+
 def play(args):
     '''Pass an argument list to play.
 
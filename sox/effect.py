@@ -0,0 +1,148 @@
+'''Structured representation of the effects in a Transformer's chain.
+'''
+import hashlib
+
+import numpy as np
+
+
+class Effect(object):
+    '''One effect of a Transformer's chain: the method which added it, the
+    arguments the method was called with, and the SoX arguments it added.
+
+    Effects compare equal, and hash equally, when they were added by the same
+    method and add the same SoX arguments, whatever the parameters they
+    were computed from (for example chorus parameters drawn at random).
+
+    Parameters
+    ----------
+    name : str
+        Name of the Transformer method, as in Transformer.effects_log.
+    params : dict
+        Arguments the method was called with, by parameter name.
+    args : list of str
+        SoX arguments added to Transformer.effects. For a fir effect whose
+        coefficients are passed in a file, the file name is matched with
+        params['coefficients'], so that the coefficients are found again
+        after to_dict and from_dict.
+
+    '''
+    __slots__ = ('name', 'params', 'args')
+
+    def __init__(self, name, params, args):
+        self.name = name
+        self.params = dict(params)
+        self.args = tuple(_fir_coefficient_args(name, self.params, args))
+
+    def __eq__(self, other):
+        if not isinstance(other, Effect):
+            return NotImplemented
+        return self.name == other.name and self.args == other.args
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash((self.name, self.args))
+
+    def __repr__(self):
+        return 'Effect({!r}, {!r}, {!r})'.format(
+            self.name, self.params, list(self.args)
+        )
+
+    def argv(self):
+        '''SoX arguments of the effect, as a list.'''
+        return list(self.args)
+
+    def to_dict(self):
+        '''Convert to a dictionary of JSON serializable values.
+
+        Returns
+        -------
+        effect_dict : dict
+            Dictionary with the keys name, params and args. numpy arrays and
+            tuples in params are converted to lists. The coefficients of a
+            fir effect passed in a file are kept in params['coefficients'].
+
+        '''
+        params = dict(self.params)
+        for arg in self.args:
+            if isinstance(arg, _FirCoefficients):
+                params['coefficients'] = arg.coefficients
+        return {
+            'name': self.name,
+            'params': _to_builtin(params),
+            'args': [str(arg) for arg in self.args]
+        }
+
+    @classmethod
+    def from_dict(cls, effect_dict):
+        '''Create an effect from the output of to_dict.
+
+        Parameters
+        ----------
+        effect_dict : dict
+            Dictionary with the keys name, params and args.
+
+        Returns
+        -------
+        effect : Effect
+
+        '''
+        if not isinstance(effect_dict, dict):
+            raise TypeError("effect_dict must be a dictionary")
+        if any(key not in effect_dict for key in ['name', 'params', 'args']):
+            raise ValueError("effect_dict must have keys name, params, args")
+        if not all(isinstance(arg, str) for arg in effect_dict['args']):
+            raise ValueError("args must be strings")
+        return cls(
+            effect_dict['name'], effect_dict['params'], effect_dict['args']
+        )
+
+
+def _to_builtin(value):
+    '''Recursively convert numpy values and tuples to builtin types.'''
+    if isinstance(value, dict):
+        return {key: _to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(item) for item in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return value
+
+
+class _FirCoefficients(str):
+    '''Argument of the fir effect standing for a file of coefficients. Its
+    value is a name derived from the coefficients, so that it can be
+    compared and hashed like any other argument; the coefficients travel
+    with it when pickled, and in Effect.to_dict. The file itself only exists
+    while SoX runs (see transform._write_fir_files).
+    '''
+
+    def __new__(cls, coefficients):
+        coefficients = [float(c) for c in coefficients]
+        text = ''.join('{!r}\n'.format(c) for c in coefficients)
+        name = 'fir-{}.txt'.format(
+            hashlib.sha256(text.encode('utf-8')).hexdigest()
+        )
+        self = super(_FirCoefficients, cls).__new__(cls, name)
+        self.coefficients = coefficients
+        self.text = text
+        return self
+
+    def __reduce__(self):
+        return _FirCoefficients, (self.coefficients, )
+
+
+def _fir_coefficient_args(name, params, args):
+    '''Replace the file name of a fir effect's coefficients by the
+    _FirCoefficients built from params['coefficients'], if they match.
+    '''
+    coefficients = params.get('coefficients')
+    if name != 'fir' or coefficients is None:
+        return args
+    try:
+        fir_arg = _FirCoefficients(coefficients)
+    except (TypeError, ValueError):
+        return args
+    return [fir_arg if arg == fir_arg else arg for arg in args]
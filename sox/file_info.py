@@ -1,12 +1,26 @@
-''' Audio file info computed by soxi.
+''' Audio file info computed by soxi, or read directly from the header of
+WAV, AIFF and FLAC files.
 '''
 from .log import logger
 
+from collections import deque
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import glob
 import os
+import sqlite3
+import struct
+import threading
 
 from .core import VALID_FORMATS
+from .core import asox
+from .core import asoxi
 from .core import soxi
 from .core import sox
+from .core import SoxError
+from .core import SoxiError
+from .metrics import _phase
 
 
 def bitdepth(input_filepath):
@@ -26,7 +40,7 @@ def bitdepth(input_filepath):
     '''
 
     validate_input_file(input_filepath)
-    output = soxi(input_filepath, 'b')
+    output = _header_or_soxi(input_filepath, 'b')
     if output == '0':
         logger.warning("Bit depth unavailable for %s", input_filepath)
         return None
@@ -51,7 +65,7 @@ def bitrate(input_filepath):
     '''
 
     validate_input_file(input_filepath)
-    output = soxi(input_filepath, 'B')
+    output = _header_or_soxi(input_filepath, 'B')
     # The characters below stand for kilo, Mega, Giga, etc.
     greek_prefixes = '\0kMGTPEZY'
     if output == "0":
@@ -79,7 +93,7 @@ def channels(input_filepath):
         number of channels
     '''
     validate_input_file(input_filepath)
-    output = soxi(input_filepath, 'c')
+    output = _header_or_soxi(input_filepath, 'c')
     return int(output)
 
 
@@ -99,7 +113,7 @@ def comments(input_filepath):
         If no comments are present, returns an empty string.
     '''
     validate_input_file(input_filepath)
-    output = soxi(input_filepath, 'a')
+    output = _header_or_soxi(input_filepath, 'a')
     return str(output)
 
 
@@ -119,7 +133,7 @@ def duration(input_filepath):
         If unavailable or empty, returns None.
     '''
     validate_input_file(input_filepath)
-    output = soxi(input_filepath, 'D')
+    output = _header_or_soxi(input_filepath, 'D')
     if float(output) == 0.0:
         logger.warning("Duration unavailable for %s", input_filepath)
         return None
@@ -141,7 +155,7 @@ def encoding(input_filepath):
         audio encoding type
     '''
     validate_input_file(input_filepath)
-    output = soxi(input_filepath, 'e')
+    output = _header_or_soxi(input_filepath, 'e')
     return str(output)
 
 
@@ -160,7 +174,7 @@ def file_type(input_filepath):
         file format type (ex. 'wav')
     '''
     validate_input_file(input_filepath)
-    output = soxi(input_filepath, 't')
+    output = _header_or_soxi(input_filepath, 't')
     return str(output)
 
 
@@ -180,7 +194,7 @@ def num_samples(input_filepath):
         Returns None if empty or unavailable.
     '''
     validate_input_file(input_filepath)
-    output = soxi(input_filepath, 's')
+    output = _header_or_soxi(input_filepath, 's')
     if output == '0':
         logger.warning("Number of samples unavailable for %s", input_filepath)
         return None
@@ -202,7 +216,7 @@ def sample_rate(input_filepath):
         number of samples/second
     '''
     validate_input_file(input_filepath)
-    output = soxi(input_filepath, 'r')
+    output = _header_or_soxi(input_filepath, 'r')
     return float(output)
 
 
@@ -224,14 +238,15 @@ def silent(input_filepath, threshold=0.001):
     '''
     validate_input_file(input_filepath)
     stat_dictionary = stat(input_filepath)
-    mean_norm = stat_dictionary['Mean    norm']
-    if mean_norm is not float('nan'):
-        if mean_norm >= threshold:
-            return False
-        else:
-            return True
-    else:
+    return _is_silent(stat_dictionary, threshold)
+
+
+def _is_silent(stat_dictionary, threshold):
+    # empty files have no statistics
+    mean_norm = stat_dictionary.get('Mean    norm')
+    if mean_norm is None or mean_norm != mean_norm:
         return True
+    return mean_norm < threshold
 
 
 def validate_input_file(input_filepath):
@@ -329,13 +344,17 @@ def file_extension(filepath):
     return os.path.splitext(filepath)[1][1:]
 
 
-def info(filepath):
-    '''Get a dictionary of file information
+def info(filepath, include_silent=True):
+    '''Get a dictionary of file information. WAV, AIFF and FLAC headers are
+    read directly; other files are read with a single call to SoXI.
 
     Parameters
     ----------
     filepath : str
         File path.
+    include_silent : bool, default=True
+        If True, the 'silent' field is computed. This requires decoding the
+        entire file. If False, the field is omitted.
 
     Returns
     -------
@@ -350,19 +369,305 @@ def info(filepath):
             * encoding
             * silent
     '''
+    validate_input_file(filepath)
+    with _phase('probe'):
+        info_dictionary = _header_info(filepath)
+    if info_dictionary is None:
+        info_dictionary = _parse_soxi_info(_header_or_soxi(filepath, None))
+    for key in ['bitdepth', 'bitrate', 'duration', 'num_samples']:
+        if info_dictionary[key] is None:
+            logger.warning("%s unavailable for %s", key, filepath)
+
+    if include_silent:
+        info_dictionary['silent'] = silent(filepath)
+    return info_dictionary
+
+
+async def ainfo(filepath, include_silent=True):
+    '''Asynchronous version of `info`. Headers which cannot be read
+    directly are read with SoXI, and the silent field is computed with SoX,
+    in subprocesses which do not block the event loop (see core.asox).
+
+    Parameters
+    ----------
+    filepath : str
+        File path.
+    include_silent : bool, default=True
+        If True, the 'silent' field is computed. This requires decoding the
+        entire file. If False, the field is omitted.
+
+    Returns
+    -------
+    info_dictionary : dict
+        Dictionary of file information, with the same fields as `info`.
+    '''
+    validate_input_file(filepath)
+    info_dictionary = _header_info(filepath)
+    if info_dictionary is None:
+        key, output = _cached_or_header(filepath, None)
+        if output is None:
+            output = await asoxi(filepath, None)
+            if key is not None:
+                _CACHE.set(key, None, output)
+        info_dictionary = _parse_soxi_info(output)
+
+    for key in ['bitdepth', 'bitrate', 'duration', 'num_samples']:
+        if info_dictionary[key] is None:
+            logger.warning("%s unavailable for %s", key, filepath)
+
+    if include_silent:
+        status, _, stat_output = await asox(['sox', filepath, '-n', 'stat'])
+        if status != 0:
+            raise SoxError("Stderr: {}".format(stat_output))
+        info_dictionary['silent'] = _is_silent(
+            _parse_stat(stat_output), 0.001
+        )
+    return info_dictionary
+
+
+def _header_info(filepath):
+    '''Build the `info` dictionary from the file header, without calling
+    SoXI.
+
+    Parameters
+    ----------
+    filepath : str
+        File path.
+
+    Returns
+    -------
+    info_dictionary : dict or None
+        Dictionary with the same fields as `_parse_soxi_info`, or None if
+        the header cannot be read (see `_read_header`).
+    '''
+    header = _read_header(filepath)
+    if header is None:
+        return None
+
+    n_channels = int(header['c'])
+    rate = float(header['r'])
+    bits = int(header['b'])
+    n_samples = int(header['s'])
+    duration_s = float(header['D'])
+    # like SoXI, the bit rate is the whole file size over the duration,
+    # printed with 3 significant figures
+    bit_rate = float('{:.3g}'.format(
+        8.0 * os.path.getsize(filepath) / (n_samples / rate)
+    ))
+    return {
+        'channels': n_channels,
+        'sample_rate': rate,
+        'bitdepth': bits if bits > 0 else None,
+        'bitrate': bit_rate,
+        'duration': duration_s,
+        'num_samples': n_samples,
+        'encoding': header['e']
+    }
+
+
+def _parse_soxi_info(soxi_output):
+    '''Parse the full header output of SoXI.
+
+    Parameters
+    ----------
+    soxi_output : str
+        SoXI output when called without a field argument.
+
+    Returns
+    -------
+    info_dictionary : dict
+        Dictionary with the same fields and types as the single-field
+        functions in this module (channels, sample_rate, bitdepth, bitrate,
+        duration, num_samples, encoding). Unavailable fields are None.
+    '''
+    fields = {}
+    for line in soxi_output.split('\n'):
+        split_line = line.split(':', 1)
+        if len(split_line) != 2:
+            continue
+        key = split_line[0].strip()
+        if key == 'Comments':
+            break
+        fields[key] = split_line[1].strip()
+
     info_dictionary = {
-        'channels': channels(filepath),
-        'sample_rate': sample_rate(filepath),
-        'bitdepth': bitdepth(filepath),
-        'bitrate': bitrate(filepath),
-        'duration': duration(filepath),
-        'num_samples': num_samples(filepath),
-        'encoding': encoding(filepath),
-        'silent': silent(filepath)
+        'channels': None,
+        'sample_rate': None,
+        'bitdepth': None,
+        'bitrate': None,
+        'duration': None,
+        'num_samples': None,
+        'encoding': None
     }
+
+    if 'Channels' in fields:
+        info_dictionary['channels'] = int(fields['Channels'])
+
+    if 'Sample Rate' in fields:
+        info_dictionary['sample_rate'] = float(fields['Sample Rate'])
+
+    # e.g. "00:00:10.00 = 441000 samples ~ 750 CDDA sectors"
+    if 'Duration' in fields:
+        n_samples = int(fields['Duration'].split('=')[1].split()[0])
+        if n_samples > 0:
+            info_dictionary['num_samples'] = n_samples
+            if info_dictionary['sample_rate']:
+                # soxi -D prints the duration with 6 decimals
+                info_dictionary['duration'] = float('{:f}'.format(
+                    n_samples / info_dictionary['sample_rate']
+                ))
+
+    if 'Bit Rate' in fields:
+        output = fields['Bit Rate']
+        greek_prefixes = '\0kMGTPEZY'
+        if output[-1] in greek_prefixes:
+            multiplier = 1000.0**(greek_prefixes.index(output[-1]))
+            info_dictionary['bitrate'] = float(output[:-1])*multiplier
+        else:
+            info_dictionary['bitrate'] = float(output)
+        if info_dictionary['bitrate'] == 0:
+            info_dictionary['bitrate'] = None
+
+    # e.g. "16-bit Signed Integer PCM"
+    if 'Sample Encoding' in fields:
+        encoding_str = fields['Sample Encoding']
+        first_word = encoding_str.split(' ', 1)[0]
+        if first_word.endswith('-bit') and first_word[:-4].isdigit():
+            bits = int(first_word[:-4])
+            info_dictionary['bitdepth'] = bits if bits > 0 else None
+            encoding_str = encoding_str.split(' ', 1)[1]
+        info_dictionary['encoding'] = encoding_str
+
     return info_dictionary
 
 
+SCAN_FIELDS = [
+    'filepath', 'channels', 'sample_rate', 'bitdepth', 'duration',
+    'num_samples', 'encoding', 'error'
+]
+
+
+def scan(paths, n_jobs=None, manifest_path=None):
+    '''Collect file information for many audio files in parallel.
+
+    Results are yielded as soon as they are available, in the order the
+    files were found, so arbitrarily large collections can be processed
+    without holding all results in memory.
+
+    Parameters
+    ----------
+    paths : str or list of str
+        Files, directories (searched recursively) or glob patterns (which
+        may use ``**``). Inside directories, only files with an extension
+        SoX can read are included.
+    n_jobs : int or None, default=None
+        Number of files processed concurrently. If None, uses the number of
+        CPUs.
+    manifest_path : str or None, default=None
+        Path to a CSV manifest with columns SCAN_FIELDS. Each result is
+        appended to the manifest as it is yielded. If the manifest already
+        exists, files listed in it are skipped, so an interrupted scan can be
+        resumed.
+
+    Yields
+    ------
+    file_dictionary : dict
+        Dictionary with fields SCAN_FIELDS. If the file could not be read,
+        'error' holds the error message and the other fields are None.
+
+    Examples
+    --------
+    >>> for row in sox.file_info.scan('path/to/corpus', n_jobs=8):
+    ...     print(row['filepath'], row['duration'])
+
+    Write a manifest without keeping the results
+
+    >>> for _ in sox.file_info.scan('path/to/**/*.wav', manifest_path='m.csv'):
+    ...     pass
+
+    '''
+    if isinstance(paths, str):
+        paths = [paths]
+    if not isinstance(paths, list):
+        raise TypeError("paths must be a string or a list of strings.")
+
+    if n_jobs is not None and (not isinstance(n_jobs, int) or n_jobs <= 0):
+        raise ValueError("n_jobs must be a positive integer or None.")
+
+    done = set()
+    manifest = None
+    if manifest_path is not None:
+        if os.path.exists(manifest_path):
+            with open(manifest_path, newline='') as fhandle:
+                done = set(row['filepath'] for row in csv.DictReader(fhandle))
+            manifest = open(manifest_path, 'a', newline='')
+            writer = csv.DictWriter(manifest, SCAN_FIELDS)
+        else:
+            manifest = open(manifest_path, 'w', newline='')
+            writer = csv.DictWriter(manifest, SCAN_FIELDS)
+            writer.writeheader()
+
+    filepaths = (f for f in _find_audio_files(paths) if f not in done)
+
+    n_workers = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+    try:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            # bound the number of pending files so memory stays flat
+            max_pending = 4 * n_workers
+            pending = deque()
+            for filepath in filepaths:
+                pending.append(executor.submit(_scan_file, filepath))
+                if len(pending) >= max_pending:
+                    row = pending.popleft().result()
+                    if manifest is not None:
+                        writer.writerow(row)
+                    yield row
+            while pending:
+                row = pending.popleft().result()
+                if manifest is not None:
+                    writer.writerow(row)
+                yield row
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+
+def _find_audio_files(paths):
+    '''Expand files, directories and glob patterns into audio file paths.
+    '''
+    extensions = set(VALID_FORMATS)
+    extensions.update(['wav', 'aif', 'aiff', 'aifc', 'flac'])
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    if file_extension(filename).lower() in extensions:
+                        yield os.path.join(root, filename)
+        else:
+            for filepath in sorted(glob.iglob(path, recursive=True)):
+                if os.path.isfile(filepath):
+                    yield filepath
+
+
+def _scan_file(filepath):
+    '''Get the SCAN_FIELDS of a single file for scan.
+    '''
+    row = dict((field, None) for field in SCAN_FIELDS)
+    row['filepath'] = filepath
+    try:
+        file_dictionary = info(filepath, include_silent=False)
+        for field in SCAN_FIELDS[1:-1]:
+            row[field] = file_dictionary[field]
+    except (SoxiError, IOError, ValueError) as error:
+        row = dict((field, None) for field in SCAN_FIELDS)
+        row['filepath'] = filepath
+        row['error'] = str(error)
+    return row
+
+
 def stat(filepath):
     '''Returns a dictionary of audio statistics.
 
@@ -396,7 +701,9 @@ def _stat_call(filepath):
     '''
     validate_input_file(filepath)
     args = ['sox', filepath, '-n', 'stat']
-    _, _, stat_output = sox(args)
+    status, _, stat_output = sox(args)
+    if status != 0:
+        raise SoxError("Stderr: {}".format(stat_output))
     return stat_output
 
 
@@ -427,3 +734,383 @@ def _parse_stat(stat_output):
             stat_dict[key] = val
 
     return stat_dict
+
+
+def set_cache(max_size=8192, db_path=None):
+    '''Configure the metadata cache. Results of header and SoXI lookups are
+    cached per file, and reused as long as the file's path, size and
+    modification time are unchanged.
+
+    Parameters
+    ----------
+    max_size : int, default=8192
+        Maximum number of values kept in memory. Least recently used values
+        are evicted first. If 0, the in-memory cache is disabled.
+    db_path : str or None, default=None
+        Path to an sqlite database used as a persistent second cache layer,
+        shared between processes. If None, only the in-memory cache is used.
+
+    '''
+    global _CACHE
+    if not isinstance(max_size, int) or max_size < 0:
+        raise ValueError("max_size must be a non-negative integer.")
+
+    if db_path is not None and not isinstance(db_path, str):
+        raise ValueError("db_path must be a string or None.")
+
+    _CACHE.close()
+    _CACHE = _MetadataCache(max_size, db_path)
+
+
+def clear_cache():
+    '''Remove all values from the in-memory and persistent metadata caches.
+    '''
+    _CACHE.clear()
+
+
+class _MetadataCache(object):
+    '''Thread-safe LRU cache of SoXI outputs, keyed on
+    (path, argument) and validated against the file's size and mtime.
+    '''
+
+    def __init__(self, max_size=8192, db_path=None):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._db = None
+        if db_path is not None:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS metadata ('
+                'path TEXT, argument TEXT, size INTEGER, mtime_ns INTEGER, '
+                'output TEXT, PRIMARY KEY (path, argument))'
+            )
+            self._db.commit()
+
+    def get(self, key, argument):
+        path, size, mtime_ns = key
+        with self._lock:
+            entry = self._entries.get((path, argument))
+            if entry is not None and entry[0] == (size, mtime_ns):
+                self._entries.move_to_end((path, argument))
+                return entry[1]
+
+            if self._db is None:
+                return None
+
+            row = self._db.execute(
+                'SELECT output FROM metadata WHERE path = ? AND argument = ? '
+                'AND size = ? AND mtime_ns = ?',
+                (path, argument or '', size, mtime_ns)
+            ).fetchone()
+
+        if row is None:
+            return None
+        self.set(key, argument, row[0], persist=False)
+        return row[0]
+
+    def set(self, key, argument, output, persist=True):
+        path, size, mtime_ns = key
+        with self._lock:
+            if self.max_size > 0:
+                self._entries[(path, argument)] = ((size, mtime_ns), output)
+                self._entries.move_to_end((path, argument))
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+            if self._db is not None and persist:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?)',
+                    (path, argument or '', size, mtime_ns, output)
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM metadata')
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_CACHE = _MetadataCache()
+
+
+def _header_or_soxi(input_filepath, argument):
+    '''Answer a SoXI query from the metadata cache, from the file header if
+    it can be read by one of the pure-Python header readers, or otherwise
+    by calling SoXI.
+
+    Parameters
+    ----------
+    input_filepath : str
+        Path to audio file.
+    argument : str or None
+        SoXI argument, see core.SOXI_ARGS.
+
+    Returns
+    -------
+    output : str
+        The value, formatted as SoXI would print it.
+    '''
+    with _phase('probe'):
+        key, output = _cached_or_header(input_filepath, argument)
+        if output is None:
+            output = soxi(input_filepath, argument)
+            if key is not None:
+                _CACHE.set(key, argument, output)
+    return output
+
+
+def _cached_or_header(input_filepath, argument):
+    '''Answer a SoXI query from the metadata cache or the file header.
+
+    Returns
+    -------
+    key : tuple or None
+        Cache key of the file, or None if it cannot be stat'ed.
+    output : str or None
+        The value, formatted as SoXI would print it, or None if SoXI must be
+        called.
+    '''
+    try:
+        file_stat = os.stat(input_filepath)
+        key = (
+            os.path.abspath(input_filepath), file_stat.st_size,
+            file_stat.st_mtime_ns
+        )
+    except OSError:
+        key = None
+
+    if key is not None:
+        output = _CACHE.get(key, argument)
+        if output is not None:
+            return key, output
+
+    header = _read_header(input_filepath)
+    if header is None or argument not in header:
+        return key, None
+
+    output = header[argument]
+    if key is not None:
+        _CACHE.set(key, argument, output)
+    return key, output
+
+
+def _read_header(input_filepath):
+    '''Read the header of a WAV, AIFF or FLAC file without calling SoX.
+
+    Parameters
+    ----------
+    input_filepath : str
+        Path to audio file.
+
+    Returns
+    -------
+    header : dict or None
+        Dictionary keyed by SoXI argument ('c', 'r', 'b', 's', 'D', 'e')
+        with values formatted as SoXI prints them. None if the format is not
+        supported, the header is unusual, or the file is empty, in which
+        case SoXI should be used instead.
+    '''
+    readers = {
+        'wav': _read_wav_header,
+        'aif': _read_aiff_header,
+        'aiff': _read_aiff_header,
+        'aifc': _read_aiff_header,
+        'flac': _read_flac_header
+    }
+    reader = readers.get(file_extension(input_filepath).lower())
+    if reader is None:
+        return None
+
+    try:
+        with open(input_filepath, 'rb') as fhandle:
+            fields = reader(fhandle, os.fstat(fhandle.fileno()).st_size)
+    except (IOError, OSError, struct.error):
+        return None
+
+    if fields is None:
+        return None
+
+    n_channels, rate, bits, n_samples, encoding_str = fields
+    if n_channels <= 0 or rate <= 0 or n_samples <= 0:
+        return None
+
+    return {
+        'c': '{}'.format(n_channels),
+        'r': '{:g}'.format(rate),
+        'b': '{}'.format(bits),
+        's': '{}'.format(n_samples),
+        'D': '{:f}'.format(n_samples / float(rate)),
+        'e': encoding_str
+    }
+
+
+def _read_wav_header(fhandle, file_size):
+    '''Read channels, rate, bits, samples and encoding from a RIFF WAVE
+    header. Returns None for anything other than PCM, float, A-law and
+    u-law data.
+    '''
+    riff = fhandle.read(12)
+    if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+        return None
+
+    fmt = None
+    while True:
+        chunk_header = fhandle.read(8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id = chunk_header[:4]
+        chunk_size = struct.unpack('<I', chunk_header[4:])[0]
+        if chunk_id == b'fmt ':
+            fmt = fhandle.read(chunk_size)
+            if len(fmt) < 16:
+                return None
+            fhandle.seek(chunk_size % 2, 1)
+        elif chunk_id == b'data':
+            data_size = chunk_size
+            if fhandle.tell() + data_size > file_size:
+                return None
+            break
+        else:
+            fhandle.seek(chunk_size + chunk_size % 2, 1)
+
+    if fmt is None:
+        return None
+
+    format_tag, n_channels, rate, _, block_align, bits = struct.unpack(
+        '<HHIIHH', fmt[:16]
+    )
+    if format_tag == 0xFFFE:
+        if len(fmt) < 26:
+            return None
+        format_tag = struct.unpack('<H', fmt[24:26])[0]
+
+    if format_tag == 1 and bits in (8, 16, 24, 32):
+        encoding_str = (
+            'Unsigned Integer PCM' if bits == 8 else 'Signed Integer PCM'
+        )
+    elif format_tag == 3 and bits in (32, 64):
+        encoding_str = 'Floating Point PCM'
+    elif format_tag == 6 and bits == 8:
+        encoding_str = 'A-law'
+    elif format_tag == 7 and bits == 8:
+        encoding_str = 'u-law'
+    else:
+        return None
+
+    if block_align != n_channels * bits // 8:
+        return None
+
+    return n_channels, rate, bits, data_size // block_align, encoding_str
+
+
+def _read_aiff_header(fhandle, file_size):
+    '''Read channels, rate, bits, samples and encoding from an AIFF or
+    AIFF-C header. Returns None for compressed AIFF-C data.
+    '''
+    form = fhandle.read(12)
+    if len(form) < 12 or form[:4] != b'FORM' or \
+            form[8:12] not in (b'AIFF', b'AIFC'):
+        return None
+
+    comm = None
+    ssnd_size = None
+    while comm is None or ssnd_size is None:
+        chunk_header = fhandle.read(8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id = chunk_header[:4]
+        chunk_size = struct.unpack('>I', chunk_header[4:])[0]
+        if chunk_id == b'COMM':
+            comm = fhandle.read(chunk_size)
+            if len(comm) < 18:
+                return None
+            fhandle.seek(chunk_size % 2, 1)
+        elif chunk_id == b'SSND':
+            if fhandle.tell() + chunk_size > file_size:
+                return None
+            offset = struct.unpack('>I', fhandle.read(4))[0]
+            ssnd_size = chunk_size - 8 - offset
+            fhandle.seek(chunk_size - 4 + chunk_size % 2, 1)
+        else:
+            fhandle.seek(chunk_size + chunk_size % 2, 1)
+
+    n_channels, n_frames, sample_size = struct.unpack('>hIh', comm[:8])
+    rate = _extended_to_float(comm[8:18])
+
+    encoding_str = 'Signed Integer PCM'
+    if form[8:12] == b'AIFC':
+        if len(comm) < 22:
+            return None
+        compression = comm[18:22]
+        if compression in (b'fl32', b'FL32') and sample_size == 32:
+            encoding_str = 'Floating Point PCM'
+        elif compression in (b'fl64', b'FL64') and sample_size == 64:
+            encoding_str = 'Floating Point PCM'
+        elif compression not in (b'NONE', b'twos', b'sowt'):
+            return None
+
+    # SoX rounds the sample size up to a whole number of bytes
+    bits = 8 * ((sample_size + 7) // 8)
+    if bits not in (8, 16, 24, 32, 64):
+        return None
+
+    if ssnd_size != n_frames * n_channels * bits // 8:
+        return None
+
+    return n_channels, rate, bits, n_frames, encoding_str
+
+
+def _read_flac_header(fhandle, file_size):
+    '''Read channels, rate, bits and samples from a FLAC STREAMINFO block.
+    '''
+    marker = fhandle.read(4)
+    if marker[:3] == b'ID3':
+        # skip an ID3v2 tag, whose size is a 28 bit "syncsafe" integer
+        id3_header = marker + fhandle.read(6)
+        size_bytes = bytearray(id3_header[6:10])
+        tag_size = 0
+        for byte in size_bytes:
+            tag_size = (tag_size << 7) | (byte & 0x7F)
+        fhandle.seek(10 + tag_size)
+        marker = fhandle.read(4)
+
+    if marker != b'fLaC':
+        return None
+
+    block_header = bytearray(fhandle.read(4))
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        return None
+
+    streaminfo = fhandle.read(34)
+    if len(streaminfo) < 34:
+        return None
+
+    # 20 bits rate, 3 bits channels - 1, 5 bits bits - 1, 36 bits samples
+    packed = struct.unpack('>Q', streaminfo[10:18])[0]
+    rate = packed >> 44
+    n_channels = ((packed >> 41) & 0x07) + 1
+    bits = ((packed >> 36) & 0x1F) + 1
+    n_samples = packed & 0xFFFFFFFFF
+
+    return n_channels, rate, bits, n_samples, 'FLAC'
+
+
+def _extended_to_float(data):
+    '''Convert an 80 bit IEEE 754 extended precision number, as used for the
+    sample rate in AIFF headers, to a float.
+    '''
+    exponent, mantissa = struct.unpack('>HQ', data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent = exponent & 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
@@ -0,0 +1,219 @@
+'''Timing and resource instrumentation of SoX calls and builds.
+
+Install a callback with `set_metrics_hook` to receive a `BuildMetrics`
+record after every call to `core.sox`, `Transformer.build` and
+`Combiner.build` (and their asynchronous variants). SoX calls made while a
+build runs, including file_info lookups, are accounted to the build rather
+than reported separately. When no hook is installed nothing is measured.
+'''
+from .log import logger
+
+import contextlib
+import contextvars
+import sys
+import time
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+_METRICS = contextvars.ContextVar('sox_metrics', default=None)
+_METRICS_HOOK = None
+
+
+class BuildMetrics(object):
+    '''Wall time per phase and resource usage of one call to `core.sox`,
+    `Transformer.build` or `Combiner.build`.
+
+    Attributes
+    ----------
+    phases : dict
+        Wall time in seconds spent in each phase that was entered:
+
+        * 'args': validating the arguments and assembling the SoX command
+        * 'probe': reading file information (headers, SoXI)
+        * 'spawn': starting the SoX process
+        * 'sox': running SoX, including writing stdin and reading stdout
+        * 'numpy': applying the effects in-process (engine='numpy')
+        * 'decode': turning SoX's output into the return value
+
+        Phases do not overlap; time spent in a phase entered from within
+        another phase is counted in the inner phase only.
+    wall_time : float
+        Total wall time in seconds.
+    effects : list
+        The effects log of the Transformer or Combiner, or an empty list for
+        direct calls to `core.sox`.
+    args : list or None
+        SoX argument list of the last SoX process, or None if SoX was not
+        run (e.g. the output came from the build cache).
+    status : int or None
+        Exit code of the last SoX process.
+    n_processes : int
+        Number of SoX processes run, not counting file_info lookups.
+    bytes_in : int
+        Number of bytes written to SoX's stdin.
+    bytes_out : int
+        Number of bytes read from SoX's stdout.
+    cpu_time : float or None
+        User plus system CPU time of the SoX processes in seconds, or None
+        if it is not available (on Windows, on a SoxPool, or with asyncio).
+    max_rss : int or None
+        Largest maximum resident set size of the SoX processes in bytes, or
+        None if it is not available.
+
+    '''
+    __slots__ = (
+        'phases', 'wall_time', 'effects', 'args', 'status', 'n_processes',
+        'bytes_in', 'bytes_out', 'cpu_time', 'max_rss', '_start', '_since',
+        '_stack'
+    )
+
+    def __init__(self, effects=None):
+        self.phases = {}
+        self.wall_time = 0.0
+        self.effects = list(effects or [])
+        self.args = None
+        self.status = None
+        self.n_processes = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = None
+        self.max_rss = None
+        self._start = self._since = time.perf_counter()
+        self._stack = []
+
+    def __repr__(self):
+        return (
+            'BuildMetrics(wall_time={:.6f}, phases={!r}, n_processes={}, '
+            'bytes_in={}, bytes_out={}, cpu_time={!r}, max_rss={!r})'
+        ).format(
+            self.wall_time, self.phases, self.n_processes, self.bytes_in,
+            self.bytes_out, self.cpu_time, self.max_rss
+        )
+
+    def to_dict(self):
+        '''Convert to a dictionary of JSON serializable values.'''
+        return {
+            name: getattr(self, name) for name in self.__slots__
+            if not name.startswith('_')
+        }
+
+    def _enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            self._add_time(outer, now)
+            if outer == 'probe':
+                # SoXI runs SoX: count it as part of the lookup
+                name = outer
+        self._stack.append(name)
+        self._since = now
+
+    def _exit(self):
+        now = time.perf_counter()
+        self._add_time(self._stack.pop(), now)
+        self._since = now
+
+    def _add_time(self, name, now):
+        self.phases[name] = self.phases.get(name, 0.0) + now - self._since
+
+    def _add_process(self, args, status, bytes_in, bytes_out, rusage):
+        if self._stack and self._stack[-1] == 'probe':
+            return
+        self.args = list(args)
+        self.status = status
+        self.n_processes += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        if rusage is not None:
+            self.cpu_time = (
+                (self.cpu_time or 0.0) + rusage.ru_utime + rusage.ru_stime
+            )
+            self.max_rss = max(
+                self.max_rss or 0, rusage.ru_maxrss * _MAXRSS_UNIT
+            )
+
+
+def set_metrics_hook(hook):
+    '''Install a callback which receives the metrics of every SoX call and
+    build.
+
+    The hook is called on the thread (or asyncio task) which made the call,
+    after the call has finished, whether it succeeded or raised. Exceptions
+    raised by the hook are logged and otherwise ignored.
+
+    Parameters
+    ----------
+    hook : callable or None
+        Function taking a single `BuildMetrics` argument. If None, metrics
+        are not collected (the default).
+
+    Examples
+    --------
+    >>> import sox
+    >>> records = []
+    >>> sox.metrics.set_metrics_hook(records.append)
+    >>> sox.Transformer().build('path/to/input.wav', 'path/to/output.wav')
+    >>> print(records[0].phases, records[0].cpu_time, records[0].max_rss)
+
+    '''
+    global _METRICS_HOOK
+    if hook is not None and not callable(hook):
+        raise TypeError("hook must be callable or None.")
+    _METRICS_HOOK = hook
+
+
+def get_metrics_hook():
+    '''Get the currently installed metrics hook, or None.'''
+    return _METRICS_HOOK
+
+
+@contextlib.contextmanager
+def _measure(effects=None):
+    '''Collect metrics of the enclosed code, and pass them to the hook when
+    it ends. Nested measurements add to the enclosing one.
+
+    Yields the BuildMetrics being collected, or None if no hook is
+    installed.
+    '''
+    metrics = _METRICS.get()
+    hook = _METRICS_HOOK
+    if metrics is not None or hook is None:
+        yield metrics
+        return
+
+    metrics = BuildMetrics(effects)
+    token = _METRICS.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _METRICS.reset(token)
+        metrics.wall_time = time.perf_counter() - metrics._start
+        try:
+            hook(metrics)
+        except Exception:
+            logger.exception("Metrics hook raised an exception")
+
+
+@contextlib.contextmanager
+def _phase(name):
+    '''Account the wall time of the enclosed code to a phase of the metrics
+    being collected, if any.
+    '''
+    metrics = _METRICS.get()
+    if metrics is None:
+        yield
+        return
+
+    metrics._enter(name)
+    try:
+        yield
+    finally:
+        metrics._exit()
+
+
+def _record_process(args, status, bytes_in=0, bytes_out=0, rusage=None):
+    '''Add a finished SoX process to the metrics being collected, if any.'''
+    metrics = _METRICS.get()
+    if metrics is not None:
+        metrics._add_process(args, status, bytes_in, bytes_out, rusage)
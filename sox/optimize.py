@@ -0,0 +1,388 @@
+'''Optimization pass over a Transformer's chain of effects.
+
+The chain is rewritten into a cheaper one which produces the same audio, up
+to the rounding of samples:
+
+    - pairs of reverse effects, and effects which do nothing (unity gains,
+      empty trims and pads) are removed
+    - consecutive vol and gain effects are fused into one vol effect, as long
+      as no intermediate gain can clip
+    - gains followed by a normalization, and normalizations followed by
+      another one, are dropped when they cannot clip; a gain after a
+      normalization is folded into its target level
+    - a rate followed by a rate to a lower or equal sample rate is dropped
+    - trim is moved before effects which act on each sample independently
+      (vol, gain, dcshift, contrast, channels, remix, swap), so that they
+      process less audio
+
+Effects added by methods which emit several SoX effects (fade, silence and
+vad) are never rewritten and nothing is moved across them.
+'''
+import math
+
+from .effect import Effect
+
+# SoX effects emitted by Transformer methods whose name differs
+COMPOUND_PATTERNS = {
+    'fade': [
+        ['fade'], ['reverse', 'fade', 'reverse'],
+        ['fade', 'reverse', 'fade', 'reverse']
+    ],
+    'silence': [['silence'], ['reverse', 'silence', 'reverse']],
+    'vad': [
+        ['vad'], ['reverse', 'vad', 'reverse'], ['norm', 'vad'],
+        ['norm', 'reverse', 'vad', 'reverse']
+    ],
+}
+
+# effects without memory, which trim can be moved before
+POINTWISE_EFFECTS = [
+    'channels', 'contrast', 'dcshift', 'remix', 'swap', 'vol'
+]
+
+
+def optimize_effects(effects, effects_log):
+    '''Rewrite a chain of effects into an equivalent, cheaper one.
+
+    Parameters
+    ----------
+    effects : list of str
+        SoX effect arguments, as stored in Transformer.effects.
+    effects_log : list of str
+        Names of the Transformer methods which added the effects, as stored
+        in Transformer.effects_log.
+
+    Returns
+    -------
+    effects : list of str
+        Optimized effect arguments.
+    effects_log : list of str
+        Optimized effects log.
+    changes : list of str
+        Description of each change, in the order they were made.
+
+    Raises
+    ------
+    ValueError
+        If effects cannot be split into the effects listed in effects_log.
+
+    '''
+    effect_chain, changes = optimize_chain(
+        chain_from_effects(effects, effects_log)
+    )
+    effects = [arg for effect in effect_chain for arg in effect.args]
+    effects_log = [effect.name for effect in effect_chain]
+    return effects, effects_log, changes
+
+
+def optimize_chain(effect_chain):
+    '''Rewrite a list of effect records into an equivalent, cheaper one.
+
+    Parameters
+    ----------
+    effect_chain : list of Effect
+        Effects, as stored in Transformer.effect_chain.
+
+    Returns
+    -------
+    effect_chain : list of Effect
+        Optimized effects. Effects which were not rewritten are the records
+        which were passed in.
+    changes : list of str
+        Description of each change, in the order they were made.
+
+    '''
+    effect_chain = list(effect_chain)
+    changes = []
+    rules = [
+        _remove_no_ops, _cancel_reverses, _move_trims, _fuse_gains,
+        _drop_before_normalize, _fold_into_normalize, _drop_rates
+    ]
+    changed = True
+    while changed:
+        changed = False
+        for rule in rules:
+            change = rule(effect_chain)
+            if change is not None:
+                changes.append(change)
+                changed = True
+                break
+    return effect_chain, changes
+
+
+def chain_from_effects(effects, effects_log):
+    '''Effect records for a chain of effects, without the parameters of
+    the methods which added them.
+
+    Parameters
+    ----------
+    effects : list of str
+        SoX effect arguments, as stored in Transformer.effects.
+    effects_log : list of str
+        Names of the Transformer methods which added the effects, as stored
+        in Transformer.effects_log.
+
+    Returns
+    -------
+    effect_chain : list of Effect
+
+    '''
+    return [
+        Effect(
+            log_name, {},
+            [arg for name, args in groups for arg in [name] + args]
+        )
+        for log_name, groups in split_effects(effects, effects_log)
+    ]
+
+
+def split_effects(effects, effects_log):
+    '''Split a chain of effects into the part added by each Transformer
+    method.
+
+    Parameters
+    ----------
+    effects : list of str
+        SoX effect arguments, as stored in Transformer.effects.
+    effects_log : list of str
+        Names of the Transformer methods which added the effects, as stored
+        in Transformer.effects_log.
+
+    Returns
+    -------
+    segments : list of tuples
+        One (method name, effects) pair per entry of effects_log, where
+        effects is a list of (SoX effect name, arguments) pairs.
+
+    '''
+    effect_names = set(effects_log) | set(['norm', 'reverse'])
+    groups = []
+    for arg in effects:
+        if arg in effect_names:
+            groups.append((arg, []))
+        elif not groups:
+            raise ValueError(
+                "effects do not start with an effect in effects_log"
+            )
+        else:
+            groups[-1][1].append(arg)
+
+    # matched[i][j]: whether effects_log[i:] emitted groups[j:]
+    n_log, n_groups = len(effects_log), len(groups)
+    matched = [[False] * (n_groups + 1) for _ in range(n_log + 1)]
+    matched[n_log][n_groups] = True
+    for i in range(n_log - 1, -1, -1):
+        for j in range(n_groups - 1, -1, -1):
+            matched[i][j] = any(
+                matched[i + 1][j + len(pattern)]
+                for pattern in _patterns(effects_log[i], groups, j)
+            )
+    if not matched[0][0]:
+        raise ValueError("effects do not match effects_log")
+
+    segments = []
+    j = 0
+    for i, log_name in enumerate(effects_log):
+        for pattern in _patterns(log_name, groups, j):
+            if matched[i + 1][j + len(pattern)]:
+                segments.append((log_name, groups[j:j + len(pattern)]))
+                j += len(pattern)
+                break
+    return segments
+
+
+def _patterns(log_name, groups, start):
+    '''Effect name sequences log_name may have emitted which match groups
+    from start on.
+    '''
+    return [
+        pattern for pattern in COMPOUND_PATTERNS.get(log_name, [[log_name]])
+        if [name for name, _ in groups[start:start + len(pattern)]] == pattern
+    ]
+
+
+def _single(effect):
+    '''(name, args) of a record made of one SoX effect, or (None, None).'''
+    if (effect.name in COMPOUND_PATTERNS or not effect.args or
+            effect.args[0] != effect.name):
+        return None, None
+    return effect.name, list(effect.args[1:])
+
+
+def _describe(effect):
+    return ' '.join(effect.args)
+
+
+def _gain_factor(effect):
+    '''Amplitude factor of a vol or gain effect which only scales the
+    signal, or None.
+    '''
+    name, args = _single(effect)
+    try:
+        if name == 'vol' and len(args) == 2:
+            gain = float(args[0])
+            if args[1] == 'amplitude':
+                return gain
+            if args[1] == 'power':
+                return math.sqrt(gain)
+            if args[1] == 'dB':
+                return 10.0 ** (gain / 20.0)
+        if name == 'gain' and len(args) == 1:
+            return 10.0 ** (float(args[0]) / 20.0)
+    except ValueError:
+        pass
+    return None
+
+
+def _normalize_level(effect):
+    '''Target level in dB of a norm or gain -n effect, or None.'''
+    name, args = _single(effect)
+    try:
+        if name == 'norm' and len(args) == 1:
+            return float(args[0])
+        if name == 'gain' and len(args) == 2 and args[0] == '-n':
+            return float(args[1])
+    except ValueError:
+        pass
+    return None
+
+
+def _is_pointwise(effect):
+    name, args = _single(effect)
+    if name == 'gain':
+        return not any(flag in args for flag in ['-n', '-e', '-B', '-b'])
+    return name in POINTWISE_EFFECTS
+
+
+def _is_no_op(effect):
+    '''True for a vol or gain of 0 dB, a trim from 0 to the end, or a pad of
+    zero length. Arguments which cannot be parsed are not no-ops.
+    '''
+    if _gain_factor(effect) == 1.0:
+        return True
+    name, args = _single(effect)
+    try:
+        if name == 'trim' and len(args) == 1:
+            return float(args[0]) == 0
+        if name == 'pad':
+            return all(float(arg) == 0 for arg in args)
+    except ValueError:
+        pass
+    return False
+
+
+def _remove_no_ops(effect_chain):
+    for i, effect in enumerate(effect_chain):
+        if _is_no_op(effect):
+            del effect_chain[i]
+            return "removed {} (no-op)".format(_describe(effect))
+    return None
+
+
+def _cancel_reverses(effect_chain):
+    for i in range(len(effect_chain) - 1):
+        if (_single(effect_chain[i])[0] == 'reverse' and
+                _single(effect_chain[i + 1])[0] == 'reverse'):
+            del effect_chain[i:i + 2]
+            return "removed reverse reverse (no-op)"
+    return None
+
+
+def _move_trims(effect_chain):
+    for i in range(1, len(effect_chain)):
+        if (_single(effect_chain[i])[0] == 'trim' and
+                _is_pointwise(effect_chain[i - 1])):
+            effect_chain[i - 1], effect_chain[i] = (
+                effect_chain[i], effect_chain[i - 1]
+            )
+            return "moved {} before {}".format(
+                _describe(effect_chain[i - 1]), _describe(effect_chain[i])
+            )
+    return None
+
+
+def _fuse_gains(effect_chain):
+    for i in range(len(effect_chain) - 1):
+        first = _gain_factor(effect_chain[i])
+        second = _gain_factor(effect_chain[i + 1])
+        # a first gain above 1 could clip before the second one is applied
+        if first is None or second is None or not 0 < first <= 1:
+            continue
+        # a negative factor inverts the signal, which vol in dB cannot
+        if second <= 0:
+            continue
+        gain_db = 20 * math.log10(first * second)
+        fused = Effect(
+            'vol', {'gain': gain_db, 'gain_type': 'db', 'limiter_gain': None},
+            ['vol', '{:f}'.format(gain_db), 'dB']
+        )
+        change = "fused {} and {} into {}".format(
+            _describe(effect_chain[i]), _describe(effect_chain[i + 1]),
+            _describe(fused)
+        )
+        effect_chain[i:i + 2] = [fused]
+        return change
+    return None
+
+
+def _drop_before_normalize(effect_chain):
+    for i in range(len(effect_chain) - 1):
+        if _normalize_level(effect_chain[i + 1]) is None:
+            continue
+        factor = _gain_factor(effect_chain[i])
+        level = _normalize_level(effect_chain[i])
+        if ((factor is not None and 0 < factor <= 1) or
+                (level is not None and level <= 0)):
+            effect = effect_chain.pop(i)
+            return "removed {} before {}".format(
+                _describe(effect), _describe(effect_chain[i])
+            )
+    return None
+
+
+def _fold_into_normalize(effect_chain):
+    for i in range(len(effect_chain) - 1):
+        level = _normalize_level(effect_chain[i])
+        factor = _gain_factor(effect_chain[i + 1])
+        # a level above 0 dB clips before the gain is applied
+        if level is None or factor is None or level > 0 or factor <= 0:
+            continue
+        level += 20 * math.log10(factor)
+        if effect_chain[i].name == 'norm':
+            folded = Effect(
+                'norm', {'db_level': level}, ['norm', '{:f}'.format(level)]
+            )
+        else:
+            folded = Effect(
+                'gain',
+                {'gain_db': level, 'normalize': True, 'limiter': False,
+                 'balance': None},
+                ['gain', '-n', '{:f}'.format(level)]
+            )
+        change = "folded {} into {}".format(
+            _describe(effect_chain[i + 1]), _describe(folded)
+        )
+        effect_chain[i:i + 2] = [folded]
+        return change
+    return None
+
+
+def _rate(effect):
+    name, args = _single(effect)
+    if name != 'rate' or not args:
+        return None
+    try:
+        return float(args[-1])
+    except ValueError:
+        return None
+
+
+def _drop_rates(effect_chain):
+    for i in range(len(effect_chain) - 1):
+        first, second = _rate(effect_chain[i]), _rate(effect_chain[i + 1])
+        if first is not None and second is not None and first >= second:
+            effect = effect_chain.pop(i)
+            return "removed {} before {}".format(
+                _describe(effect), _describe(effect_chain[i])
+            )
+    return None
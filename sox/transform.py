@@ -8,28 +8,134 @@ This module requires that SoX is installed.
 from __future__ import print_function
 from .log import logger
 
+import copy
+import functools
+import hashlib
+import inspect
+import json
 import random
 import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
+from .core import _as_blocks
+from .core import _Blocks
+from .core import _cache_dir
+from .core import asox
 from .core import ENCODING_VALS
 from .core import is_number
 from .core import play
 from .core import sox
+from .core import sox_readinto
+from .core import sox_stream
 from .core import SoxError
+from .core import SoxiError
 from .core import VALID_FORMATS
 
+from .effect import Effect
+from .effect import _FirCoefficients
+from .metrics import _measure
+from .metrics import _phase
+from .optimize import chain_from_effects
+from .optimize import optimize_chain
+
+from . import array_effects
+from . import array_stat
 from . import file_info
 
 VERBOSITY_VALS = [0, 1, 2, 3, 4]
 
+ENGINE_VALS = ['sox', 'numpy', 'auto']
+
+BATCH_MODE_VALS = ['auto', 'concatenate', 'channels']
+
+# Effects which keep the timing of their input (up to a change of sample
+# rate) and whose output depends only on nearby input samples, so that clips
+# separated by silence can be processed back to back in one stream.
+BATCH_CONCATENATE_EFFECTS = frozenset([
+    'allpass', 'bandpass', 'bandreject', 'bass', 'biquad', 'channels',
+    'compand', 'contrast', 'dcshift', 'deemph', 'downsample', 'equalizer',
+    'fir', 'gain', 'highpass', 'hilbert', 'loudness', 'lowpass', 'mcompand',
+    'overdrive', 'rate', 'remix', 'sinc', 'swap', 'treble', 'upsample', 'vol'
+])
+
+# Effects which process every channel independently and keep the timing of
+# their input, so that clips can be processed side by side as the channels
+# of one stream.
+BATCH_CHANNELS_EFFECTS = frozenset([
+    'allpass', 'bandpass', 'bandreject', 'bass', 'biquad', 'contrast',
+    'dcshift', 'deemph', 'downsample', 'equalizer', 'fir', 'gain',
+    'highpass', 'hilbert', 'loudness', 'lowpass', 'overdrive', 'rate',
+    'sinc', 'treble', 'tremolo', 'upsample', 'vol'
+])
+
+# longer fir filters are passed to SoX in a coefficients file
+FIR_MAX_ARGS = 1024
+
 ENCODINGS_MAPPING = {
     np.int16: 's16',
     np.int8: 's8',
+    np.int32: 's32',
+    np.uint8: 'u8',
+    np.uint16: 'u16',
+    np.uint32: 'u32',
     np.float32: 'f32',
     np.float64: 'f64',
 }
 
+# dtype of arrays of packed 24 bit signed integer samples, 3 bytes each in
+# native byte order, as SoX reads and writes them with -t s24
+INT24 = np.dtype('V3')
+
+# dtypes of array outputs, by numpy kind and number of bits
+_ARRAY_DTYPES = {
+    ('i', 8): np.dtype(np.int8),
+    ('i', 16): np.dtype(np.int16),
+    ('i', 24): INT24,
+    ('i', 32): np.dtype(np.int32),
+    ('u', 8): np.dtype(np.uint8),
+    ('u', 16): np.dtype(np.uint16),
+    ('u', 32): np.dtype(np.uint32),
+    ('f', 32): np.dtype(np.float32),
+    ('f', 64): np.dtype(np.float64),
+}
+
+_SOX_ENCODING_KINDS = {
+    'signed-integer': 'i',
+    'unsigned-integer': 'u',
+    'floating-point': 'f',
+}
+_ENCODING_NAMES = {kind: name for name, kind in _SOX_ENCODING_KINDS.items()}
+
+
+def _effect_method(method):
+    '''Decorator for Transformer methods which add an effect: records an
+    Effect with the method's arguments and the SoX arguments it added in
+    Transformer.effect_chain.
+    '''
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        n_effects, n_log = len(self.effects), len(self.effects_log)
+        result = method(self, *args, **kwargs)
+        if len(self.effects_log) > n_log:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = copy.deepcopy(bound.arguments)
+            del params['self']
+            self.effect_chain.append(
+                Effect(self.effects_log[-1], params, self.effects[n_effects:])
+            )
+        return result
+    return wrapper
+
 
 class Transformer(object):
     '''Audio file transformer.
@@ -47,8 +153,16 @@ class Transformer(object):
 
     '''
 
-    def __init__(self):
+    def __init__(self, seed=None):
         '''
+        Parameters
+        ----------
+        seed : int or None, default=None
+            Seed for the random number generator which fills in unspecified
+            parameters of randomized effects (such as chorus), making effect
+            chains reproducible. If None, the module-level functions of
+            `random` are used, so `random.seed` still applies.
+
         Attributes
         ----------
         input_format : list of str
@@ -59,8 +173,14 @@ class Transformer(object):
             Effects arguments that will be passed to SoX.
         effects_log : list of str
             Ordered sequence of effects applied.
+        effect_chain : list of Effect
+            One record per effect, with the parameters it was added with and
+            its part of effects.
         globals : list of str
             Global arguments that will be passed to SoX.
+        rng : random.Random or None
+            Random number generator used by randomized effects, or None if
+            no seed was given.
 
         '''
         self.input_format = []
@@ -68,10 +188,13 @@ class Transformer(object):
 
         self.effects = []
         self.effects_log = []
+        self.effect_chain = []
 
         self.globals = []
         self.set_globals()
 
+        self.rng = None if seed is None else random.Random(seed)
+
     def set_globals(self, dither=False, guard=False, multithread=False,
                     replay_gain=False, verbosity=2):
         '''Sets SoX's global arguments.
@@ -420,17 +543,217 @@ class Transformer(object):
         '''
         self.effects = list()
         self.effects_log = list()
+        self.effect_chain = list()
         return self
 
+    def set_effect_chain(self, effect_chain):
+        '''Replace all effects with a list of effect records, for example
+        the effect_chain of another Transformer, or records restored with
+        Effect.from_dict.
+
+        Parameters
+        ----------
+        effect_chain : list of Effect
+            Effects to apply, in order.
+
+        '''
+        if not isinstance(effect_chain, list):
+            raise ValueError("effect_chain must be a list.")
+        if not all(isinstance(effect, Effect) for effect in effect_chain):
+            raise ValueError("effect_chain must contain Effect objects.")
+
+        self.effects = [arg for effect in effect_chain for arg in effect.args]
+        self.effects_log = [effect.name for effect in effect_chain]
+        self.effect_chain = list(effect_chain)
+        return self
+
+    def _effect_chain_matches(self):
+        '''Whether effect_chain still describes effects and effects_log,
+        which may have been modified directly.
+        '''
+        return (
+            [effect.name for effect in self.effect_chain] ==
+            self.effects_log and
+            [arg for effect in self.effect_chain for arg in effect.args] ==
+            self.effects
+        )
+
+    def optimize(self):
+        '''Rewrite the chain of effects into an equivalent, cheaper one.
+
+        Redundant effects are removed, consecutive gains are fused and trim
+        is moved before effects which act on each sample independently; the
+        output is unchanged up to the rounding of samples. See
+        `sox.optimize` for the list of rewrites.
+
+        Returns
+        -------
+        changes : list of str
+            Description of each change which was made. If the effects were
+            modified by hand and no longer match effects_log, nothing is
+            changed and the list is empty.
+
+        '''
+        effect_chain = self.effect_chain
+        if not self._effect_chain_matches():
+            try:
+                effect_chain = chain_from_effects(
+                    self.effects, self.effects_log
+                )
+            except ValueError as error_msg:
+                logger.warning("Effects were not optimized: %s", error_msg)
+                return []
+
+        effect_chain, changes = optimize_chain(effect_chain)
+        for change in changes:
+            logger.info("Optimized effects: %s", change)
+        self.set_effect_chain(effect_chain)
+        return changes
+
+    def _parse_inputs(self, input_filepath, input_array, sample_rate_in):
+        '''Private helper function for parsing the inputs of build and
+        stream.
+
+        Returns
+        -------
+        input_format : list
+            Input format arguments.
+        input_filepath : str
+            Path to the input file, or '-' for array input.
+        channels_in : int
+            Number of input channels.
+        encoding : np.dtype or None
+            dtype of input_array, or None for file input.
+        '''
+        if input_filepath is not None and input_array is not None:
+            raise ValueError(
+                "Only one of input_filepath and input_array may be specified"
+            )
+
+        # set input parameters
+        input_format = self.input_format
+        encoding = None
+        if input_filepath is not None:
+            file_info.validate_input_file(input_filepath)
+            channels_in = file_info.channels(input_filepath)
+        elif input_array is not None:
+            if isinstance(input_array, _Blocks):
+                # the format is taken from the first block
+                input_array = input_array.first
+            if not isinstance(input_array, np.ndarray):
+                raise TypeError(
+                    "input_array must be a numpy array, an iterator of numpy "
+                    "arrays or None"
+                )
+            if sample_rate_in is None:
+                raise ValueError(
+                    "sample_rate_in must be specified if input_array is specified"
+                )
+            input_filepath = '-'
+            channels_in = (
+                input_array.shape[-1] if len(input_array.shape) > 1 else 1
+            )
+            encoding = input_array.dtype
+            input_format = self._input_format_args(
+                _sox_file_type(encoding), sample_rate_in, None,
+                channels_in, None, False
+            )
+        else:
+            raise ValueError(
+                "One of input_filepath or input_array must be specified"
+            )
+
+        return input_format, input_filepath, channels_in, encoding
+
+    def _array_output_args(self, channels_in, encoding, sample_rate_in):
+        '''Private helper function for the output format of build and stream
+        when the output is an array.
+
+        Returns
+        -------
+        output_format : list
+            Output format arguments.
+        channels_out : int
+            Number of output channels.
+        encoding_out : np.dtype
+            dtype of the output array.
+        '''
+        ignored_commands = ['rate', 'channels', 'convert']
+        if len(list(set(ignored_commands) & set(self.effects_log))) > 0:
+            logger.warning(
+                "When outputting to an array, rate, channels and convert" +
+                " effects may be ignored. Use set_output_format() to " +
+                "specify output formats."
+            )
+
+        output_format = self.output_format
+        channels_out = channels_in
+        encoding_out = np.dtype(np.int16 if encoding is None else encoding)
+        kind, n_bits = _dtype_kind_bits(encoding_out)
+        if output_format == []:
+            output_format = self._output_format_args(
+                'raw', sample_rate_in, n_bits, channels_out,
+                _ENCODING_NAMES[kind], None, True
+            )
+        else:
+            output_format = list(output_format)
+            channels_idx = [
+                i for i, f in enumerate(output_format) if f == '-c'
+            ]
+            if len(channels_idx) == 1:
+                channels_out = int(output_format[channels_idx[0] + 1])
+
+            bits_idx = [
+                i for i, f in enumerate(output_format) if f == '-b'
+            ]
+            encoding_idx = [
+                i for i, f in enumerate(output_format) if f == '-e'
+            ]
+            if len(encoding_idx) == 1:
+                sox_encoding = output_format[encoding_idx[0] + 1]
+                if sox_encoding not in _SOX_ENCODING_KINDS:
+                    raise ValueError(
+                        "encoding {} cannot be output to an array".format(
+                            sox_encoding
+                        )
+                    )
+                kind = _SOX_ENCODING_KINDS[sox_encoding]
+            if len(bits_idx) == 1:
+                n_bits = int(output_format[bits_idx[0] + 1])
+            if (kind, n_bits) not in _ARRAY_DTYPES:
+                if len(encoding_idx) == 0:
+                    # -b alone keeps the input's encoding where it can,
+                    # otherwise use signed integers, or floats for 64 bits
+                    kind = 'f' if n_bits == 64 else 'i'
+                elif len(bits_idx) == 0:
+                    # e.g. 16 bit input with -e floating-point
+                    n_bits = 32
+            if (kind, n_bits) not in _ARRAY_DTYPES:
+                raise ValueError("invalid n_bits {}".format(n_bits))
+            encoding_out = _ARRAY_DTYPES[(kind, n_bits)]
+
+            # state the sample format explicitly, so that SoX writes
+            # exactly the bytes of encoding_out
+            if len(bits_idx) == 0:
+                output_format.extend(['-b', '{}'.format(n_bits)])
+            if len(encoding_idx) == 0:
+                output_format.extend(['-e', _ENCODING_NAMES[kind]])
+
+        return output_format, channels_out, encoding_out
+
     def build(self, input_filepath=None, output_filepath=None,
               input_array=None, sample_rate_in=None,
-              extra_args=None, return_output=False):
+              extra_args=None, return_output=False, out=None,
+              memmap_filepath=None, engine='sox'):
         '''Builds the output file or output numpy array by executing the
         current set of commands. This function returns either the status
         of the command (when output_filepath is specified and return_output
         is False), or it returns a triple of (status, out, err) when
         output_filepath is None or return_output is True.
 
+        If a hook is installed with sox.metrics.set_metrics_hook, it receives
+        the timings and resource usage of each build.
+
         Parameters
         ----------
         input_filepath : str or None
@@ -440,10 +763,23 @@ class Transformer(object):
             the given path, the file will be overwritten.
             If None, the output will be returned as an np.ndarray.
             If '-n', no file is created.
-        input_array : np.ndarray or None
+        input_array : np.ndarray, iterator of np.ndarray, or None
             A np.ndarray of an waveform with shape (n_samples, n_channels).
             If this argument is passed, sample_rate_in must also be provided.
             If None, input_filepath must be specified.
+            An iterator (e.g. a generator) of such arrays is written to SoX
+            block by block on a separate thread: the next block is only
+            requested once SoX has room for it, so memory use does not grow
+            with the length of the input. All blocks must have the dtype
+            and number of channels of the first one. An exception raised by
+            the iterator is raised by build, after SoX has finished. Builds
+            from an iterator always start SoX directly and are not cached.
+            The dtype may be any of ENCODINGS_MAPPING, or INT24 for packed
+            24 bit samples; the array's bytes are passed to SoX unconverted.
+            When output_filepath is None the output has the dtype of
+            input_array (int16 for file input), unless set_output_format
+            gives the bits and/or encoding, e.g. bits=32 gives int32 for
+            integer input and float32 for float input.
         sample_rate_in : int
             Sample rate of input_array.
             This argument is ignored if input_array is None.
@@ -456,6 +792,30 @@ class Transformer(object):
             stdout as a tuple (status, stdout, stderr).
             If output_filepath is None, return_output=True by default.
             If False, returns True on success.
+        out : np.ndarray or None, default=None
+            Preallocated array which receives the output audio when
+            output_filepath is None, so that one buffer can be reused across
+            many builds. It must be writeable and C-contiguous, with the
+            output dtype and shape (n_frames, n_channels), or (n_frames, ) for
+            mono output. It may be longer than the output; a ValueError is
+            raised if it is too short. SoX is always started directly, even
+            when a worker pool is installed. An np.memmap may be passed.
+        memmap_filepath : str or None, default=None
+            If given and output_filepath is None, SoX writes the output audio
+            as raw samples to this path, and the output is returned as an
+            np.memmap of that file instead of being held in memory, so that
+            memory use does not grow with the length of the audio. If a file
+            already exists at the given path, it will be overwritten.
+        engine : str, default='sox'
+            How the effects are applied. One of:
+                * 'sox' : always run SoX.
+                * 'numpy' : apply the effects in-process with NumPy (see
+                    array_effects). This is supported for array input and
+                    array output with the default output format, no
+                    extra_args, out or memmap_filepath, and chains made only
+                    of the effects in array_effects.SUPPORTED_EFFECTS. Other
+                    builds fall back to SoX with a warning.
+                * 'auto' : like 'numpy', but falls back to SoX silently.
 
         Returns
         -------
@@ -463,6 +823,8 @@ class Transformer(object):
             True on success.
         out : str, np.ndarray, or None
             If output_filepath is None returns the output audio as a np.ndarray
+            If out was given, this is a view of its first n_frames rows.
+            If memmap_filepath was given, this is an np.memmap.
             If output_filepath is not None and return_output is True, returns
             the stdout produced by sox.
             Otherwise, this output is not returned.
@@ -471,6 +833,10 @@ class Transformer(object):
             stderr as a string.
             Otherwise, this output is not returned.
 
+        See Also
+        --------
+        set_build_cache
+
         Examples
         --------
 
@@ -506,97 +872,302 @@ class Transformer(object):
 
         >>> status, array_out, err = tfm.build(input_array=y, sample_rate_in=sample_rate)
 
-        '''
-        if input_filepath is not None and input_array is not None:
-            raise ValueError(
-                "Only one of input_filepath and input_array may be specified"
-            )
+        array in, array out into a reused buffer
 
-        # set input parameters
-        input_format = self.input_format
-        encoding = None
-        if input_filepath is not None:
-            file_info.validate_input_file(input_filepath)
-            channels_in = file_info.channels(input_filepath)
-        elif input_array is not None:
-            if not isinstance(input_array, np.ndarray):
-                raise TypeError("input_array must be a numpy array or None")
-            if sample_rate_in is None:
-                raise ValueError(
-                    "sample_rate_in must be specified if input_array is specified"
-                )
-            input_filepath = '-'
-            channels_in = (
-                input_array.shape[-1] if len(input_array.shape) > 1 else 1
+        >>> buffer = np.zeros(sample_rate * 10)
+        >>> status, array_out, err = tfm.build(
+                input_array=y, sample_rate_in=sample_rate, out=buffer
             )
-            encoding = input_array.dtype.type
-            input_format = self._input_format_args(
-                ENCODINGS_MAPPING[encoding], sample_rate_in, None,
-                channels_in, None, False
+
+        file in, memory-mapped array out
+
+        >>> status, array_out, err = tfm.build(
+                input_filepath='path/to/long_input.wav',
+                memmap_filepath='path/to/output.raw'
             )
-        else:
-            raise ValueError(
-                "One of input_filepath or input_array must be specified"
+
+        blocks from a generator in, file out
+
+        >>> def read_blocks(connection):
+        ...     while True:
+        ...         block = connection.recv_block()
+        ...         if block is None:
+        ...             return
+        ...         yield block
+        >>> status = tfm.build(
+                input_array=read_blocks(connection),
+                sample_rate_in=sample_rate,
+                output_filepath='path/to/output.wav'
             )
 
+        '''
+        with _measure(self.effects_log):
+            with _phase('args'):
+                input_array = _as_blocks(input_array)
+                job = self._prepare_build(
+                    input_filepath, output_filepath, input_array,
+                    sample_rate_in, extra_args, return_output, out,
+                    memmap_filepath, engine
+                )
+            if job.result is not None:
+                return job.result
+
+            try:
+                if out is not None:
+                    status, n_bytes, err = sox_readinto(
+                        job.args, out, input_array
+                    )
+                    if status != 0:
+                        raise SoxError("Stderr: {}".format(err))
+                    n_frames = n_bytes // (out.itemsize * job.channels_out)
+                    out = out[:n_frames]
+                    logger.info(
+                        "Created array with effects: %s",
+                        " ".join(self.effects_log)
+                    )
+                    return status, out, err
+
+                result = sox(job.args, input_array, job.decode_out_with_utf)
+            finally:
+                job.remove_files()
+            with _phase('decode'):
+                return job.finish(*result)
+
+    async def abuild(self, input_filepath=None, output_filepath=None,
+                     input_array=None, sample_rate_in=None, extra_args=None,
+                     return_output=False, memmap_filepath=None,
+                     engine='sox'):
+        '''Asynchronous version of build, for use on an asyncio event loop.
+
+        SoX is run with core.asox: the event loop is not blocked while it
+        runs, the number of concurrent SoX processes is limited by
+        core.set_async_limit, and cancelling the calling task kills the SoX
+        process. The parameters and return values are the same as for
+        build, except that out and iterators of blocks as input_array are
+        not supported.
+
+        Examples
+        --------
+        >>> import asyncio
+        >>> import sox
+        >>> tfm = sox.Transformer()
+        >>> tfm.pitch(2.0)
+        >>> async def main(paths):
+        ...     return await asyncio.gather(*[
+        ...         tfm.abuild(input_filepath=path) for path in paths
+        ...     ])
+        >>> results = asyncio.run(main(['a.wav', 'b.wav']))
+
+        '''
+        if isinstance(input_array, Iterator):
+            raise TypeError("abuild does not support iterators as input_array")
+        with _measure(self.effects_log):
+            with _phase('args'):
+                job = self._prepare_build(
+                    input_filepath, output_filepath, input_array,
+                    sample_rate_in, extra_args, return_output, None,
+                    memmap_filepath, engine
+                )
+            if job.result is not None:
+                return job.result
+
+            try:
+                result = await asox(
+                    job.args, input_array, job.decode_out_with_utf
+                )
+            finally:
+                job.remove_files()
+            with _phase('decode'):
+                return job.finish(*result)
+
+    def _prepare_build(self, input_filepath, output_filepath, input_array,
+                       sample_rate_in, extra_args, return_output, out,
+                       memmap_filepath, engine):
+        '''Validate the arguments of build and assemble the SoX command.
+
+        Returns
+        -------
+        job : _BuildJob
+            The SoX arguments and how to process SoX's output. If the output
+            was produced without running SoX (numpy engine, build cache),
+            it is in job.result.
+
+        '''
+        input_format, input_filepath, channels_in, encoding = \
+            self._parse_inputs(input_filepath, input_array, sample_rate_in)
+
         # set output parameters
         output_format = self.output_format
         if output_filepath is not None:
+            if out is not None or memmap_filepath is not None:
+                raise ValueError(
+                    "out and memmap_filepath can only be used when "
+                    "output_filepath is None."
+                )
             if input_filepath == output_filepath:
                 raise ValueError(
                     "input_filepath must be different from output_filepath."
                 )
             file_info.validate_output_file(output_filepath)
             array_output = False
+            channels_out = encoding_out = None
         else:
-            ignored_commands = ['rate', 'channels', 'convert']
-            if len(list(set(ignored_commands) & set(self.effects_log))) > 0:
-                logger.warning(
-                    "When outputting to an array, rate, channels and convert" +
-                    " effects may be ignored. Use set_output_format() to " +
-                    "specify output formats."
+            output_format, channels_out, encoding_out = \
+                self._array_output_args(channels_in, encoding, sample_rate_in)
+            array_output = True
+            if out is not None and memmap_filepath is not None:
+                raise ValueError(
+                    "Only one of out and memmap_filepath may be specified"
                 )
+            if out is not None:
+                _validate_out_array(out, channels_out, encoding_out)
+            if memmap_filepath is not None:
+                if input_filepath == memmap_filepath:
+                    raise ValueError(
+                        "input_filepath must be different from "
+                        "memmap_filepath."
+                    )
+                file_info.validate_output_file(memmap_filepath)
+                output_filepath = memmap_filepath
+            else:
+                output_filepath = '-'
 
-            output_filepath = '-'
-            channels_out = channels_in
-            encoding_out = (np.int16 if encoding is None else encoding)
-            n_bits = np.dtype(encoding_out).itemsize * 8
-            if output_format == []:
-                output_format = self._output_format_args(
-                    'raw', sample_rate_in, n_bits,
-                    channels_out, None, None, True
-                )
+        args = []
+        args.extend(self.globals)
+        args.extend(input_format)
+        args.append(input_filepath)
+        args.extend(output_format)
+        args.append(output_filepath)
+        args.extend(self.effects)
+
+        if extra_args is not None:
+            if not isinstance(extra_args, list):
+                raise ValueError("extra_args must be a list.")
+            args.extend(extra_args)
+
+        if engine not in ENGINE_VALS:
+            raise ValueError(
+                "engine must be one of {}".format(', '.join(ENGINE_VALS))
+            )
+
+        if engine != 'sox':
+            reason = _numpy_engine_unsupported(
+                self.globals, self.output_format, input_array, array_output,
+                extra_args, out, memmap_filepath
+            )
+            if reason is None:
+                try:
+                    with _phase('numpy'):
+                        out = array_effects.apply_effects(
+                            input_array, sample_rate_in, self.effects,
+                            channels_out, encoding_out
+                        )
+                    logger.info(
+                        "Created array in-process with effects: %s",
+                        " ".join(self.effects_log)
+                    )
+                    return _BuildJob(args, result=(0, out, ''))
+                except ValueError as error_msg:
+                    reason = str(error_msg)
+            log_fallback = logger.warning if engine == 'numpy' else logger.info
+            log_fallback("Falling back to SoX: %s", reason)
+
+        cache_key = None
+        if _BUILD_CACHE is not None and \
+                not isinstance(input_array, _Blocks) and _is_cacheable(
+                self.globals, self.rng is not None, self.effects_log,
+                extra_args, output_filepath, out, memmap_filepath,
+                return_output and not array_output):
+            if array_output:
+                output_type = [str(np.dtype(encoding_out)), channels_out]
             else:
-                channels_idx = [
-                    i for i, f in enumerate(output_format) if f == '-c'
-                ]
-                if len(channels_idx) == 1:
-                    channels_out = int(output_format[channels_idx[0] + 1])
-
-                bits_idx = [
-                    i for i, f in enumerate(output_format) if f == '-b'
-                ]
-                if len(bits_idx) == 1:
-                    n_bits = int(output_format[bits_idx[0] + 1])
-                    if n_bits == 8:
-                        encoding_out = np.int8
-                    elif n_bits == 16:
-                        encoding_out = np.int16
-                    elif n_bits == 32:
-                        encoding_out = np.float32
-                    elif n_bits == 64:
-                        encoding_out = np.float64
-                    else:
-                        raise ValueError("invalid n_bits {}".format(n_bits))
+                output_type = file_info.file_extension(output_filepath)
+            cache_key = _BUILD_CACHE.key(
+                input_filepath, input_array, sample_rate_in,
+                [self.globals, input_format, output_format, self.effects,
+                 extra_args, output_type]
+            )
+            cached = _BUILD_CACHE.load(
+                cache_key, None if array_output else output_filepath
+            )
+            if cached is not None:
+                logger.info(
+                    "Loaded cached output with effects: %s",
+                    " ".join(self.effects_log)
+                )
+                return _BuildJob(
+                    args, result=(0, cached, '') if array_output else True
+                )
 
-            array_output = True
+        args, fir_files = _write_fir_files(args)
+        return _BuildJob(
+            args, effects_log=self.effects_log,
+            output_filepath=output_filepath, return_output=return_output,
+            array_output=array_output, channels_out=channels_out,
+            encoding_out=encoding_out, memmap_filepath=memmap_filepath,
+            cache_key=cache_key, fir_files=fir_files
+        )
+
+    def stream(self, input_filepath=None, input_array=None,
+               sample_rate_in=None, blocksize=65536, extra_args=None):
+        '''Executes the current set of commands and yields the output audio
+        in blocks as SoX produces it, so that memory use does not depend on
+        the length of the audio.
+
+        The output format follows the same rules as build with
+        output_filepath=None. Streaming always starts SoX directly, even when
+        a worker pool is installed.
+
+        Parameters
+        ----------
+        input_filepath : str or None
+            Either path to input audio file or None.
+        input_array : np.ndarray, iterator of np.ndarray, or None
+            A np.ndarray of an waveform with shape (n_samples, n_channels).
+            If this argument is passed, sample_rate_in must also be provided.
+            If None, input_filepath must be specified.
+            An iterator of such arrays is written to SoX block by block, as
+            in build, so that live input of any length can be processed in
+            bounded memory while output blocks are being yielded.
+        sample_rate_in : int
+            Sample rate of input_array.
+            This argument is ignored if input_array is None.
+        blocksize : int, default=65536
+            Number of frames per yielded block. The last block may be
+            shorter.
+        extra_args : list or None, default=None
+            If a list is given, these additional arguments are passed to SoX
+            at the end of the list of effects.
+
+        Yields
+        ------
+        block : np.ndarray
+            Output audio of shape (n_frames, n_channels), or (n_frames, ) if
+            the output has one channel, like the arrays returned by build.
+
+        Examples
+        --------
+        >>> tfm = sox.Transformer()
+        >>> tfm.tempo(1.5)
+        >>> for block in tfm.stream('path/to/long_input.wav', blocksize=4096):
+        ...     process(block)
+
+        '''
+        if not isinstance(blocksize, int) or blocksize <= 0:
+            raise ValueError("blocksize must be a positive integer.")
+
+        input_array = _as_blocks(input_array)
+        input_format, input_filepath, channels_in, encoding = \
+            self._parse_inputs(input_filepath, input_array, sample_rate_in)
+        output_format, channels_out, encoding_out = \
+            self._array_output_args(channels_in, encoding, sample_rate_in)
 
         args = []
         args.extend(self.globals)
         args.extend(input_format)
         args.append(input_filepath)
         args.extend(output_format)
-        args.append(output_filepath)
+        args.append('-')
         args.extend(self.effects)
 
         if extra_args is not None:
@@ -604,36 +1175,334 @@ class Transformer(object):
                 raise ValueError("extra_args must be a list.")
             args.extend(extra_args)
 
-        decode_out_with_utf = not array_output
-        status, out, err = sox(args, input_array, decode_out_with_utf)
-        if status != 0:
-            raise SoxError(
-                "Stdout: {}\nStderr: {}".format(out, err)
+        frame_size = channels_out * np.dtype(encoding_out).itemsize
+        args, fir_files = _write_fir_files(args)
+        try:
+            for chunk in sox_stream(
+                    args, input_array, blocksize * frame_size):
+                block = np.frombuffer(chunk, dtype=encoding_out)
+                if channels_out > 1:
+                    block = block.reshape(-1, channels_out)
+                yield block
+        finally:
+            _remove_files(fir_files)
+
+        logger.info(
+            "Streamed array with effects: %s", " ".join(self.effects_log)
+        )
+
+    def build_many(self, input_filepath_list, output_filepath_list,
+                   n_jobs=None, extra_args=None):
+        '''Applies the current set of commands to many files in parallel.
+        Each file is processed by its own SoX call, run on a pool of n_jobs
+        threads. A failing file does not stop the batch; its error is
+        recorded in the result instead. The overall throughput is logged,
+        and can be computed from the start and end times of the results.
+
+        Parameters
+        ----------
+        input_filepath_list : list of str
+            Paths to input audio files.
+        output_filepath_list : list of str
+            Paths to output audio files, in the same order as
+            input_filepath_list.
+        n_jobs : int or None, default=None
+            Number of SoX calls to run concurrently. If None, uses the number
+            of CPUs.
+        extra_args : list or None, default=None
+            Additional arguments passed to each call to build.
+
+        Returns
+        -------
+        results : list of dict
+            One dictionary per input file, in order, with fields:
+                * input_filepath
+                * output_filepath
+                * status : True on success, False otherwise
+                * error : the raised exception, or None on success
+                * start_time : time.perf_counter() when the build started
+                * end_time : time.perf_counter() when the build ended
+                * elapsed : duration of the build in seconds
+
+        Examples
+        --------
+        >>> results = tfm.build_many(input_paths, output_paths, n_jobs=8)
+        >>> wall_time = (
+        ...     max(result['end_time'] for result in results) -
+        ...     min(result['start_time'] for result in results)
+        ... )
+        >>> files_per_second = len(results) / wall_time
+
+        '''
+        if not isinstance(input_filepath_list, list):
+            raise TypeError("input_filepath_list must be a list.")
+
+        if not isinstance(output_filepath_list, list):
+            raise TypeError("output_filepath_list must be a list.")
+
+        if len(input_filepath_list) != len(output_filepath_list):
+            raise ValueError(
+                "input_filepath_list and output_filepath_list must be the "
+                "same length."
             )
 
-        if array_output:
-            out = np.frombuffer(out, dtype=encoding_out)
-            if channels_out > 1:
-                out = out.reshape(
-                    (channels_out, int(len(out) / channels_out)), order='F'
-                ).T
-            logger.info(
-                "Created array with effects: %s",
-                " ".join(self.effects_log)
+        if n_jobs is not None and (not isinstance(n_jobs, int) or n_jobs <= 0):
+            raise ValueError("n_jobs must be a positive integer or None.")
+
+        def build_one(paths):
+            input_filepath, output_filepath = paths
+            result = {
+                'input_filepath': input_filepath,
+                'output_filepath': output_filepath,
+                'status': False,
+                'error': None,
+                'start_time': time.perf_counter()
+            }
+            try:
+                result['status'] = self.build(
+                    input_filepath, output_filepath, extra_args=extra_args
+                )
+            except (SoxError, SoxiError, IOError, ValueError,
+                    TypeError) as error:
+                logger.warning(
+                    "Failed to build %s: %s", output_filepath, error
+                )
+                result['error'] = error
+            result['end_time'] = time.perf_counter()
+            result['elapsed'] = result['end_time'] - result['start_time']
+            return result
+
+        start_time = time.perf_counter()
+        n_workers = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(
+                build_one, zip(input_filepath_list, output_filepath_list)
+            ))
+        elapsed = time.perf_counter() - start_time
+
+        n_success = sum(result['status'] for result in results)
+        logger.info(
+            "Built %s of %s files in %.3f seconds (%.2f files/second)",
+            n_success, len(results), elapsed,
+            len(results) / elapsed if elapsed > 0 else float('inf')
+        )
+        return results
+
+    def build_batch(self, arrays, sample_rate, mode='auto', guard=0.1,
+                    max_channels=256):
+        '''Applies the current set of commands to a batch of arrays with as
+        few SoX calls as possible, instead of one call per array.
+
+        Two layouts are supported:
+            * 'channels': the arrays are stacked as the channels of one
+              stream, padded with silence to the longest array. The output
+              is the same as with one build per array. This requires every
+              effect to process channels independently (see
+              BATCH_CHANNELS_EFFECTS) and no output channel count to be set.
+            * 'concatenate': the arrays are concatenated in time, each one
+              followed by guard seconds of silence. Effects with memory
+              (filters, compand) see the silence of the previous guard
+              instead of a clean start, so the output of those effects
+              differs slightly from one build per array unless guard covers
+              their response. This requires every effect to keep the timing
+              of its input (see BATCH_CONCATENATE_EFFECTS).
+
+        Normalizing effects (norm, gain with normalize=True or balance) and
+        effects which shift, stretch or extend the audio are supported by
+        neither layout.
+
+        Parameters
+        ----------
+        arrays : list of np.ndarray
+            Arrays of shape (n_samples, n_channels) or (n_samples, ), all
+            with the same number of channels and dtype. Their lengths may
+            differ.
+        sample_rate : int
+            Sample rate of the arrays.
+        mode : str, default='auto'
+            One of 'channels', 'concatenate' or 'auto'. If 'auto', uses
+            'channels' if the effects allow it, otherwise 'concatenate' if
+            the effects allow it, otherwise one build per array. If
+            'channels' or 'concatenate' and the effects do not allow it, a
+            ValueError is raised.
+        guard : float, default=0.1
+            Duration in seconds of the silence after each array with
+            mode='concatenate'.
+        max_channels : int, default=256
+            Maximum number of channels per SoX call with mode='channels'.
+            Larger batches are split into several calls.
+
+        Returns
+        -------
+        outputs : list of np.ndarray
+            The output array of each input array, in order, as returned by
+            build. With a single SoX call they are views into one output
+            array. If the sample rate changes, output lengths are rounded
+            and may differ by one sample from those of separate builds.
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> import sox
+        >>> tfm = sox.Transformer()
+        >>> tfm.highpass(100)
+        >>> tfm.vol(0.5)
+        >>> clips = [np.random.randn(16000) for _ in range(1000)]
+        >>> outputs = tfm.build_batch(clips, 16000)
+
+        '''
+        if not isinstance(arrays, list):
+            raise TypeError("arrays must be a list.")
+        for array in arrays:
+            if not isinstance(array, np.ndarray) or array.ndim not in (1, 2):
+                raise TypeError(
+                    "arrays must contain 1 or 2 dimensional numpy arrays."
+                )
+        if len(set(_n_channels(array) for array in arrays)) > 1:
+            raise ValueError("arrays must have the same number of channels.")
+        if len(set(array.dtype for array in arrays)) > 1:
+            raise ValueError("arrays must have the same dtype.")
+        if not is_number(sample_rate) or sample_rate <= 0:
+            raise ValueError("sample_rate must be a positive number.")
+        if mode not in BATCH_MODE_VALS:
+            raise ValueError(
+                "mode must be one of {}".format(', '.join(BATCH_MODE_VALS))
             )
-        else:
+        if not is_number(guard) or guard < 0:
+            raise ValueError("guard must be a non-negative number.")
+        if not isinstance(max_channels, int) or max_channels <= 0:
+            raise ValueError("max_channels must be a positive integer.")
+
+        if len(arrays) == 0:
+            return []
+
+        supported_modes = self._batch_modes()
+        if mode == 'auto':
+            mode = supported_modes[0] if supported_modes else None
+        elif mode not in supported_modes:
+            raise ValueError(
+                "The effects {} cannot be applied with mode='{}'.".format(
+                    self.effects_log, mode
+                )
+            )
+
+        if mode is None:
             logger.info(
-                "Created %s with effects: %s",
-                output_filepath,
-                " ".join(self.effects_log)
+                "Building %s arrays one by one: effects %s cannot be "
+                "batched", len(arrays), " ".join(self.effects_log)
             )
+            return [
+                self.build(input_array=array, sample_rate_in=sample_rate)[1]
+                for array in arrays
+            ]
+
+        rate_ratio = self._output_sample_rate(sample_rate) / sample_rate
+        if mode == 'channels':
+            return self._build_batch_channels(
+                arrays, sample_rate, rate_ratio, max_channels
+            )
+        return self._build_batch_concatenate(
+            arrays, sample_rate, rate_ratio, guard
+        )
 
-        if return_output or array_output:
-            return status, out, err
-        else:
-            if out is not None:
-                logger.info("[SoX] {}".format(out))
-            return True
+    def _batch_modes(self):
+        '''Batch layouts of build_batch which the current effects allow,
+        in order of preference.
+        '''
+        if not self._effect_chain_matches():
+            return []
+
+        names = set()
+        for effect in self.effect_chain:
+            if effect.name == 'gain' and (
+                    effect.params['normalize'] or
+                    effect.params['balance'] is not None):
+                return []
+            names.add(effect.name)
+
+        modes = []
+        if names <= BATCH_CHANNELS_EFFECTS and '-c' not in self.output_format:
+            modes.append('channels')
+        if names <= BATCH_CONCATENATE_EFFECTS:
+            modes.append('concatenate')
+        return modes
+
+    def _output_sample_rate(self, sample_rate_in):
+        '''Sample rate of the array output of build.'''
+        if '-r' in self.output_format:
+            return float(
+                self.output_format[self.output_format.index('-r') + 1]
+            )
+        return float(sample_rate_in)
+
+    def _build_batch_channels(self, arrays, sample_rate, rate_ratio,
+                              max_channels):
+        '''build_batch with the arrays stacked as channels.'''
+        n_channels = _n_channels(arrays[0])
+        per_call = max(1, max_channels // n_channels)
+
+        outputs = []
+        for start in range(0, len(arrays), per_call):
+            group = arrays[start:start + per_call]
+            stacked = np.zeros(
+                (max(len(array) for array in group), n_channels * len(group)),
+                dtype=arrays[0].dtype
+            )
+            for i, array in enumerate(group):
+                stacked[:len(array), i * n_channels:(i + 1) * n_channels] = \
+                    array.reshape(len(array), n_channels)
+
+            _, out, _ = self.build(
+                input_array=stacked, sample_rate_in=sample_rate
+            )
+            out = out.reshape(len(out), -1)
+            for i, array in enumerate(group):
+                n_out = int(round(len(array) * rate_ratio))
+                # build returns mono output as (n_samples, ), whatever the
+                # shape of its input
+                if n_channels == 1:
+                    outputs.append(out[:n_out, i])
+                else:
+                    outputs.append(
+                        out[:n_out, i * n_channels:(i + 1) * n_channels]
+                    )
+
+        logger.info(
+            "Built %s arrays in %s SoX calls by stacking channels",
+            len(arrays), len(range(0, len(arrays), per_call))
+        )
+        return outputs
+
+    def _build_batch_concatenate(self, arrays, sample_rate, rate_ratio,
+                                 guard):
+        '''build_batch with the arrays concatenated in time.'''
+        n_channels = _n_channels(arrays[0])
+        n_guard = int(round(guard * sample_rate))
+
+        starts = np.cumsum(
+            [0] + [len(array) + n_guard for array in arrays]
+        )
+        concatenated = np.zeros(
+            (starts[-1], n_channels), dtype=arrays[0].dtype
+        )
+        for start, array in zip(starts, arrays):
+            concatenated[start:start + len(array)] = \
+                array.reshape(len(array), n_channels)
+
+        _, out, _ = self.build(
+            input_array=concatenated, sample_rate_in=sample_rate
+        )
+
+        outputs = []
+        for start, array in zip(starts, arrays):
+            start_out = int(round(start * rate_ratio))
+            n_out = int(round(len(array) * rate_ratio))
+            outputs.append(out[start_out:start_out + n_out])
+
+        logger.info(
+            "Built %s arrays in one SoX call by concatenation", len(arrays)
+        )
+        return outputs
 
     def preview(self, input_filepath):
         '''Play a preview of the output with the current set of effects
@@ -650,8 +1519,13 @@ class Transformer(object):
         args.append(input_filepath)
         args.extend(self.effects)
 
-        play(args)
+        args, fir_files = _write_fir_files(args)
+        try:
+            play(args)
+        finally:
+            _remove_files(fir_files)
 
+    @_effect_method
     def allpass(self, frequency, width_q=2.0):
         '''Apply a two-pole all-pass filter. An all-pass filter changes the
         audio’s frequency to phase relationship without changing its frequency
@@ -684,6 +1558,7 @@ class Transformer(object):
         self.effects_log.append('allpass')
         return self
 
+    @_effect_method
     def bandpass(self, frequency, width_q=2.0, constant_skirt=False):
         '''Apply a two-pole Butterworth band-pass filter with the given central
         frequency, and (3dB-point) band-width. The filter rolls off at 6dB per
@@ -725,6 +1600,7 @@ class Transformer(object):
         self.effects_log.append('bandpass')
         return self
 
+    @_effect_method
     def bandreject(self, frequency, width_q=2.0):
         '''Apply a two-pole Butterworth band-reject filter with the given
         central frequency, and (3dB-point) band-width. The filter rolls off at
@@ -760,6 +1636,7 @@ class Transformer(object):
         self.effects_log.append('bandreject')
         return self
 
+    @_effect_method
     def bass(self, gain_db, frequency=100.0, slope=0.5):
         '''Boost or cut the bass (lower) frequencies of the audio using a
         two-pole shelving filter with a response similar to that of a standard
@@ -802,6 +1679,7 @@ class Transformer(object):
         self.effects_log.append('bass')
         return self
 
+    @_effect_method
     def bend(self, n_bends, start_times, end_times, cents, frame_rate=25,
              oversample_rate=16):
         '''Changes pitch by specified amounts at specified times.
@@ -896,6 +1774,7 @@ class Transformer(object):
         self.effects_log.append('bend')
         return self
 
+    @_effect_method
     def biquad(self, b, a):
         '''Apply a biquad IIR filter with the given coefficients.
 
@@ -939,6 +1818,7 @@ class Transformer(object):
         self.effects_log.append('biquad')
         return self
 
+    @_effect_method
     def channels(self, n_channels):
         '''Change the number of channels in the audio signal. If decreasing the
         number of channels it mixes channels together, if increasing the number
@@ -965,8 +1845,10 @@ class Transformer(object):
         self.effects_log.append('channels')
         return self
 
+    @_effect_method
     def chorus(self, gain_in=0.5, gain_out=0.9, n_voices=3, delays=None,
-               decays=None, speeds=None, depths=None, shapes=None):
+               decays=None, speeds=None, depths=None, shapes=None,
+               seed=None):
         '''Add a chorus effect to the audio. This can makeasingle vocal sound
         like a chorus, but can also be applied to instrumentation.
 
@@ -1009,6 +1891,11 @@ class Transformer(object):
             If a list, the list of modulation shapes - 's' for sinusoidal or
             't' for triangular - of length n_voices.
             If None, the individual shapes are chosen automatically.
+        seed : int or None, default=None
+            Seed for choosing the automatic parameters of this effect only.
+            If None, they are drawn from the Transformer's random number
+            generator, which is set by its seed argument, or from the
+            module-level functions of `random` if neither is given.
 
         '''
         if not is_number(gain_in) or gain_in <= 0 or gain_in > 1:
@@ -1018,6 +1905,15 @@ class Transformer(object):
         if not isinstance(n_voices, int) or n_voices <= 0:
             raise ValueError("n_voices must be a positive integer.")
 
+        if seed is not None and not isinstance(seed, int):
+            raise ValueError("seed must be an integer or None.")
+        if seed is not None:
+            rng = random.Random(seed)
+        elif self.rng is not None:
+            rng = self.rng
+        else:
+            rng = random
+
         # validate delays
         if not (delays is None or isinstance(delays, list)):
             raise ValueError("delays must be a list or None")
@@ -1027,7 +1923,7 @@ class Transformer(object):
             if any((not is_number(p) or p < 20) for p in delays):
                 raise ValueError("the elements of delays must be numbers > 20")
         else:
-            delays = [random.uniform(40, 60) for _ in range(n_voices)]
+            delays = [rng.uniform(40, 60) for _ in range(n_voices)]
 
         # validate decays
         if not (decays is None or isinstance(decays, list)):
@@ -1040,7 +1936,7 @@ class Transformer(object):
                     "the elements of decays must be between 0 and 1"
                 )
         else:
-            decays = [random.uniform(0.3, 0.4) for _ in range(n_voices)]
+            decays = [rng.uniform(0.3, 0.4) for _ in range(n_voices)]
 
         # validate speeds
         if not (speeds is None or isinstance(speeds, list)):
@@ -1051,7 +1947,7 @@ class Transformer(object):
             if any((not is_number(p) or p <= 0) for p in speeds):
                 raise ValueError("the elements of speeds must be numbers > 0")
         else:
-            speeds = [random.uniform(0.25, 0.4) for _ in range(n_voices)]
+            speeds = [rng.uniform(0.25, 0.4) for _ in range(n_voices)]
 
         # validate depths
         if not (depths is None or isinstance(depths, list)):
@@ -1062,7 +1958,7 @@ class Transformer(object):
             if any((not is_number(p) or p <= 0) for p in depths):
                 raise ValueError("the elements of depths must be numbers > 0")
         else:
-            depths = [random.uniform(1.0, 3.0) for _ in range(n_voices)]
+            depths = [rng.uniform(1.0, 3.0) for _ in range(n_voices)]
 
         # validate shapes
         if not (shapes is None or isinstance(shapes, list)):
@@ -1073,7 +1969,7 @@ class Transformer(object):
             if any((p not in ['t', 's']) for p in shapes):
                 raise ValueError("the elements of shapes must be 's' or 't'")
         else:
-            shapes = [random.choice(['t', 's']) for _ in range(n_voices)]
+            shapes = [rng.choice(['t', 's']) for _ in range(n_voices)]
 
         effect_args = ['chorus', '{}'.format(gain_in), '{}'.format(gain_out)]
 
@@ -1090,6 +1986,7 @@ class Transformer(object):
         self.effects_log.append('chorus')
         return self
 
+    @_effect_method
     def compand(self, attack_time=0.3, decay_time=0.8, soft_knee_db=6.0,
                 tf_points=[(-70, -70), (-60, -20), (0, 0)],
                 ):
@@ -1173,6 +2070,7 @@ class Transformer(object):
         self.effects_log.append('compand')
         return self
 
+    @_effect_method
     def contrast(self, amount=75):
         '''Comparable with compression, this effect modifies an audio signal to
         make it sound louder.
@@ -1232,6 +2130,7 @@ class Transformer(object):
             self.rate(samplerate)
         return self
 
+    @_effect_method
     def dcshift(self, shift=0.0):
         '''Apply a DC shift to the audio.
 
@@ -1254,6 +2153,7 @@ class Transformer(object):
         self.effects_log.append('dcshift')
         return self
 
+    @_effect_method
     def deemph(self):
         '''Apply Compact Disc (IEC 60908) de-emphasis (a treble attenuation
         shelving filter). Pre-emphasis was applied in the mastering of some
@@ -1279,6 +2179,7 @@ class Transformer(object):
         self.effects_log.append('deemph')
         return self
 
+    @_effect_method
     def delay(self, positions):
         '''Delay one or more audio channels such that they start at the given
         positions.
@@ -1304,6 +2205,7 @@ class Transformer(object):
         self.effects_log.append('delay')
         return self
 
+    @_effect_method
     def downsample(self, factor=2):
         '''Downsample the signal by an integer factor. Only the first out of
         each factor samples is retained, the others are discarded.
@@ -1333,6 +2235,7 @@ class Transformer(object):
         self.effects_log.append('downsample')
         return self
 
+    @_effect_method
     def earwax(self):
         '''Makes audio easier to listen to on headphones. Adds ‘cues’ to 44.1kHz
         stereo audio so that when listened to on headphones the stereo image is
@@ -1348,6 +2251,7 @@ class Transformer(object):
         self.effects_log.append('earwax')
         return self
 
+    @_effect_method
     def echo(self, gain_in=0.8, gain_out=0.9, n_echos=1, delays=[60],
              decays=[0.4]):
         '''Add echoing to the audio.
@@ -1419,6 +2323,7 @@ class Transformer(object):
         self.effects_log.append('echo')
         return self
 
+    @_effect_method
     def echos(self, gain_in=0.8, gain_out=0.9, n_echos=1, delays=[60],
               decays=[0.4]):
         '''Add a sequence of echoes to the audio.
@@ -1490,6 +2395,7 @@ class Transformer(object):
         self.effects_log.append('echos')
         return self
 
+    @_effect_method
     def equalizer(self, frequency, width_q, gain_db):
         '''Apply a two-pole peaking equalisation (EQ) filter to boost or
         reduce around a given frequency.
@@ -1528,6 +2434,7 @@ class Transformer(object):
         self.effects_log.append('equalizer')
         return self
 
+    @_effect_method
     def fade(self, fade_in_len=0.0, fade_out_len=0.0, fade_shape='q'):
         '''Add a fade in and/or fade out to an audio file.
         Default fade shape is 1/4 sine wave.
@@ -1582,15 +2489,25 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def fir(self, coefficients):
         '''Use SoX’s FFT convolution engine with given FIR filter coefficients.
 
+        Filters with more than FIR_MAX_ARGS coefficients, or with
+        coefficients which cannot be written exactly with 6 decimals, are
+        passed to SoX in a coefficients file instead of on the command line.
+        The file is written at full precision to a temporary file while SoX
+        runs, and removed afterwards.
+
         Parameters
         ----------
-        coefficients : list
+        coefficients : list or np.ndarray
             fir filter coefficients
 
         '''
+        if isinstance(coefficients, np.ndarray) and coefficients.ndim == 1:
+            coefficients = coefficients.tolist()
+
         if not isinstance(coefficients, list):
             raise ValueError("coefficients must be a list.")
 
@@ -1598,13 +2515,20 @@ class Transformer(object):
             raise ValueError("coefficients must be numbers.")
 
         effect_args = ['fir']
-        effect_args.extend(['{:f}'.format(c) for c in coefficients])
+        coefficient_args = ['{:f}'.format(c) for c in coefficients]
+        if (len(coefficients) > FIR_MAX_ARGS or
+                any([float(arg) != c for arg, c in
+                     zip(coefficient_args, coefficients)])):
+            effect_args.append(_FirCoefficients(coefficients))
+        else:
+            effect_args.extend(coefficient_args)
 
         self.effects.extend(effect_args)
         self.effects_log.append('fir')
 
         return self
 
+    @_effect_method
     def flanger(self, delay=0, depth=2, regen=0, width=71, speed=0.5,
                 shape='sine', phase=25, interp='linear'):
         '''Apply a flanging effect to the audio.
@@ -1667,6 +2591,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def gain(self, gain_db=0.0, normalize=True, limiter=False, balance=None):
         '''Apply amplification or attenuation to the audio signal.
 
@@ -1727,6 +2652,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def highpass(self, frequency, width_q=0.707, n_poles=2):
         '''Apply a high-pass filter with 3dB point frequency. The filter can be
         either single-pole or double-pole. The filters roll off at 6dB per pole
@@ -1768,6 +2694,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def lowpass(self, frequency, width_q=0.707, n_poles=2):
         '''Apply a low-pass filter with 3dB point frequency. The filter can be
         either single-pole or double-pole. The filters roll off at 6dB per pole
@@ -1809,6 +2736,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def hilbert(self, num_taps=None):
         '''Apply an odd-tap Hilbert transform filter, phase-shifting the signal
         by 90 degrees. This is used in many matrix coding schemes and for
@@ -1840,6 +2768,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def loudness(self, gain_db=-10.0, reference_level=65.0):
         '''Loudness control. Similar to the gain effect, but provides
         equalisation for the human auditory system.
@@ -1879,6 +2808,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def mcompand(self, n_bands=2, crossover_frequencies=[1600],
                  attack_time=[0.005, 0.000625], decay_time=[0.1, 0.0125],
                  soft_knee_db=[6.0, None],
@@ -2076,6 +3006,7 @@ class Transformer(object):
 
         return None
 
+    @_effect_method
     def noisered(self, profile_path, amount=0.5):
         '''Reduce noise in the audio signal by profiling and filtering.
         This effect is moderately effective at removing consistent
@@ -2115,6 +3046,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def norm(self, db_level=-3.0):
         '''Normalize an audio file to a particular db level.
         This behaves identically to the gain effect with normalize=True.
@@ -2141,6 +3073,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def oops(self):
         '''Out Of Phase Stereo effect. Mixes stereo to twin-mono where each
         mono channel contains the difference between the left and right stereo
@@ -2154,6 +3087,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def overdrive(self, gain_db=20.0, colour=20.0):
         '''Apply non-linear distortion.
 
@@ -2181,6 +3115,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def pad(self, start_duration=0.0, end_duration=0.0):
         '''Add silence to the beginning or end of a file.
         Calling this with the default arguments has no effect.
@@ -2213,6 +3148,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def phaser(self, gain_in=0.8, gain_out=0.74, delay=3, decay=0.4, speed=0.5,
                modulation_shape='sinusoidal'):
         '''Apply a phasing effect to the audio.
@@ -2275,6 +3211,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def pitch(self, n_semitones, quick=False):
         '''Pitch shift the audio without changing the tempo.
 
@@ -2319,6 +3256,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def rate(self, samplerate, quality='h'):
         '''Change the audio sampling rate (i.e. resample the audio) to any
         given `samplerate`. Better the resampling quality = slower runtime.
@@ -2359,6 +3297,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def remix(self, remix_dictionary=None, num_output_channels=None):
         '''Remix the channels of an audio file.
 
@@ -2439,6 +3378,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def repeat(self, count=1):
         '''Repeat the entire audio count times.
 
@@ -2455,6 +3395,7 @@ class Transformer(object):
         self.effects.extend(effect_args)
         self.effects_log.append('repeat')
 
+    @_effect_method
     def reverb(self, reverberance=50, high_freq_damping=50, room_scale=100,
                stereo_depth=100, pre_delay=0, wet_gain=0, wet_only=False):
         '''Add reverberation to the audio using the ‘freeverb’ algorithm.
@@ -2530,6 +3471,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def reverse(self):
         '''Reverse the audio completely
         '''
@@ -2539,6 +3481,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def silence(self, location=0, silence_threshold=0.1,
                 min_silence_duration=0.1, buffer_around_silence=False):
         '''Removes silent regions from an audio file.
@@ -2616,6 +3559,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def sinc(self, filter_type='high', cutoff_freq=3000,
              stop_band_attenuation=120, transition_bw=None,
              phase_response=None):
@@ -2759,6 +3703,7 @@ class Transformer(object):
         self.effects_log.append('sinc')
         return self
 
+    @_effect_method
     def speed(self, factor):
         '''Adjust the audio speed (pitch and tempo together).
 
@@ -2796,7 +3741,8 @@ class Transformer(object):
 
         return self
 
-    def stat(self, input_filepath, scale=None, rms=False):
+    def stat(self, input_filepath=None, scale=None, rms=False,
+             input_array=None, sample_rate_in=None):
         '''Display time and frequency domain statistical information about the
         audio. Audio is passed unmodified through the SoX processing chain.
 
@@ -2808,12 +3754,18 @@ class Transformer(object):
 
         Parameters
         ----------
-        input_filepath : str
+        input_filepath : str or None
             Path to input file to compute stats on.
         scale : float or None, default=None
             If not None, scales the input by the given scale factor.
         rms : bool, default=False
             If True, scales all values by the average rms amplitude.
+        input_array : np.ndarray or None
+            A np.ndarray of an waveform with shape (n_samples, n_channels) to
+            compute stats on instead of a file. If the effects chain is empty
+            the statistics are computed with NumPy, without calling SoX.
+        sample_rate_in : int
+            Sample rate of input_array.
 
         Returns
         -------
@@ -2822,7 +3774,7 @@ class Transformer(object):
 
         See Also
         --------
-        stats, power_spectrum, sox.file_info
+        stats, power_spectrum, sox.file_info, sox.array_stat
         '''
         effect_args = ['channels', '1', 'stat']
         if scale is not None:
@@ -2833,8 +3785,27 @@ class Transformer(object):
         if rms:
             effect_args.append('-rms')
 
+        if input_array is not None and len(self.effects) == 0:
+            if input_filepath is not None:
+                raise ValueError(
+                    "Only one of input_filepath and input_array may be "
+                    "specified"
+                )
+            if not isinstance(input_array, np.ndarray):
+                raise TypeError("input_array must be a numpy array or None")
+            if sample_rate_in is None:
+                raise ValueError(
+                    "sample_rate_in must be specified if input_array is "
+                    "specified"
+                )
+            return _format_stat(
+                array_stat.stat(input_array, sample_rate_in, scale, rms)
+            )
+
         _, _, stat_output = self.build(
-            input_filepath, '-n', extra_args=effect_args, return_output=True
+            input_filepath, '-n', input_array=input_array,
+            sample_rate_in=sample_rate_in, extra_args=effect_args,
+            return_output=True
         )
 
         stat_dict = {}
@@ -2917,19 +3888,9 @@ class Transformer(object):
         _, _, stats_output = self.build(
             input_filepath, '-n', extra_args=effect_args, return_output=True
         )
+        return _parse_stats(stats_output)
 
-        stats_dict = {}
-        lines = stats_output.split('\n')
-        for line in lines:
-            split_line = line.split()
-            if len(split_line) == 0:
-                continue
-            value = split_line[-1]
-            key = ' '.join(split_line[:-1])
-            stats_dict[key] = value
-
-        return stats_dict
-
+    @_effect_method
     def stretch(self, factor, window=20):
         '''Change the audio duration (but not its pitch).
         **Unless factor is close to 1, use the tempo effect instead.**
@@ -2980,6 +3941,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def swap(self):
         '''Swap stereo channels. If the input is not stereo, pairs of channels
         are swapped, and a possible odd last channel passed through.
@@ -2997,6 +3959,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def tempo(self, factor, audio_type=None, quick=False):
         '''Time stretch audio without changing pitch.
 
@@ -3061,6 +4024,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def treble(self, gain_db, frequency=3000.0, slope=0.5):
         '''Boost or cut the treble (lower) frequencies of the audio using a
         two-pole shelving filter with a response similar to that of a standard
@@ -3104,6 +4068,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def tremolo(self, speed=6.0, depth=40.0):
         '''Apply a tremolo (low frequency amplitude modulation) effect to the
         audio. The tremolo frequency in Hz is giv en by speed, and the depth
@@ -3144,6 +4109,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def trim(self, start_time, end_time=None):
         '''Excerpt a clip from an audio file, given the start timestamp and end timestamp of the clip within the file, expressed in seconds. If the end timestamp is set to `None` or left unspecified, it defaults to the duration of the audio file.
 
@@ -3176,6 +4142,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def upsample(self, factor=2):
         '''Upsample the signal by an integer factor: zero-value samples are
         inserted between each pair of input samples. As a result, the original
@@ -3203,6 +4170,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def vad(self, location=1, normalize=True, activity_threshold=7.0,
             min_activity_duration=0.25, initial_search_buffer=1.0,
             max_gap=0.25, initial_pad=0.0):
@@ -3295,6 +4263,7 @@ class Transformer(object):
 
         return self
 
+    @_effect_method
     def vol(self, gain, gain_type='amplitude', limiter_gain=None):
         '''Apply an amplification or an attenuation to the audio signal.
 
@@ -3356,3 +4325,503 @@ class Transformer(object):
         self.effects_log.append('vol')
 
         return self
+
+
+def _format_stat(stat_dictionary):
+    '''Format the output of array_stat.stat like Transformer.stat parses
+    SoX's output: single-spaced keys and values printed as SoX does.
+    '''
+    formats = {
+        'Samples read': '{:d}',
+        'Scaled by': '{:.1f}',
+        'Rough frequency': '{:d}',
+        'Volume adjustment': '{:.3f}'
+    }
+    stat_dict = {}
+    for key, value in stat_dictionary.items():
+        key = ' '.join(key.split())
+        if formats.get(key) == '{:d}':
+            value = int(value)
+        stat_dict[key] = formats.get(key, '{:f}').format(value)
+    return stat_dict
+
+
+def _validate_out_array(out, channels_out, encoding_out):
+    '''Check that a caller-supplied output buffer for build matches the
+    output format.
+    '''
+    if not isinstance(out, np.ndarray):
+        raise TypeError("out must be a numpy array or None")
+    if out.dtype != np.dtype(encoding_out):
+        raise ValueError(
+            "out has dtype {} but the output dtype is {}".format(
+                out.dtype, np.dtype(encoding_out)
+            )
+        )
+    if channels_out == 1:
+        valid_shape = out.ndim == 1 or (out.ndim == 2 and out.shape[1] == 1)
+    else:
+        valid_shape = out.ndim == 2 and out.shape[1] == channels_out
+    if not valid_shape:
+        raise ValueError(
+            "out has shape {} but the output has {} channels".format(
+                out.shape, channels_out
+            )
+        )
+    if not out.flags['C_CONTIGUOUS'] or not out.flags['WRITEABLE']:
+        raise ValueError("out must be writeable and C-contiguous.")
+
+
+def _open_memmap(filepath, channels, encoding):
+    '''Map raw interleaved samples written by SoX to an array of shape
+    (n_frames, channels), or (n_frames, ) for mono.
+    '''
+    shape = (0, channels) if channels > 1 else (0, )
+    n_frames = os.path.getsize(filepath) // (
+        np.dtype(encoding).itemsize * channels
+    )
+    if n_frames == 0:
+        # empty files cannot be memory-mapped
+        return np.zeros(shape, dtype=encoding)
+    return np.memmap(
+        filepath, dtype=encoding, mode='r+', shape=(n_frames, ) + shape[1:]
+    )
+
+
+def set_build_cache(cache_dir=None, max_size=2 ** 30, link=False):
+    '''Enable the build cache. Outputs of Transformer.build are stored on
+    disk, keyed on a hash of the input audio (its content, or the content of
+    input_array), the globals, the input and output formats, the effects and
+    extra_args. Repeating a build then copies the cached file, or loads the
+    cached array, instead of running SoX.
+
+    Only builds of Transformers created with a seed, and with dither off
+    (see set_globals), are cached, since other outputs are not reproducible.
+    Builds which write no output ('-n'), use noiseprof or noisered, use
+    out or memmap_filepath, read input_array from an iterator of blocks, or
+    ask for SoX's stdout of a file build with return_output=True are never
+    cached.
+
+    Parameters
+    ----------
+    cache_dir : str or None, default=None
+        Directory where outputs are stored. If None, a 'build' directory
+        inside pysox's cache directory ($PYSOX_CACHE_DIR, or
+        $XDG_CACHE_HOME/pysox) is used.
+    max_size : int, default=2 ** 30
+        Maximum total size of the cached outputs in bytes. Least recently
+        used outputs are evicted first.
+    link : bool, default=False
+        If True, cached files are hard-linked to output_filepath instead of
+        copied, when possible. This is faster, but modifying the output file
+        in place then also modifies the cached copy.
+
+    See Also
+    --------
+    clear_build_cache
+
+    '''
+    global _BUILD_CACHE
+    if cache_dir is None:
+        cache_dir = os.path.join(_cache_dir(), 'build')
+    if not isinstance(cache_dir, str):
+        raise ValueError("cache_dir must be a string or None.")
+
+    if not isinstance(max_size, int) or max_size <= 0:
+        raise ValueError("max_size must be a positive integer.")
+
+    if not isinstance(link, bool):
+        raise ValueError("link must be a boolean.")
+
+    _BUILD_CACHE = _BuildCache(cache_dir, max_size, link)
+
+
+def clear_build_cache(disable=False):
+    '''Remove all outputs from the build cache.
+
+    Parameters
+    ----------
+    disable : bool, default=False
+        If True, the build cache is also disabled.
+
+    '''
+    global _BUILD_CACHE
+    if _BUILD_CACHE is not None:
+        _BUILD_CACHE.clear()
+    if disable:
+        _BUILD_CACHE = None
+
+
+class _BuildJob(object):
+    '''A build whose SoX command is ready to run: its arguments, and how
+    SoX's output is turned into the return value of build.
+    '''
+
+    def __init__(self, args, result=None, effects_log=None,
+                 output_filepath=None, return_output=False,
+                 array_output=False, channels_out=None, encoding_out=None,
+                 memmap_filepath=None, cache_key=None, fir_files=None):
+        self.args = args
+        self.result = result
+        self.effects_log = list(effects_log or [])
+        self.output_filepath = output_filepath
+        self.return_output = return_output
+        self.array_output = array_output
+        self.channels_out = channels_out
+        self.encoding_out = encoding_out
+        self.memmap_filepath = memmap_filepath
+        self.cache_key = cache_key
+        self.fir_files = list(fir_files or [])
+        self.decode_out_with_utf = (
+            not array_output or memmap_filepath is not None
+        )
+
+    def remove_files(self):
+        '''Remove the temporary files SoX read while running.'''
+        _remove_files(self.fir_files)
+        self.fir_files = []
+
+    def finish(self, status, out, err):
+        '''Return value of build, given SoX's status, stdout and stderr.'''
+        self.remove_files()
+        if status != 0:
+            raise SoxError(
+                "Stdout: {}\nStderr: {}".format(out, err)
+            )
+
+        if self.memmap_filepath is not None:
+            out = _open_memmap(
+                self.memmap_filepath, self.channels_out, self.encoding_out
+            )
+            logger.info(
+                "Created %s with effects: %s",
+                self.memmap_filepath,
+                " ".join(self.effects_log)
+            )
+            return status, out, err
+
+        if self.array_output:
+            out = np.frombuffer(out, dtype=self.encoding_out)
+            if self.channels_out > 1:
+                out = out.reshape(
+                    (self.channels_out, int(len(out) / self.channels_out)),
+                    order='F'
+                ).T
+            if self.cache_key is not None:
+                _BUILD_CACHE.store(self.cache_key, array=out)
+            logger.info(
+                "Created array with effects: %s",
+                " ".join(self.effects_log)
+            )
+        else:
+            if self.cache_key is not None:
+                _BUILD_CACHE.store(
+                    self.cache_key, filepath=self.output_filepath
+                )
+            logger.info(
+                "Created %s with effects: %s",
+                self.output_filepath,
+                " ".join(self.effects_log)
+            )
+
+        if self.return_output or self.array_output:
+            return status, out, err
+        else:
+            if out is not None:
+                logger.info("[SoX] {}".format(out))
+            return True
+
+
+def _parse_stats(stats_output):
+    '''Parse the output of SoX's stats effect into a dictionary of the
+    string values, keyed by the name of each statistic.
+    '''
+    stats_dict = {}
+    lines = stats_output.split('\n')
+    for line in lines:
+        split_line = line.split()
+        if len(split_line) == 0:
+            continue
+        value = split_line[-1]
+        key = ' '.join(split_line[:-1])
+        stats_dict[key] = value
+
+    return stats_dict
+
+
+def _write_fir_files(args):
+    '''Write the coefficients of each _FirCoefficients in a SoX argument
+    list to a temporary file.
+
+    Returns
+    -------
+    args : list
+        The arguments, with the path of each file in place of its
+        _FirCoefficients.
+    paths : list of str
+        Paths of the files, to be removed with `_remove_files` once SoX has
+        exited.
+
+    '''
+    paths = []
+    file_args = []
+    try:
+        for arg in args:
+            if isinstance(arg, _FirCoefficients):
+                fd, path = tempfile.mkstemp(prefix='pysox-fir-', suffix='.txt')
+                paths.append(path)
+                with os.fdopen(fd, 'w') as fhandle:
+                    fhandle.write(arg.text)
+                arg = path
+            file_args.append(arg)
+    except Exception:
+        _remove_files(paths)
+        raise
+    return file_args, paths
+
+
+def _remove_files(paths):
+    '''Remove files, ignoring those which no longer exist.'''
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _dtype_kind_bits(dtype):
+    '''Numpy kind ('i', 'u' or 'f') and number of bits of the samples of an
+    array dtype, counting INT24 as signed integers.
+    '''
+    if dtype == INT24:
+        return 'i', 24
+    return dtype.kind, dtype.itemsize * 8
+
+
+def _sox_file_type(dtype):
+    '''SoX raw file type ('s16', 'f32', ...) which reads the bytes of an array
+    of the given dtype as they are.
+    '''
+    if dtype == INT24:
+        return 's24'
+    if dtype.type not in ENCODINGS_MAPPING or not dtype.isnative:
+        raise ValueError(
+            "input_array has unsupported dtype {}. Must be one of {} or "
+            "INT24".format(
+                dtype, ', '.join(t.__name__ for t in ENCODINGS_MAPPING)
+            )
+        )
+    return ENCODINGS_MAPPING[dtype.type]
+
+
+def _n_channels(array):
+    '''Number of channels of an input array.'''
+    return array.shape[1] if array.ndim > 1 else 1
+
+
+def _numpy_engine_unsupported(globals_args, output_format, input_array,
+                              array_output, extra_args, out,
+                              memmap_filepath):
+    '''Reason why a build cannot use the numpy engine, or None if it can.
+    '''
+    if input_array is None:
+        return "the numpy engine requires input_array"
+    if isinstance(input_array, _Blocks):
+        return "the numpy engine does not support iterators of blocks"
+    if not array_output or out is not None or memmap_filepath is not None:
+        return "the numpy engine only returns new arrays"
+    if output_format != []:
+        return "the numpy engine does not support set_output_format"
+    if extra_args is not None:
+        return "the numpy engine does not support extra_args"
+    if '-G' in globals_args:
+        return "the numpy engine does not support guard"
+    if '-D' not in globals_args and input_array.dtype.kind != 'f':
+        return "the numpy engine does not support dither"
+    return None
+
+
+def _is_cacheable(globals_args, seeded, effects_log, extra_args,
+                  output_filepath, out, memmap_filepath, return_stdout):
+    '''Whether the output of a build may be served from the build cache.
+    Only builds which are reproducible, without dither and with a seeded
+    Transformer, are.
+    '''
+    side_effects = ['noiseprof', 'noisered']
+    extra_args = extra_args or []
+    return '-D' in globals_args and seeded and not (
+        output_filepath == '-n' or out is not None or
+        memmap_filepath is not None or return_stdout or
+        any(effect in side_effects for effect in effects_log) or
+        any(arg in side_effects for arg in extra_args)
+    )
+
+
+class _BuildCache(object):
+    '''Size-bounded, content-addressed cache of build outputs on disk.
+    Entries are files named by their key. Their sizes and the order in which
+    they were last used are kept in memory, seeded from the modification
+    times of the files found in cache_dir.
+    '''
+
+    def __init__(self, cache_dir, max_size=2 ** 30, link=False):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.link = link
+        self._lock = threading.Lock()
+        self._file_digests = {}
+        # path -> size of the entries, least recently used first
+        self._index = None
+        self._size = 0
+
+    def key(self, input_filepath, input_array, sample_rate_in, parts):
+        '''Hash of the input audio and the (JSON serializable) build
+        arguments.
+        '''
+        if input_array is not None:
+            digest = hashlib.sha256(np.ascontiguousarray(input_array))
+            digest.update(
+                '{} {} {}'.format(
+                    input_array.dtype.str, input_array.shape, sample_rate_in
+                ).encode('utf-8')
+            )
+            input_digest = digest.hexdigest()
+        else:
+            input_digest = self._file_digest(input_filepath)
+
+        return hashlib.sha256(
+            json.dumps([input_digest, parts]).encode('utf-8')
+        ).hexdigest()
+
+    def _file_digest(self, filepath):
+        '''Hash of a file's content, memoized on its path, size and
+        modification time.
+        '''
+        file_stat = os.stat(filepath)
+        file_key = (
+            os.path.abspath(filepath), file_stat.st_size,
+            file_stat.st_mtime_ns
+        )
+        with self._lock:
+            input_digest = self._file_digests.get(file_key)
+        if input_digest is None:
+            digest = hashlib.sha256()
+            with open(filepath, 'rb') as fhandle:
+                for block in iter(lambda: fhandle.read(1 << 20), b''):
+                    digest.update(block)
+            input_digest = digest.hexdigest()
+            with self._lock:
+                self._file_digests[file_key] = input_digest
+        return input_digest
+
+    def _path(self, key, output_filepath):
+        if output_filepath is None:
+            return os.path.join(self.cache_dir, key + '.npy')
+        return os.path.join(
+            self.cache_dir,
+            '{}.{}'.format(key, file_info.file_extension(output_filepath))
+        )
+
+    def _load_index(self):
+        '''Index the entries already in cache_dir, least recently used
+        first. Called with the lock held.
+        '''
+        if self._index is not None:
+            return
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    entry_stat = entry.stat()
+                    entries.append(
+                        (entry_stat.st_mtime, entry.path, entry_stat.st_size)
+                    )
+        self._index = OrderedDict(
+            (path, size) for _, path, size in sorted(entries)
+        )
+        self._size = sum(self._index.values())
+
+    def load(self, key, output_filepath=None):
+        '''Copy a cached file to output_filepath and return True, or load a
+        cached array if output_filepath is None. Returns None on a miss.
+        '''
+        path = self._path(key, output_filepath)
+        try:
+            with self._lock:
+                self._load_index()
+                os.utime(path)
+                if path in self._index:
+                    self._index.move_to_end(path)
+                else:
+                    # stored by another process
+                    self._index[path] = os.path.getsize(path)
+                    self._size += self._index[path]
+            # an entry evicted meanwhile fails to open, and is a miss
+            if output_filepath is None:
+                return np.load(path)
+            if os.path.exists(output_filepath):
+                os.remove(output_filepath)
+            if self.link:
+                try:
+                    os.link(path, output_filepath)
+                    return True
+                except OSError:
+                    pass
+            shutil.copyfile(path, output_filepath)
+            return True
+        except (IOError, OSError, ValueError):
+            return None
+
+    def store(self, key, array=None, filepath=None):
+        '''Add an output array, or a copy of an output file, to the cache
+        and evict the least recently used entries.
+        '''
+        path = self._path(key, filepath)
+        tmp_path = '{}.{}.{}.tmp'.format(
+            path, os.getpid(), threading.get_ident()
+        )
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir, exist_ok=True)
+            if filepath is None:
+                with open(tmp_path, 'wb') as fhandle:
+                    np.save(fhandle, array)
+            else:
+                shutil.copyfile(filepath, tmp_path)
+            size = os.path.getsize(tmp_path)
+            with self._lock:
+                self._load_index()
+                os.replace(tmp_path, path)
+                self._size += size - self._index.pop(path, 0)
+                self._index[path] = size
+                self._evict()
+        except (IOError, OSError) as error_msg:
+            logger.info("Could not cache build output: %s", error_msg)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self):
+        '''Remove the least recently used entries until the total size
+        fits in max_size. Called with the lock held.
+        '''
+        while self._size > self.max_size and self._index:
+            path, size = self._index.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(path)
+            except OSError:
+                # removed by another process
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._file_digests.clear()
+            self._index = OrderedDict()
+            self._size = 0
+            if os.path.isdir(self.cache_dir):
+                for entry in os.scandir(self.cache_dir):
+                    if entry.is_file():
+                        os.remove(entry.path)
+
+
+_BUILD_CACHE = None
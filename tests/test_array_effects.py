@@ -0,0 +1,570 @@
+import unittest
+import os
+import tempfile
+
+from sox import array_effects, transform
+import soundfile as sf
+import numpy as np
+
+
+def relpath(f):
+    return os.path.join(os.path.dirname(__file__), f)
+
+
+INPUT_FILE = relpath('data/input.wav')
+INPUT_FILE4 = relpath('data/input4.wav')
+
+
+def new_transformer():
+    return transform.Transformer()
+
+
+class TestParseEffects(unittest.TestCase):
+
+    def test_transformer_effects(self):
+        tfm = new_transformer()
+        tfm.vol(6, gain_type='db').gain(-3.0).trim(0.5, 1.5)
+        tfm.fade(0.1, 0.2, fade_shape='h').remix({1: [1, 2], 3: [2]})
+        actual = array_effects.parse_effects(tfm.effects)
+        expected = [
+            ('vol', [10.0 ** 0.3]),
+            ('gain', [-3.0, True, False]),
+            ('trim', [0.5, 1.0]),
+            ('fade', ['h', 0.1]),
+            ('reverse', []),
+            ('fade', ['h', 0.2]),
+            ('reverse', []),
+            ('remix', [[[1, 2], [], [2]]]),
+        ]
+        self.assertEqual(len(expected), len(actual))
+        for (name, params), (actual_name, actual_params) in zip(
+                expected, actual):
+            self.assertEqual(name, actual_name)
+            self.assertEqual(len(params), len(actual_params))
+            for param, actual_param in zip(params, actual_params):
+                if isinstance(param, float):
+                    self.assertAlmostEqual(param, actual_param)
+                else:
+                    self.assertEqual(param, actual_param)
+
+    def test_empty(self):
+        self.assertEqual([], array_effects.parse_effects([]))
+
+    def test_effect_chain(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).trim(0.5, 1.5).highpass(100.0)
+        self.assertEqual(
+            repr(array_effects.parse_effects(tfm.effects)),
+            repr(array_effects.parse_effects(tfm.effect_chain))
+        )
+
+    def test_unsupported_effect(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).tempo(1.1)
+        with self.assertRaises(ValueError):
+            array_effects.parse_effects(tfm.effects)
+
+    def test_unsupported_first_effect(self):
+        tfm = new_transformer()
+        tfm.tempo(1.1).vol(0.5)
+        with self.assertRaises(ValueError):
+            array_effects.parse_effects(tfm.effects)
+
+    def test_vol_limiter(self):
+        tfm = new_transformer()
+        tfm.vol(2.0, limiter_gain=0.05)
+        with self.assertRaises(ValueError):
+            array_effects.parse_effects(tfm.effects)
+
+    def test_gain_limiter(self):
+        tfm = new_transformer()
+        tfm.gain(limiter=True)
+        with self.assertRaises(ValueError):
+            array_effects.parse_effects(tfm.effects)
+
+    def test_gain_balance(self):
+        tfm = new_transformer()
+        tfm.gain(balance='B')
+        with self.assertRaises(ValueError):
+            array_effects.parse_effects(tfm.effects)
+
+    def test_invalid_args(self):
+        with self.assertRaises(ValueError):
+            array_effects.parse_effects(['channels', 'x'])
+
+    def test_fir_file(self):
+        fhandle, path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fhandle, 'w') as fhandle:
+            fhandle.write('# coefficients\n0.25 0.5\n  0.25 # last\n')
+        try:
+            actual = array_effects.parse_effects(['fir', path])
+        finally:
+            os.remove(path)
+        self.assertEqual('fir', actual[0][0])
+        self.assertTrue(np.array_equal([0.25, 0.5, 0.25], actual[0][1][0]))
+
+    def test_fir_missing_file(self):
+        with self.assertRaises(ValueError):
+            array_effects.parse_effects(['fir', 'not_a_file.txt'])
+
+    def test_sinc_phase(self):
+        tfm = new_transformer()
+        tfm.sinc(phase_response=50)
+        array_effects.parse_effects(tfm.effects)
+        tfm = new_transformer()
+        tfm.sinc(phase_response=0)
+        with self.assertRaises(ValueError):
+            array_effects.parse_effects(tfm.effects)
+
+
+class TestApplyEffects(unittest.TestCase):
+
+    def setUp(self):
+        self.input_array = np.array(
+            [[0.5, -0.25], [0.25, 0.0], [-0.5, 0.125], [0.0, 0.25]]
+        )
+
+    def apply(self, effects, **kwargs):
+        return array_effects.apply_effects(
+            self.input_array, 4, effects, **kwargs
+        )
+
+    def test_no_effects(self):
+        actual = self.apply([])
+        self.assertTrue(np.array_equal(self.input_array, actual))
+        self.assertTrue(actual.flags['C_CONTIGUOUS'])
+
+    def test_vol(self):
+        actual = self.apply(['vol', '0.500000', 'amplitude'])
+        self.assertTrue(np.array_equal(self.input_array * 0.5, actual))
+
+    def test_vol_db(self):
+        actual = self.apply(['vol', '-6.020600', 'dB'])
+        self.assertTrue(np.allclose(self.input_array * 0.5, actual))
+
+    def test_vol_clips(self):
+        actual = self.apply(['vol', '4.000000', 'amplitude'])
+        self.assertEqual(2147483647.0 / 2147483648.0, actual.max())
+        self.assertEqual(-1.0, actual.min())
+
+    def test_gain(self):
+        actual = self.apply(['gain', '-6.020600'])
+        self.assertTrue(np.allclose(self.input_array * 0.5, actual))
+
+    def test_gain_normalize(self):
+        actual = self.apply(['gain', '-n', '0.000000'])
+        self.assertAlmostEqual(1.0, np.abs(actual).max())
+        self.assertTrue(np.allclose(self.input_array * 2, actual))
+
+    def test_gain_equalize(self):
+        actual = self.apply(['gain', '-e', '-n', '-6.020600'])
+        self.assertTrue(np.allclose([0.5, 0.5], np.abs(actual).max(axis=0)))
+
+    def test_gain_equalize_only(self):
+        actual = self.apply(['gain', '-e', '0.000000'])
+        self.assertTrue(np.allclose(
+            self.input_array * [1.0, 2.0], actual, atol=1e-9
+        ))
+
+    def test_dcshift(self):
+        actual = self.apply(['dcshift', '0.250000'])
+        self.assertTrue(np.array_equal(self.input_array + 0.25, actual))
+
+    def test_trim(self):
+        actual = self.apply(['trim', '0.250000', '0.500000'])
+        self.assertTrue(np.array_equal(self.input_array[1:3], actual))
+
+    def test_trim_start(self):
+        actual = self.apply(['trim', '0.500000'])
+        self.assertTrue(np.array_equal(self.input_array[2:], actual))
+
+    def test_pad(self):
+        actual = self.apply(['pad', '0.250000', '0.500000'])
+        self.assertEqual((7, 2), actual.shape)
+        self.assertTrue(np.array_equal(self.input_array, actual[1:5]))
+        self.assertTrue(np.all(actual[[0, 5, 6]] == 0))
+
+    def test_reverse(self):
+        actual = self.apply(['reverse'])
+        self.assertTrue(np.array_equal(self.input_array[::-1], actual))
+
+    def test_fade_in(self):
+        actual = self.apply(['fade', 't', '0.500000'])
+        expected = self.input_array.copy()
+        expected[:2] *= np.array([[0.0], [0.5]])
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_fade_out(self):
+        actual = self.apply(['reverse', 'fade', 'p', '0.500000', 'reverse'])
+        expected = self.input_array.copy()
+        expected[2:] *= np.array([[0.75], [0.0]])
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_channels_down(self):
+        actual = self.apply(['channels', '1'])
+        self.assertEqual((4, ), actual.shape)
+        self.assertTrue(np.array_equal(self.input_array.mean(axis=1), actual))
+
+    def test_channels_up(self):
+        actual = self.apply(['channels', '3'])
+        self.assertTrue(np.array_equal(self.input_array[:, [0, 1, 0]], actual))
+
+    def test_swap(self):
+        actual = self.apply(['channels', '3', 'swap'])
+        self.assertTrue(np.array_equal(self.input_array[:, [1, 0, 0]], actual))
+
+    def test_remix(self):
+        actual = self.apply(['remix', '2', '0', '1,2'])
+        expected = np.stack([
+            self.input_array[:, 1], np.zeros(4), self.input_array.mean(axis=1)
+        ], axis=1)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_remix_mono(self):
+        actual = self.apply(['remix', '-'])
+        self.assertTrue(np.array_equal(self.input_array.mean(axis=1), actual))
+
+    def test_remix_invalid_channel(self):
+        with self.assertRaises(ValueError):
+            self.apply(['remix', '3'])
+
+    def test_repeat(self):
+        actual = self.apply(['repeat', '2'])
+        self.assertTrue(np.array_equal(
+            np.concatenate([self.input_array] * 3), actual
+        ))
+
+    def test_fir_identity(self):
+        for effects in [['fir', '1.000000'], ['fir', '0', '1', '0'],
+                        ['fir', '0', '1', '0', '0']]:
+            actual = self.apply(effects)
+            self.assertTrue(np.allclose(self.input_array, actual))
+
+    def test_fir_delay(self):
+        actual = self.apply(['fir', '0', '0', '1'])
+        expected = np.zeros_like(self.input_array)
+        expected[1:] = self.input_array[:-1]
+        self.assertTrue(np.allclose(expected, actual))
+
+    def test_channels_out(self):
+        actual = self.apply(['remix', '1'], channels_out=2)
+        self.assertTrue(np.array_equal(self.input_array[:, [0, 0]], actual))
+
+    def test_int16(self):
+        input_array = np.array([[-32768, 32767], [100, -100]], dtype=np.int16)
+        actual = array_effects.apply_effects(input_array, 4, [])
+        self.assertEqual(np.int16, actual.dtype)
+        self.assertTrue(np.array_equal(input_array, actual))
+
+        actual = array_effects.apply_effects(
+            input_array, 4, ['vol', '0.500000', 'amplitude']
+        )
+        self.assertTrue(np.array_equal([[-16384, 16384], [50, -50]], actual))
+
+    def test_dtype_out(self):
+        input_array = np.array([-32768, 16384, 0], dtype=np.int16)
+        actual = array_effects.apply_effects(
+            input_array, 4, [], dtype_out=np.float32
+        )
+        self.assertEqual(np.float32, actual.dtype)
+        self.assertTrue(np.array_equal([-1.0, 0.5, 0.0], actual))
+
+    def test_unsigned(self):
+        input_array = np.array([0, 255, 128, 64], dtype=np.uint8)
+        actual = array_effects.apply_effects(input_array, 4, [])
+        self.assertEqual(np.uint8, actual.dtype)
+        self.assertTrue(np.array_equal(input_array, actual))
+
+        actual = array_effects.apply_effects(
+            input_array, 4, [], dtype_out=np.int16
+        )
+        self.assertTrue(np.array_equal([-32768, 32512, 0, -16384], actual))
+
+        actual = array_effects.apply_effects(
+            np.array([-32768, 32767, 0], dtype=np.int16), 4, [],
+            dtype_out=np.uint16
+        )
+        self.assertTrue(np.array_equal([0, 65535, 32768], actual))
+
+    def test_int32(self):
+        input_array = np.array([-2 ** 31, 2 ** 31 - 1, 1], dtype=np.int32)
+        actual = array_effects.apply_effects(input_array, 4, [])
+        self.assertEqual(np.int32, actual.dtype)
+        self.assertTrue(np.array_equal(input_array, actual))
+
+    def test_invalid_dtype(self):
+        with self.assertRaises(ValueError):
+            array_effects.apply_effects(np.zeros(4, dtype=np.int64), 4, [])
+
+    def test_invalid_input(self):
+        with self.assertRaises(TypeError):
+            array_effects.apply_effects([0.0, 0.5], 4, [])
+
+
+def direct_form_filter(b, a, x):
+    y = np.zeros_like(x)
+    for n in range(len(x)):
+        y[n] = b[0] * x[n] / a[0]
+        for k in range(1, 3):
+            if n >= k:
+                y[n] += (b[k] * x[n - k] - a[k] * y[n - k]) / a[0]
+    return y
+
+
+class TestBiquadSections(unittest.TestCase):
+
+    def test_lowpass(self):
+        tfm = new_transformer()
+        tfm.lowpass(1000.0, width_q=0.5)
+        actual = array_effects.biquad_sections(tfm.effects, 8000)
+        w0 = 2 * np.pi * 1000.0 / 8000
+        alpha = np.sin(w0)
+        a0 = 1 + alpha
+        expected = [
+            (1 - np.cos(w0)) / 2 / a0, (1 - np.cos(w0)) / a0,
+            (1 - np.cos(w0)) / 2 / a0, 1.0, -2 * np.cos(w0) / a0,
+            (1 - alpha) / a0
+        ]
+        self.assertEqual((1, 6), actual.shape)
+        self.assertTrue(np.allclose(expected, actual[0]))
+
+    def test_single_pole(self):
+        tfm = new_transformer()
+        tfm.highpass(1000.0, n_poles=1)
+        actual = array_effects.biquad_sections(tfm.effects, 8000)
+        a1 = -np.exp(-2 * np.pi * 1000.0 / 8000)
+        expected = [(1 - a1) / 2, -(1 - a1) / 2, 0, 1, a1, 0]
+        self.assertTrue(np.allclose(expected, actual[0]))
+
+    def test_biquad(self):
+        tfm = new_transformer()
+        tfm.biquad([1.0, 0.5, 0.25], [2.0, 0.5, 0.25])
+        actual = array_effects.biquad_sections(tfm.effects, 8000)
+        expected = [0.5, 0.25, 0.125, 1.0, 0.25, 0.125]
+        self.assertTrue(np.allclose(expected, actual[0]))
+
+    def test_flat_equalizer(self):
+        tfm = new_transformer()
+        tfm.equalizer(1000.0, 2.0, 0.0).bass(0.0).treble(0.0)
+        actual = array_effects.biquad_sections(tfm.effects, 44100)
+        self.assertTrue(np.allclose(actual[:, :3], actual[:, 3:]))
+
+    def test_all_filters(self):
+        tfm = new_transformer()
+        tfm.allpass(500.0).bandpass(500.0).bandpass(500.0, constant_skirt=True)
+        tfm.bandreject(500.0).bass(6.0).treble(-6.0)
+        tfm.equalizer(500.0, 1.0, 3.0).highpass(500.0).lowpass(500.0)
+        actual = array_effects.biquad_sections(tfm.effects, 44100)
+        self.assertEqual((9, 6), actual.shape)
+        self.assertTrue(np.all(actual[:, 3] == 1.0))
+        # all filters are stable
+        self.assertTrue(np.all(np.abs(actual[:, 5]) < 1))
+
+    def test_not_a_filter(self):
+        with self.assertRaises(ValueError):
+            array_effects.biquad_sections(['vol', '0.5', 'amplitude'], 8000)
+
+    def test_above_nyquist(self):
+        with self.assertRaises(ValueError):
+            array_effects.biquad_sections(
+                ['lowpass', '-2', '5000', '0.7q'], 8000
+            )
+
+
+class TestSosfilt(unittest.TestCase):
+
+    def setUp(self):
+        self.sos = np.array([[0.2, 0.4, 0.2, 1.0, -1.9, 0.905]])
+        self.x = np.random.RandomState(0).randn(1000)
+
+    def test_matches_direct_form(self):
+        expected = direct_form_filter(self.sos[0, :3], self.sos[0, 3:], self.x)
+        actual = array_effects.sosfilt(self.sos, self.x)
+        self.assertTrue(np.allclose(expected, actual, atol=1e-9))
+
+    def test_unnormalized(self):
+        expected = array_effects.sosfilt(self.sos, self.x)
+        actual = array_effects.sosfilt(self.sos * 2, self.x)
+        self.assertTrue(np.allclose(expected, actual))
+
+    def test_cascade(self):
+        sos = np.vstack([self.sos, [1.0, -1.0, 0.0, 1.0, -0.5, 0.0]])
+        expected = array_effects.sosfilt(
+            sos[1:], array_effects.sosfilt(sos[:1], self.x)
+        )
+        actual = array_effects.sosfilt(sos, self.x)
+        self.assertTrue(np.allclose(expected, actual))
+
+    def test_batch(self):
+        x = np.random.RandomState(1).randn(300, 3, 2)
+        actual = array_effects.sosfilt(self.sos, x)
+        self.assertEqual(x.shape, actual.shape)
+        for i in range(3):
+            for j in range(2):
+                expected = array_effects.sosfilt(self.sos, x[:, i, j])
+                self.assertTrue(np.allclose(expected, actual[:, i, j]))
+
+    def test_short(self):
+        x = self.x[:5]
+        expected = direct_form_filter(self.sos[0, :3], self.sos[0, 3:], x)
+        actual = array_effects.sosfilt(self.sos, x)
+        self.assertTrue(np.allclose(expected, actual))
+
+    def test_empty(self):
+        actual = array_effects.sosfilt(self.sos, np.zeros((0, 2)))
+        self.assertEqual((0, 2), actual.shape)
+
+    def test_invalid_sos(self):
+        with self.assertRaises(ValueError):
+            array_effects.sosfilt([1.0, 0.0, 0.0], self.x)
+        with self.assertRaises(ValueError):
+            array_effects.sosfilt([1.0, 0.0, 0.0, 0.0, 0.0, 0.0], self.x)
+
+
+class TestFftfilt(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(3)
+        self.h = random_state.randn(31)
+        self.x = random_state.randn(1000)
+
+    def test_matches_convolve(self):
+        expected = np.convolve(self.h, self.x)[:len(self.x)]
+        actual = array_effects.fftfilt(self.h, self.x)
+        self.assertTrue(np.allclose(expected, actual))
+
+    def test_long_signal(self):
+        x = np.random.RandomState(4).randn(3 * array_effects.FFT_SIZE + 5)
+        expected = np.convolve(self.h, x)[:len(x)]
+        actual = array_effects.fftfilt(self.h, x)
+        self.assertTrue(np.allclose(expected, actual))
+
+    def test_long_filter(self):
+        h = np.random.RandomState(5).randn(5000)
+        expected = np.convolve(h, self.x)[:len(self.x)]
+        actual = array_effects.fftfilt(h, self.x)
+        self.assertTrue(np.allclose(expected, actual))
+
+    def test_batch(self):
+        x = np.random.RandomState(6).randn(300, 3, 2)
+        actual = array_effects.fftfilt(self.h, x)
+        self.assertEqual(x.shape, actual.shape)
+        for i in range(3):
+            for j in range(2):
+                expected = np.convolve(self.h, x[:, i, j])[:300]
+                self.assertTrue(np.allclose(expected, actual[:, i, j]))
+
+    def test_empty(self):
+        actual = array_effects.fftfilt(self.h, np.zeros((0, 2)))
+        self.assertEqual((0, 2), actual.shape)
+
+    def test_invalid_h(self):
+        with self.assertRaises(ValueError):
+            array_effects.fftfilt([], self.x)
+        with self.assertRaises(ValueError):
+            array_effects.fftfilt([[1.0]], self.x)
+
+
+class TestFirCoefficients(unittest.TestCase):
+
+    def test_fir(self):
+        actual = array_effects.fir_coefficients(
+            ['fir', '0.5', '0.25', 'fir', '1'], 8000
+        )
+        self.assertEqual(2, len(actual))
+        self.assertTrue(np.array_equal([0.5, 0.25], actual[0]))
+        self.assertTrue(np.array_equal([1.0], actual[1]))
+
+    def test_sinc(self):
+        tfm = new_transformer()
+        tfm.sinc('low', 1000.0)
+        actual = array_effects.fir_coefficients(tfm.effects, 8000)[0]
+        # linear phase low-pass with unit gain at DC
+        self.assertEqual(1, len(actual) % 2)
+        self.assertTrue(np.allclose(actual, actual[::-1]))
+        self.assertAlmostEqual(1.0, actual.sum(), places=3)
+
+    def test_not_a_filter(self):
+        with self.assertRaises(ValueError):
+            array_effects.fir_coefficients(['vol', '0.5', 'amplitude'], 8000)
+
+
+class TestApplyEffectsBatch(unittest.TestCase):
+
+    def test_matches_single(self):
+        clips = np.random.RandomState(2).uniform(
+            -0.5, 0.5, (4, 200, 2)
+        ).astype(np.float32)
+        effects = [
+            'highpass', '-2', '100.000000', '0.707000q',
+            'gain', '-n', '-1.000000', 'fade', 'q', '0.010000'
+        ]
+        actual = array_effects.apply_effects(clips, 8000, effects)
+        self.assertEqual(clips.shape, actual.shape)
+        for clip, actual_clip in zip(clips, actual):
+            expected = array_effects.apply_effects(clip, 8000, effects)
+            self.assertTrue(np.array_equal(expected, actual_clip))
+
+    def test_mono_batch(self):
+        clips = np.zeros((3, 100, 1), dtype=np.int16)
+        actual = array_effects.apply_effects(clips, 8000, ['channels', '2'])
+        self.assertEqual((3, 100, 2), actual.shape)
+
+    def test_invalid_ndim(self):
+        with self.assertRaises(ValueError):
+            array_effects.apply_effects(np.zeros((1, 1, 1, 1)), 8000, [])
+
+
+class TestMatchesSox(unittest.TestCase):
+
+    def assert_matches_sox(self, tfm, input_array, rate):
+        _, expected, _ = tfm.build(
+            input_array=input_array, sample_rate_in=rate, engine='sox'
+        )
+        _, actual, _ = tfm.build(
+            input_array=input_array, sample_rate_in=rate, engine='numpy'
+        )
+        self.assertEqual(expected.shape, actual.shape)
+        self.assertEqual(expected.dtype, actual.dtype)
+        self.assertTrue(np.allclose(expected, actual, atol=1e-6, rtol=0))
+
+    def test_float32(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='float32')
+        tfm = new_transformer()
+        tfm.vol(0.5).dcshift(0.1).trim(0.5, 2.5).pad(0.1, 0.2)
+        tfm.fade(0.3, 0.4).swap().repeat(1)
+        self.assert_matches_sox(tfm, input_array, rate)
+
+    def test_int16(self):
+        input_array, rate = sf.read(INPUT_FILE, dtype='int16')
+        tfm = new_transformer()
+        tfm.gain(-3.0).reverse().fade(0.5, fade_shape='l')
+        self.assert_matches_sox(tfm, input_array, rate)
+
+    def test_remix(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='float64')
+        tfm = new_transformer()
+        tfm.remix({1: [1, 2], 2: [2]})
+        self.assert_matches_sox(tfm, input_array, rate)
+
+    def test_filters(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='float32')
+        tfm = new_transformer()
+        tfm.highpass(80.0).lowpass(8000.0, n_poles=1).bass(-3.0)
+        tfm.treble(2.0).equalizer(1000.0, 1.0, -6.0).allpass(300.0)
+        tfm.bandpass(2000.0, width_q=0.5).bandreject(60.0, width_q=4.0)
+        tfm.biquad([0.5, 0.2, 0.1], [1.0, -0.3, 0.1])
+        self.assert_matches_sox(tfm, input_array, rate)
+
+    def test_fir(self):
+        input_array, rate = sf.read(INPUT_FILE, dtype='int16')
+        tfm = new_transformer()
+        tfm.fir([0.0195, -0.082, 0.234, 0.891, -0.145, 0.043])
+        tfm.fir(list(np.hanning(1500) / 750.0))
+        self.assert_matches_sox(tfm, input_array, rate)
+
+    def test_sinc(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='float32')
+        tfm = new_transformer()
+        tfm.sinc('pass', [300.0, 3000.0]).sinc('high', 50.0)
+        self.assert_matches_sox(tfm, input_array, rate)
@@ -0,0 +1,191 @@
+import unittest
+import os
+
+from sox import array_stat, file_info, transform
+import soundfile as sf
+import numpy as np
+
+
+def relpath(f):
+    return os.path.join(os.path.dirname(__file__), f)
+
+
+INPUT_FILE = relpath('data/input.wav')
+INPUT_FILE4 = relpath('data/input4.wav')
+SILENT_FILE = relpath('data/silence.wav')
+
+SILENT_FILE_STAT = {
+    'Samples read': 627456,
+    'Length (seconds)': 14.228027,
+    'Scaled by': 2147483647.0,
+    'Maximum amplitude': 0.010895,
+    'Minimum amplitude': -0.004883,
+    'Midline amplitude': 0.003006,
+    'Mean    norm': 0.000137,
+    'Mean    amplitude': -0.000062,
+    'RMS     amplitude': 0.000200,
+    'Maximum delta': 0.015778,
+    'Minimum delta': 0.000000,
+    'Mean    delta': 0.000096,
+    'RMS     delta': 0.000124,
+    'Rough   frequency': 4349,
+    'Volume adjustment': 91.787
+}
+
+
+class TestStat(unittest.TestCase):
+
+    def test_silent_file(self):
+        input_array, rate = sf.read(SILENT_FILE, dtype='int16')
+        actual = array_stat.stat(input_array, rate)
+        self.assertEqual(set(SILENT_FILE_STAT.keys()), set(actual.keys()))
+        for key, value in SILENT_FILE_STAT.items():
+            places = 3 if key == 'Volume adjustment' else 6
+            self.assertAlmostEqual(value, actual[key], places=places, msg=key)
+
+    def test_float_input(self):
+        input_array, rate = sf.read(SILENT_FILE, dtype='float64')
+        actual = array_stat.stat(input_array, rate)
+        self.assertAlmostEqual(0.000200, actual['RMS     amplitude'], places=6)
+
+    def test_matches_file_info(self):
+        input_array, rate = sf.read(INPUT_FILE, dtype='int16')
+        expected = file_info.stat(INPUT_FILE)
+        actual = array_stat.stat(input_array, rate)
+        for key, value in expected.items():
+            places = 3 if key == 'Volume adjustment' else 5
+            self.assertAlmostEqual(value, actual[key], places=places, msg=key)
+
+    def test_stereo_downmix(self):
+        left = np.array([0.5, -0.5, 0.5, -0.5])
+        input_array = np.stack([left, np.zeros(4)], axis=1)
+        actual = array_stat.stat(input_array, 4)
+        self.assertEqual(4, actual['Samples read'])
+        self.assertEqual(0.25, actual['Maximum amplitude'])
+        self.assertEqual(0.25, actual['RMS     amplitude'])
+
+    def test_rms(self):
+        input_array = np.array([0.5, -0.5, 0.5, -0.5])
+        actual = array_stat.stat(input_array, 4, rms=True)
+        self.assertEqual(1.0, actual['Maximum amplitude'])
+        self.assertEqual(1.0, actual['RMS     amplitude'])
+        self.assertIn('Scaled by rms', actual)
+
+    def test_scale(self):
+        input_array = np.array([0.5, -0.5, 0.5, -0.5])
+        actual = array_stat.stat(input_array, 4, scale=2147483647.0 / 2)
+        self.assertEqual(1.0, actual['Maximum amplitude'])
+
+    def test_empty(self):
+        self.assertEqual({}, array_stat.stat(np.zeros(0), 44100))
+
+    def test_zeros(self):
+        actual = array_stat.stat(np.zeros(10), 44100)
+        self.assertNotIn('Rough   frequency', actual)
+        self.assertNotIn('Volume adjustment', actual)
+
+    def test_invalid_array(self):
+        with self.assertRaises(TypeError):
+            array_stat.stat([1, 2, 3], 44100)
+
+    def test_invalid_sample_rate(self):
+        with self.assertRaises(ValueError):
+            array_stat.stat(np.zeros(10), 0)
+
+    def test_invalid_scale(self):
+        with self.assertRaises(ValueError):
+            array_stat.stat(np.zeros(10), 44100, scale=-1)
+
+
+class TestStatAccumulator(unittest.TestCase):
+
+    def test_blocks_match_whole(self):
+        input_array, rate = sf.read(SILENT_FILE, dtype='int16')
+        accumulator = array_stat.StatAccumulator(rate)
+        for block in np.array_split(input_array, 13):
+            accumulator.update(block)
+        expected = array_stat.stat(input_array, rate)
+        actual = accumulator.result()
+        for key, value in expected.items():
+            self.assertAlmostEqual(value, actual[key], places=9, msg=key)
+
+    def test_invalid_rms(self):
+        with self.assertRaises(ValueError):
+            array_stat.StatAccumulator(44100, rms=1)
+
+
+class TestStatFile(unittest.TestCase):
+
+    def test_silent_file(self):
+        actual = array_stat.stat_file(SILENT_FILE, blocksize=1000)
+        for key, value in SILENT_FILE_STAT.items():
+            places = 3 if key == 'Volume adjustment' else 6
+            self.assertAlmostEqual(value, actual[key], places=places, msg=key)
+
+    def test_invalid_blocksize(self):
+        with self.assertRaises(ValueError):
+            array_stat.stat_file(SILENT_FILE, blocksize=0)
+
+
+class TestSilent(unittest.TestCase):
+
+    def test_silent(self):
+        input_array, _ = sf.read(SILENT_FILE, dtype='int16')
+        self.assertTrue(array_stat.silent(input_array))
+
+    def test_nonsilent(self):
+        input_array, _ = sf.read(INPUT_FILE, dtype='int16')
+        self.assertFalse(array_stat.silent(input_array))
+
+    def test_empty(self):
+        self.assertTrue(array_stat.silent(np.zeros((0, 2))))
+
+
+class TestTransformerStatArray(unittest.TestCase):
+
+    def test_no_effects(self):
+        input_array, rate = sf.read(SILENT_FILE, dtype='int16')
+        tfm = transform.Transformer()
+        actual = tfm.stat(input_array=input_array, sample_rate_in=rate)
+        expected = {
+            'Samples read': '627456',
+            'Length (seconds)': '14.228027',
+            'Scaled by': '2147483647.0',
+            'Maximum amplitude': '0.010895',
+            'Minimum amplitude': '-0.004883',
+            'Midline amplitude': '0.003006',
+            'Mean norm': '0.000137',
+            'Mean amplitude': '-0.000062',
+            'RMS amplitude': '0.000200',
+            'Maximum delta': '0.015778',
+            'Minimum delta': '0.000000',
+            'Mean delta': '0.000096',
+            'RMS delta': '0.000124',
+            'Rough frequency': '4349',
+            'Volume adjustment': '91.787'
+        }
+        self.assertEqual(expected, actual)
+
+    def test_matches_file(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='int16')
+        tfm = transform.Transformer()
+        expected = tfm.stat(INPUT_FILE4)
+        actual = tfm.stat(input_array=input_array, sample_rate_in=rate)
+        self.assertEqual(expected, actual)
+
+    def test_with_effects(self):
+        input_array, rate = sf.read(INPUT_FILE, dtype='int16')
+        tfm = transform.Transformer()
+        tfm.vol(0.5)
+        actual = tfm.stat(input_array=input_array, sample_rate_in=rate)
+        self.assertIn('RMS amplitude', actual)
+
+    def test_missing_sample_rate(self):
+        tfm = transform.Transformer()
+        with self.assertRaises(ValueError):
+            tfm.stat(input_array=np.zeros(10))
+
+    def test_two_inputs(self):
+        tfm = transform.Transformer()
+        with self.assertRaises(ValueError):
+            tfm.stat(INPUT_FILE, input_array=np.zeros(10), sample_rate_in=10)
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 import os
 
@@ -67,6 +68,21 @@ class TestCombineDefault(unittest.TestCase):
                 [INPUT_FILE_INVALID, INPUT_WAV], OUTPUT_FILE, 'concatenate'
             )
 
+    def test_abuild(self):
+        expected_result = True
+        actual_result = asyncio.run(self.cbn.abuild(
+            [INPUT_WAV, INPUT_WAV], OUTPUT_FILE, 'mix',
+            input_volumes=[0.5, 2]
+        ))
+        self.assertEqual(expected_result, actual_result)
+
+    def test_failed_abuild(self):
+        cbn = new_combiner()
+        with self.assertRaises(SoxError):
+            asyncio.run(cbn.abuild(
+                [INPUT_FILE_INVALID, INPUT_WAV], OUTPUT_FILE, 'concatenate'
+            ))
+
 
 class TestCombineTypes(unittest.TestCase):
 
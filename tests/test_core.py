@@ -1,5 +1,15 @@
+import asyncio
 import unittest
+import json
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
 
 from sox import core
 from sox.core import SoxiError
@@ -73,6 +83,458 @@ class TestSox(unittest.TestCase):
         self.assertNotEqual('', acutal_err)
 
 
+class TestAsox(unittest.TestCase):
+
+    def test_base_case(self):
+        args = ['sox', INPUT_FILE, OUTPUT_FILE]
+        expected = (0, '', '')
+        actual = asyncio.run(core.asox(args))
+        self.assertEqual(expected, actual)
+
+    def test_src_array(self):
+        src_array = np.arange(1000, dtype=np.int16)
+        args = ['-t', 's16', '-r', '8000', '-c', '1', '-', '-t', 's16', '-']
+        status, out, _ = asyncio.run(core.asox(args, src_array))
+        self.assertEqual(0, status)
+        self.assertEqual(src_array.tobytes(), out)
+
+    def test_sox_fail_bad_files(self):
+        args = ['asdf.wav', 'flululu.wav']
+        status, out, err = asyncio.run(core.asox(args))
+        self.assertEqual(2, status)
+        self.assertEqual('', out)
+        self.assertNotEqual('', err)
+
+    def test_src_array_invalid(self):
+        args = ['input.wav', 'output.xyz']
+        status, _, _ = asyncio.run(core.asox(args, 'not a numpy array'))
+        self.assertEqual(1, status)
+
+    def test_cancel_kills_process(self):
+        args = ['-n', '-t', 's16', '-', 'synth', '3600', 'sine', '440']
+
+        async def run():
+            task = asyncio.ensure_future(core.asox(args))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+
+    def test_concurrent(self):
+        args = [INPUT_FILE, '-n', 'stat']
+
+        async def run():
+            return await asyncio.gather(
+                *[core.asox(list(args)) for _ in range(4)]
+            )
+
+        results = asyncio.run(run())
+        self.assertEqual([0] * 4, [status for status, _, _ in results])
+
+
+class TestSetAsyncLimit(unittest.TestCase):
+
+    def tearDown(self):
+        core.set_async_limit(None)
+
+    def test_limit(self):
+        core.set_async_limit(1)
+        args = [INPUT_FILE, '-n', 'stat']
+
+        async def run():
+            return await asyncio.gather(
+                *[core.asox(list(args)) for _ in range(3)]
+            )
+
+        results = asyncio.run(run())
+        self.assertEqual([0] * 3, [status for status, _, _ in results])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            core.set_async_limit(0)
+        with self.assertRaises(ValueError):
+            core.set_async_limit(1.5)
+
+
+class TestSoxReadinto(unittest.TestCase):
+
+    def test_src_array(self):
+        src_array = np.arange(1000, dtype=np.int16)
+        buffer = np.zeros(1500, dtype=np.int16)
+        args = ['-t', 's16', '-r', '8000', '-c', '1', '-', '-t', 's16', '-']
+        status, n_bytes, _ = core.sox_readinto(args, buffer, src_array)
+        self.assertEqual(0, status)
+        self.assertEqual(2000, n_bytes)
+        self.assertTrue(np.array_equal(src_array, buffer[:1000]))
+
+    def test_buffer_too_small(self):
+        src_array = np.arange(1000, dtype=np.int16)
+        buffer = np.zeros(999, dtype=np.int16)
+        args = ['-t', 's16', '-r', '8000', '-c', '1', '-', '-t', 's16', '-']
+        with self.assertRaises(ValueError):
+            core.sox_readinto(args, buffer, src_array)
+
+    def test_sox_fail(self):
+        buffer = np.zeros(1000, dtype=np.int16)
+        status, n_bytes, _ = core.sox_readinto(
+            ['asdf.wav', '-t', 's16', '-'], buffer
+        )
+        self.assertNotEqual(0, status)
+        self.assertEqual(0, n_bytes)
+
+    def test_buffer_invalid(self):
+        with self.assertRaises(TypeError):
+            core.sox_readinto(['-', '-'], bytearray(10))
+
+    def test_buffer_readonly(self):
+        buffer = np.zeros(10)
+        buffer.flags.writeable = False
+        with self.assertRaises(ValueError):
+            core.sox_readinto(['-', '-'], buffer)
+
+
+class TestStdinBuffer(unittest.TestCase):
+
+    def test_c_contiguous_not_copied(self):
+        src_array = np.random.random((1000, 2))
+        buffer = core._stdin_buffer(src_array)
+        self.assertTrue(np.shares_memory(
+            src_array, np.frombuffer(buffer, dtype=np.uint8)
+        ))
+        self.assertEqual(src_array.nbytes, len(buffer))
+        self.assertEqual(src_array.tobytes(), buffer.tobytes())
+
+    def test_fortran_order(self):
+        src_array = np.asfortranarray(np.random.random((1000, 2)))
+        buffer = core._stdin_buffer(src_array)
+        self.assertEqual(src_array.T.tobytes(order='F'), buffer.tobytes())
+
+    def test_strided(self):
+        src_array = np.arange(3000, dtype=np.int16).reshape(1000, 3)[::2, :2]
+        buffer = core._stdin_buffer(src_array)
+        self.assertEqual(src_array.T.tobytes(order='F'), buffer.tobytes())
+
+    def test_empty(self):
+        buffer = core._stdin_buffer(np.zeros((0, 2), dtype=np.float32))
+        self.assertEqual(0, len(buffer))
+
+
+class TestSoxStream(unittest.TestCase):
+
+    def test_base_case(self):
+        args = [INPUT_FILE, '-t', 's16', '-']
+        chunks = list(core.sox_stream(args, chunk_size=1000))
+        self.assertEqual(1000, len(chunks[0]))
+        self.assertEqual(441000 * 2, sum(len(c) for c in chunks))
+
+    def test_src_array(self):
+        src_array = np.arange(1000, dtype=np.int16)
+        args = ['-t', 's16', '-r', '8000', '-c', '1', '-', '-t', 's16', '-']
+        out = b''.join(core.sox_stream(args, src_array, chunk_size=64))
+        self.assertEqual(src_array.tobytes(), out)
+
+    def test_sox_fail(self):
+        with self.assertRaises(core.SoxError):
+            list(core.sox_stream(['asdf.wav', '-t', 's16', '-']))
+
+    def test_src_array_invalid(self):
+        with self.assertRaises(TypeError):
+            list(core.sox_stream(['-', '-'], 'not a numpy array'))
+
+
+class TestReap(unittest.TestCase):
+
+    def test_exit_code(self):
+        process_handle = subprocess.Popen(
+            [sys.executable, '-c', 'import sys; sys.exit(3)']
+        )
+        status, rusage = core._reap(process_handle)
+        self.assertEqual(3, status)
+        self.assertEqual(3, process_handle.returncode)
+        if hasattr(os, 'wait4'):
+            self.assertGreater(rusage.ru_maxrss, 0)
+
+    def test_signal(self):
+        process_handle = subprocess.Popen(
+            [sys.executable, '-c', 'import time; time.sleep(30)']
+        )
+        process_handle.kill()
+        status, _ = core._reap(process_handle)
+        self.assertNotEqual(0, status)
+
+    def test_already_waited(self):
+        process_handle = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process_handle.wait()
+        self.assertEqual((0, None), core._reap(process_handle))
+
+
+class TestSoxBlocks(unittest.TestCase):
+
+    def setUp(self):
+        self.args = [
+            '-t', 's16', '-r', '8000', '-c', '2', '-', '-t', 's16', '-'
+        ]
+        self.blocks = [
+            np.arange(i * 1000, (i + 1) * 1000, dtype=np.int16).reshape(-1, 2)
+            for i in range(20)
+        ]
+        self.expected = np.concatenate(self.blocks).tobytes()
+
+    def test_sox(self):
+        status, out, _ = core.sox(self.args, iter(self.blocks))
+        self.assertEqual(0, status)
+        self.assertEqual(self.expected, out)
+
+    def test_generator(self):
+        blocks = (block for block in self.blocks)
+        status, out, _ = core.sox(self.args, blocks)
+        self.assertEqual(self.expected, out)
+
+    def test_sox_stream(self):
+        out = b''.join(
+            core.sox_stream(self.args, iter(self.blocks), chunk_size=64)
+        )
+        self.assertEqual(self.expected, out)
+
+    def test_sox_readinto(self):
+        buffer = np.zeros((12000, 2), dtype=np.int16)
+        status, n_bytes, _ = core.sox_readinto(
+            self.args, buffer, iter(self.blocks)
+        )
+        self.assertEqual(len(self.expected), n_bytes)
+        self.assertEqual(self.expected, buffer.tobytes()[:n_bytes])
+
+    def test_iterator_error(self):
+        def blocks():
+            yield self.blocks[0]
+            raise IOError("connection lost")
+        with self.assertRaises(IOError):
+            core.sox(self.args, blocks())
+        with self.assertRaises(IOError):
+            list(core.sox_stream(self.args, blocks()))
+
+    def test_mismatched_block(self):
+        blocks = iter([self.blocks[0], self.blocks[1].astype(np.float32)])
+        with self.assertRaises(ValueError):
+            core.sox(self.args, blocks)
+
+    def test_backpressure(self):
+        produced = []
+
+        def blocks():
+            for i in range(1000):
+                produced.append(i)
+                yield np.zeros((65536, 2), dtype=np.int16)
+
+        chunks = core.sox_stream(self.args, blocks(), chunk_size=1024)
+        next(chunks)
+        time.sleep(0.2)
+        chunks.close()
+        self.assertLess(len(produced), 1000)
+
+
+class TestBlocks(unittest.TestCase):
+
+    def test_iterate(self):
+        arrays = [np.zeros(10), np.ones(5)]
+        blocks = core._Blocks(iter(arrays))
+        self.assertIs(arrays[0], blocks.first)
+        self.assertEqual(arrays, list(blocks))
+        self.assertEqual(120, blocks.nbytes)
+        blocks.raise_error()
+
+    def test_iterate_twice(self):
+        blocks = core._Blocks(iter([np.zeros(10)]))
+        list(blocks)
+        with self.assertRaises(ValueError):
+            list(blocks)
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            core._Blocks(iter([]))
+
+    def test_not_array(self):
+        with self.assertRaises(TypeError):
+            core._Blocks(iter([[0.0, 1.0]]))
+
+    def test_mismatched_channels(self):
+        blocks = core._Blocks(iter([np.zeros((10, 2)), np.zeros((10, 3))]))
+        self.assertEqual(1, len(list(blocks)))
+        with self.assertRaises(ValueError):
+            blocks.raise_error()
+
+    def test_as_blocks(self):
+        src_array = np.zeros(10)
+        self.assertIs(src_array, core._as_blocks(src_array))
+        self.assertIsNone(core._as_blocks(None))
+        blocks = core._as_blocks(iter([src_array]))
+        self.assertIsInstance(blocks, core._Blocks)
+        self.assertIs(blocks, core._as_blocks(blocks))
+
+
+class TestSoxPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = core.SoxPool(n_workers=2, max_jobs_per_worker=2)
+
+    def tearDown(self):
+        core.set_pool(None)
+        self.pool.close()
+
+    def test_run(self):
+        args = ['sox', INPUT_FILE, OUTPUT_FILE]
+        expected = (0, '', '')
+        actual = self.pool.run(args)
+        self.assertEqual(expected, actual)
+
+    def test_sox_uses_pool(self):
+        core.set_pool(self.pool)
+        args = [INPUT_FILE, OUTPUT_FILE]
+        expected = (0, '', '')
+        with mock.patch.object(
+                self.pool, 'run', wraps=self.pool.run) as run:
+            actual = core.sox(args)
+        self.assertEqual(expected, actual)
+        run.assert_called_once_with(
+            ['sox', INPUT_FILE, OUTPUT_FILE], None, True
+        )
+
+    def test_array_not_routed(self):
+        core.set_pool(self.pool)
+        src_array = np.arange(1000, dtype=np.int16)
+        args = ['-t', 's16', '-r', '8000', '-c', '1', '-', '-t', 's16', '-']
+        with mock.patch.object(self.pool, 'run') as run:
+            status, out, _ = core.sox(args, src_array)
+        self.assertEqual(0, status)
+        self.assertEqual(src_array.tobytes(), out)
+        run.assert_not_called()
+
+    def test_worker_recycled(self):
+        pool = core.SoxPool(n_workers=1, max_jobs_per_worker=1)
+        try:
+            pids = [pool._pool.apply(os.getpid) for _ in range(2)]
+        finally:
+            pool.close()
+        self.assertNotEqual(pids[0], pids[1])
+
+    def test_timeout(self):
+        pool = core.SoxPool(n_workers=2, timeout=0.5)
+        try:
+            old_pool = pool._pool
+            # another job is still running on the pool
+            pool._n_running[old_pool] += 1
+            with self.assertRaises(core.SoxTimeoutError):
+                pool.run(['sox', '-n', '-n', 'synth', '10:00:00', 'sine'])
+            self.assertIsNot(old_pool, pool._pool)
+            # the other job's helpers are left alone until it finishes
+            self.assertGreater(old_pool.apply(os.getpid), 0)
+            pool._release(old_pool)
+            with self.assertRaises(ValueError):
+                old_pool.apply(os.getpid)
+            self.assertEqual(
+                (0, '', ''), pool.run(['sox', INPUT_FILE, OUTPUT_FILE])
+            )
+        finally:
+            pool.close()
+
+    @unittest.skipUnless(
+        hasattr(os, 'mkfifo') and os.path.isdir('/proc/self'),
+        "needs os.mkfifo and /proc"
+    )
+    def test_timeout_kills_sox(self):
+        tmp_dir = tempfile.mkdtemp()
+        fifo = os.path.join(tmp_dir, 'never_written.raw')
+        os.mkfifo(fifo)
+        pool = core.SoxPool(n_workers=1, timeout=0.5)
+        try:
+            # opening the FIFO blocks until a writer appears, i.e. forever
+            args = ['sox', '-t', 's16', '-r', '8000', '-c', '1', fifo, '-n']
+            with self.assertRaises(core.SoxTimeoutError):
+                pool.run(args)
+            deadline = time.time() + 5
+            while _processes_using(fifo) and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertEqual([], _processes_using(fifo))
+        finally:
+            pool.close()
+            shutil.rmtree(tmp_dir)
+
+    def test_timeout_is_sox_error(self):
+        self.assertTrue(issubclass(core.SoxTimeoutError, core.SoxError))
+
+    def test_recycling(self):
+        core.set_pool(self.pool)
+        for _ in range(5):
+            actual = core.sox([INPUT_FILE, OUTPUT_FILE])
+            self.assertEqual((0, '', ''), actual)
+
+    def test_src_array_invalid(self):
+        core.set_pool(self.pool)
+        args = ['input.wav', 'output.xyz']
+        actual_status, _, _ = core.sox(args, 'not a numpy array')
+        self.assertEqual(1, actual_status)
+
+    def test_is_healthy(self):
+        self.assertTrue(self.pool.is_healthy())
+
+    def test_is_healthy_busy_worker(self):
+        # one helper is busy, so the other one answers every ping alone
+        job = self.pool._pool.apply_async(time.sleep, (3, ))
+        self.assertFalse(self.pool.is_healthy(timeout=0.5))
+        job.get()
+        self.assertTrue(self.pool.is_healthy())
+
+    def test_closed(self):
+        self.pool.close()
+        self.assertFalse(self.pool.is_healthy())
+        with self.assertRaises(core.SoxError):
+            self.pool.run(['sox', INPUT_FILE, OUTPUT_FILE])
+
+    def test_restart(self):
+        self.pool.close()
+        self.pool.restart()
+        self.assertTrue(self.pool.is_healthy())
+
+    def test_get_pool(self):
+        self.assertIsNone(core.get_pool())
+        core.set_pool(self.pool)
+        self.assertIs(self.pool, core.get_pool())
+
+    def test_set_pool_invalid(self):
+        with self.assertRaises(TypeError):
+            core.set_pool('pool')
+
+    def test_invalid_n_workers(self):
+        with self.assertRaises(ValueError):
+            core.SoxPool(n_workers=0)
+
+    def test_invalid_max_jobs_per_worker(self):
+        with self.assertRaises(ValueError):
+            core.SoxPool(max_jobs_per_worker=1.5)
+
+    def test_invalid_timeout(self):
+        with self.assertRaises(ValueError):
+            core.SoxPool(timeout=-1)
+
+
+def _processes_using(path):
+    '''Pids of the running processes with path on their command line.'''
+    pids = []
+    for pid in os.listdir('/proc'):
+        try:
+            with open(os.path.join('/proc', pid, 'cmdline'), 'rb') as fhandle:
+                cmdline = fhandle.read().split(b'\0')
+            with open(os.path.join('/proc', pid, 'stat'), 'rb') as fhandle:
+                state = fhandle.read().rsplit(b')', 1)[1].split()[0]
+        except (IOError, OSError):
+            continue
+        if path.encode() in cmdline and state != b'Z':
+            pids.append(int(pid))
+    return pids
+
+
 class TestGetValidFormats(unittest.TestCase):
 
     def setUp(self):
@@ -100,6 +562,42 @@ class TestGetValidFormats(unittest.TestCase):
         core.NO_SOX = False
 
 
+class TestGetValidFormatsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        os.environ['PYSOX_CACHE_DIR'] = self.cache_dir
+
+    def tearDown(self):
+        del os.environ['PYSOX_CACHE_DIR']
+        shutil.rmtree(self.cache_dir)
+
+    def test_cache_dir(self):
+        self.assertEqual(self.cache_dir, core._cache_dir())
+
+    def test_cache_written(self):
+        formats = core._get_valid_formats()
+        cache_file = os.path.join(self.cache_dir, 'formats.json')
+        self.assertTrue(os.path.exists(cache_file))
+        self.assertEqual(formats, core._get_valid_formats())
+
+    def test_cache_read(self):
+        core._get_valid_formats()
+        cache_file = os.path.join(self.cache_dir, 'formats.json')
+        with open(cache_file) as fhandle:
+            cached = json.load(fhandle)
+        cached['formats'] = ['blorg']
+        with open(cache_file, 'w') as fhandle:
+            json.dump(cached, fhandle)
+        self.assertEqual(['blorg'], core._get_valid_formats())
+
+    def test_stale_cache(self):
+        cache_file = os.path.join(self.cache_dir, 'formats.json')
+        with open(cache_file, 'w') as fhandle:
+            json.dump({'key': ['/not/sox', 0], 'formats': ['blorg']}, fhandle)
+        self.assertNotIn('blorg', core._get_valid_formats())
+
+
 class TestValidFormats(unittest.TestCase):
 
     def test_wav(self):
@@ -114,6 +612,14 @@ class TestValidFormats(unittest.TestCase):
         self.assertNotIn('FORMATS', core.VALID_FORMATS)
         self.assertNotIn('AUDIO FILE FORMATS', core.VALID_FORMATS)
 
+    def test_add(self):
+        actual = core.VALID_FORMATS + [None]
+        self.assertEqual(list(core.VALID_FORMATS) + [None], actual)
+        self.assertIsInstance(actual, list)
+
+    def test_equal(self):
+        self.assertEqual(core.VALID_FORMATS, core._get_valid_formats())
+
 
 class TestSoxi(unittest.TestCase):
 
@@ -127,6 +633,11 @@ class TestSoxi(unittest.TestCase):
         expected = '80000'
         self.assertEqual(expected, actual)
 
+    def test_all_fields(self):
+        actual = core.soxi(INPUT_FILE, None)
+        self.assertIn('Channels       : 1', actual)
+        self.assertIn('441000 samples', actual)
+
     def test_invalid_argument(self):
         with self.assertRaises(ValueError):
             core.soxi(INPUT_FILE, 'booger')
@@ -144,6 +655,26 @@ class TestSoxi(unittest.TestCase):
             core.soxi(INPUT_FILE_CORRUPT, 's')
 
 
+class TestAsoxi(unittest.TestCase):
+
+    def test_base_case(self):
+        actual = asyncio.run(core.asoxi(INPUT_FILE, 's'))
+        expected = '441000'
+        self.assertEqual(expected, actual)
+
+    def test_all_fields(self):
+        actual = asyncio.run(core.asoxi(INPUT_FILE, None))
+        self.assertIn('Channels       : 1', actual)
+
+    def test_invalid_argument(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(core.asoxi(INPUT_FILE, 'booger'))
+
+    def test_nonexistent_file(self):
+        with self.assertRaises(SoxiError):
+            asyncio.run(core.asoxi('data/asdf.wav', 's'))
+
+
 @unittest.skip("Tests pass on local machine and fail on remote.")
 class TestPlay(unittest.TestCase):
 
@@ -0,0 +1,120 @@
+import json
+import unittest
+
+import numpy as np
+
+from sox import transform
+from sox.effect import Effect
+
+
+def new_transformer():
+    return transform.Transformer()
+
+
+class TestEffect(unittest.TestCase):
+
+    def setUp(self):
+        self.effect = Effect(
+            'vol', {'gain': 0.5, 'gain_type': 'amplitude'},
+            ['vol', '0.500000', 'amplitude']
+        )
+
+    def test_attributes(self):
+        self.assertEqual('vol', self.effect.name)
+        self.assertEqual(
+            {'gain': 0.5, 'gain_type': 'amplitude'}, self.effect.params
+        )
+        self.assertEqual(('vol', '0.500000', 'amplitude'), self.effect.args)
+        self.assertEqual(['vol', '0.500000', 'amplitude'], self.effect.argv())
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            self.effect.other = 1
+
+    def test_equal(self):
+        other = Effect('vol', {}, ['vol', '0.500000', 'amplitude'])
+        self.assertEqual(self.effect, other)
+        self.assertEqual(hash(self.effect), hash(other))
+        self.assertEqual(1, len(set([self.effect, other])))
+
+    def test_not_equal(self):
+        self.assertNotEqual(
+            self.effect, Effect('vol', {}, ['vol', '0.250000', 'amplitude'])
+        )
+        self.assertNotEqual(
+            self.effect, Effect('gain', {}, ['vol', '0.500000', 'amplitude'])
+        )
+        self.assertNotEqual(self.effect, ['vol', '0.500000', 'amplitude'])
+
+    def test_repr(self):
+        self.assertEqual(
+            "Effect('vol', {'gain': 0.5, 'gain_type': 'amplitude'}, "
+            "['vol', '0.500000', 'amplitude'])",
+            repr(self.effect)
+        )
+
+    def test_to_dict(self):
+        effect = Effect(
+            'fir', {'coefficients': np.array([0.5, 0.25]), 'other': (1, 2)},
+            ['fir', '0.500000', '0.250000']
+        )
+        expected = {
+            'name': 'fir',
+            'params': {'coefficients': [0.5, 0.25], 'other': [1, 2]},
+            'args': ['fir', '0.500000', '0.250000']
+        }
+        self.assertEqual(expected, effect.to_dict())
+
+    def test_json_round_trip(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).fade(0.1, 0.2).remix({1: [1, 2]})
+        serialized = json.dumps(
+            [effect.to_dict() for effect in tfm.effect_chain]
+        )
+        actual = [
+            Effect.from_dict(effect_dict)
+            for effect_dict in json.loads(serialized)
+        ]
+        self.assertEqual(tfm.effect_chain, actual)
+
+    def test_json_round_trip_fir_file(self):
+        coefficients = np.hanning(transform.FIR_MAX_ARGS + 1) / 512.0
+        tfm = new_transformer()
+        tfm.fir(coefficients).fir([0.1234567891])
+        serialized = json.dumps(
+            [effect.to_dict() for effect in tfm.effect_chain]
+        )
+        restored = new_transformer()
+        restored.set_effect_chain([
+            Effect.from_dict(effect_dict)
+            for effect_dict in json.loads(serialized)
+        ])
+        self.assertEqual(tfm.effects, restored.effects)
+        args, fir_files = transform._write_fir_files(restored.effects)
+        try:
+            self.assertEqual(
+                coefficients.tolist(), np.loadtxt(args[1]).tolist()
+            )
+            self.assertEqual(0.1234567891, float(np.loadtxt(args[3])))
+        finally:
+            transform._remove_files(fir_files)
+        self.assertEqual(2, len(fir_files))
+
+    def test_to_dict_fir_file_without_params(self):
+        tfm = new_transformer()
+        tfm.fir([0.1234567891])
+        effect = Effect('fir', {}, tfm.effects)
+        effect_dict = effect.to_dict()
+        self.assertEqual([0.1234567891], effect_dict['params']['coefficients'])
+        self.assertEqual(
+            tfm.effects[1].coefficients,
+            Effect.from_dict(effect_dict).args[1].coefficients
+        )
+
+    def test_from_dict_invalid(self):
+        with self.assertRaises(TypeError):
+            Effect.from_dict(['vol'])
+        with self.assertRaises(ValueError):
+            Effect.from_dict({'name': 'vol', 'args': ['vol']})
+        with self.assertRaises(ValueError):
+            Effect.from_dict({'name': 'vol', 'params': {}, 'args': [0.5]})
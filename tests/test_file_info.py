@@ -1,5 +1,11 @@
+import asyncio
 import unittest
+import csv
 import os
+import shutil
+import struct
+import tempfile
+from unittest import mock
 
 from sox import file_info
 from sox.core import SoxError
@@ -205,6 +211,26 @@ class TestSilent(unittest.TestCase):
         expected = True
         self.assertEqual(expected, actual)
 
+    def test_matches_ainfo(self):
+        # the mean norm of all samples, as computed by sox stat
+        stat_output = 'Samples read: 4\nMean    norm:  0.002\n'
+
+        async def fake_asox(args):
+            return 0, '', stat_output
+
+        with mock.patch.object(
+                file_info, 'sox', return_value=(0, '', stat_output)):
+            self.assertFalse(file_info.silent(INPUT_FILE))
+        with mock.patch.object(file_info, 'asox', fake_asox):
+            actual = asyncio.run(file_info.ainfo(INPUT_FILE))
+        self.assertFalse(actual['silent'])
+
+    def test_sox_error(self):
+        with mock.patch.object(
+                file_info, 'sox', return_value=(1, None, None)):
+            with self.assertRaises(SoxError):
+                file_info.silent(INPUT_FILE)
+
 
 class TestFileExtension(unittest.TestCase):
 
@@ -250,6 +276,146 @@ class TestInfo(unittest.TestCase):
         }
         self.assertEqual(expected, actual)
 
+    def test_no_silent(self):
+        actual = file_info.info(INPUT_FILE, include_silent=False)
+        expected = {
+            'channels': 1,
+            'sample_rate': 44100.0,
+            'bitdepth': 16,
+            'bitrate': 706000.0,
+            'duration': 10.0,
+            'num_samples': 441000,
+            'encoding': 'Signed Integer PCM'
+        }
+        self.assertEqual(expected, actual)
+
+    def test_header_without_soxi(self):
+        with mock.patch.object(file_info, 'soxi') as soxi:
+            actual = file_info.info(INPUT_FILE2, include_silent=False)
+        soxi.assert_not_called()
+        expected = {
+            'channels': 3,
+            'sample_rate': 8000.0,
+            'bitdepth': 32,
+            'bitrate': 768000.0,
+            'duration': 10.0,
+            'num_samples': 80000,
+            'encoding': 'Signed Integer PCM'
+        }
+        self.assertEqual(expected, actual)
+
+    def test_matches_single_calls(self):
+        actual = file_info.info(INPUT_FILE2, include_silent=False)
+        expected = {
+            'channels': file_info.channels(INPUT_FILE2),
+            'sample_rate': file_info.sample_rate(INPUT_FILE2),
+            'bitdepth': file_info.bitdepth(INPUT_FILE2),
+            'bitrate': file_info.bitrate(INPUT_FILE2),
+            'duration': file_info.duration(INPUT_FILE2),
+            'num_samples': file_info.num_samples(INPUT_FILE2),
+            'encoding': file_info.encoding(INPUT_FILE2)
+        }
+        self.assertEqual(expected, actual)
+
+    def test_empty(self):
+        actual = file_info.info(EMPTY_FILE, include_silent=False)
+        self.assertIsNone(actual['duration'])
+        self.assertIsNone(actual['num_samples'])
+
+    def test_nonexistent(self):
+        with self.assertRaises(IOError):
+            file_info.info('data/asdfasdfasdf.wav')
+
+
+class TestAinfo(unittest.TestCase):
+
+    def test_matches_info(self):
+        expected = file_info.info(INPUT_FILE)
+        actual = asyncio.run(file_info.ainfo(INPUT_FILE))
+        self.assertEqual(expected, actual)
+
+    def test_no_silent(self):
+        actual = asyncio.run(file_info.ainfo(INPUT_FILE, include_silent=False))
+        self.assertNotIn('silent', actual)
+        self.assertEqual(441000, actual['num_samples'])
+
+    def test_silent(self):
+        actual = asyncio.run(file_info.ainfo(SILENT_FILE))
+        self.assertTrue(actual['silent'])
+
+    def test_nonexistent(self):
+        with self.assertRaises(IOError):
+            asyncio.run(file_info.ainfo('data/asdfasdfasdf.wav'))
+
+    def test_sox_error(self):
+        async def failing_asox(args):
+            return 1, None, None
+
+        with mock.patch.object(file_info, 'asox', failing_asox):
+            with self.assertRaises(SoxError):
+                asyncio.run(file_info.ainfo(INPUT_FILE))
+
+
+class TestParseSoxiInfo(unittest.TestCase):
+
+    def test_real_output(self):
+        soxi_output = (
+            "\nInput File     : 'input.wav'\nChannels       : 1\nSample "
+            "Rate    : 44100\nPrecision      : 16-bit\nDuration       : "
+            "00:00:10.00 = 441000 samples ~ 750 CDDA sectors\nFile Size   "
+            "   : 882k\nBit Rate       : 706k\nSample Encoding: 16-bit "
+            "Signed Integer PCM\n"
+        )
+        expected = {
+            'channels': 1,
+            'sample_rate': 44100.0,
+            'bitdepth': 16,
+            'bitrate': 706000.0,
+            'duration': 10.0,
+            'num_samples': 441000,
+            'encoding': 'Signed Integer PCM'
+        }
+        actual = file_info._parse_soxi_info(soxi_output)
+        self.assertEqual(expected, actual)
+
+    def test_no_length(self):
+        soxi_output = (
+            "Input File     : 'empty.wav'\nChannels       : 2\nSample "
+            "Rate    : 8000\nPrecision      : 16-bit\nSample Encoding: "
+            "16-bit Signed Integer PCM\n"
+        )
+        expected = {
+            'channels': 2,
+            'sample_rate': 8000.0,
+            'bitdepth': 16,
+            'bitrate': None,
+            'duration': None,
+            'num_samples': None,
+            'encoding': 'Signed Integer PCM'
+        }
+        actual = file_info._parse_soxi_info(soxi_output)
+        self.assertEqual(expected, actual)
+
+    def test_no_bitdepth(self):
+        soxi_output = (
+            "Input File     : 'a: b.mp3'\nChannels       : 2\nSample "
+            "Rate    : 44100\nPrecision      : 16-bit\nDuration       : "
+            "00:00:01.00 = 44100 samples ~ 75 CDDA sectors\nFile Size   "
+            "   : 16.4k\nBit Rate       : 128k\nSample Encoding: MPEG "
+            "audio (layer I, II or III)\nComments       : \nTitle=a: b\n"
+        )
+        expected = {
+            'channels': 2,
+            'sample_rate': 44100.0,
+            'bitdepth': None,
+            'bitrate': 128000.0,
+            'duration': 1.0,
+            'num_samples': 44100,
+            'encoding': 'MPEG audio (layer I, II or III)'
+        }
+        actual = file_info._parse_soxi_info(soxi_output)
+        self.assertEqual(expected, actual)
+
 
 class TestValidateInputFile(unittest.TestCase):
 
@@ -418,3 +584,214 @@ class TestParseStat(unittest.TestCase):
         actual = file_info._parse_stat(stat_output)
         self.assertEqual(expected, actual)
 
+
+class TestReadHeader(unittest.TestCase):
+
+    def test_wav(self):
+        expected = {
+            'c': '1', 'r': '44100', 'b': '16', 's': '441000',
+            'D': '10.000000', 'e': 'Signed Integer PCM'
+        }
+        actual = file_info._read_header(INPUT_FILE)
+        self.assertEqual(expected, actual)
+
+    def test_spacey_wav(self):
+        actual = file_info._read_header(SPACEY_FILE)
+        self.assertEqual('8000', actual['r'])
+        self.assertEqual('80000', actual['s'])
+
+    def test_wav_extensible(self):
+        actual = file_info._read_header(relpath('data/input3.wav'))
+        self.assertEqual('3', actual['c'])
+        self.assertEqual('Signed Integer PCM', actual['e'])
+
+    def test_wav_fact_chunk(self):
+        actual = file_info._read_header(SILENT_FILE)
+        self.assertEqual('627456', actual['s'])
+        self.assertEqual('14.228027', actual['D'])
+
+    def test_aiff(self):
+        expected = {
+            'c': '3', 'r': '8000', 'b': '32', 's': '80000',
+            'D': '10.000000', 'e': 'Signed Integer PCM'
+        }
+        actual = file_info._read_header(INPUT_FILE2)
+        self.assertEqual(expected, actual)
+
+    def test_flac(self):
+        # 48 kHz, 2 channels, 24 bits, 96000 samples
+        packed = (48000 << 44) | (1 << 41) | (23 << 36) | 96000
+        streaminfo = (
+            b'\x10\x00\x10\x00' + b'\x00' * 6 +
+            struct.pack('>Q', packed) + b'\x00' * 16
+        )
+        fd, flac_file = tempfile.mkstemp(suffix='.flac')
+        with os.fdopen(fd, 'wb') as fhandle:
+            fhandle.write(b'fLaC\x80\x00\x00\x22' + streaminfo)
+        expected = {
+            'c': '2', 'r': '48000', 'b': '24', 's': '96000',
+            'D': '2.000000', 'e': 'FLAC'
+        }
+        actual = file_info._read_header(flac_file)
+        os.remove(flac_file)
+        self.assertEqual(expected, actual)
+
+    def test_empty(self):
+        self.assertIsNone(file_info._read_header(EMPTY_FILE))
+
+    def test_corrupt_aiff(self):
+        self.assertIsNone(file_info._read_header(relpath('data/empty.aiff')))
+
+    def test_unsupported_format(self):
+        self.assertIsNone(file_info._read_header(INPUT_FILE_INVALID))
+
+    def test_extended_to_float(self):
+        actual = file_info._extended_to_float(
+            b'\x40\x0e\xac\x44\x00\x00\x00\x00\x00\x00'
+        )
+        self.assertEqual(44100.0, actual)
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.wav_file = os.path.join(self.tmp_dir, 'input.wav')
+        shutil.copy(INPUT_FILE, self.wav_file)
+        file_info.set_cache()
+
+    def tearDown(self):
+        file_info.set_cache()
+        shutil.rmtree(self.tmp_dir)
+
+    def cache_key(self):
+        file_stat = os.stat(self.wav_file)
+        return (self.wav_file, file_stat.st_size, file_stat.st_mtime_ns)
+
+    def test_cached(self):
+        self.assertEqual(1, file_info.channels(self.wav_file))
+        self.assertEqual('1', file_info._CACHE.get(self.cache_key(), 'c'))
+
+    def test_invalidated_by_mtime(self):
+        file_info.channels(self.wav_file)
+        file_stat = os.stat(self.wav_file)
+        os.utime(self.wav_file, ns=(
+            file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9
+        ))
+        self.assertIsNone(file_info._CACHE.get(self.cache_key(), 'c'))
+
+    def test_lru_eviction(self):
+        file_info.set_cache(max_size=1)
+        file_info.channels(self.wav_file)
+        file_info.sample_rate(self.wav_file)
+        self.assertIsNone(file_info._CACHE.get(self.cache_key(), 'c'))
+        self.assertEqual('44100', file_info._CACHE.get(self.cache_key(), 'r'))
+
+    def test_disabled(self):
+        file_info.set_cache(max_size=0)
+        self.assertEqual(1, file_info.channels(self.wav_file))
+        self.assertIsNone(file_info._CACHE.get(self.cache_key(), 'c'))
+
+    def test_clear(self):
+        file_info.channels(self.wav_file)
+        file_info.clear_cache()
+        self.assertIsNone(file_info._CACHE.get(self.cache_key(), 'c'))
+
+    def test_sqlite(self):
+        db_path = os.path.join(self.tmp_dir, 'metadata.db')
+        file_info.set_cache(db_path=db_path)
+        self.assertEqual(44100.0, file_info.sample_rate(self.wav_file))
+        file_info.set_cache(max_size=0, db_path=db_path)
+        self.assertEqual('44100', file_info._CACHE.get(self.cache_key(), 'r'))
+
+    def test_invalid_max_size(self):
+        with self.assertRaises(ValueError):
+            file_info.set_cache(max_size=-1)
+
+    def test_invalid_db_path(self):
+        with self.assertRaises(ValueError):
+            file_info.set_cache(db_path=1)
+
+
+class TestScan(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.tmp_dir, 'sub'))
+        shutil.copy(INPUT_FILE, os.path.join(self.tmp_dir, 'a.wav'))
+        shutil.copy(INPUT_FILE2, os.path.join(self.tmp_dir, 'sub', 'b.aiff'))
+        with open(os.path.join(self.tmp_dir, 'notes.txt'), 'w') as fhandle:
+            fhandle.write('not audio')
+        self.manifest = os.path.join(self.tmp_dir, 'manifest.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_directory(self):
+        actual = list(file_info.scan(self.tmp_dir, n_jobs=2))
+        self.assertEqual(
+            [os.path.join(self.tmp_dir, 'a.wav'),
+             os.path.join(self.tmp_dir, 'sub', 'b.aiff')],
+            [row['filepath'] for row in actual]
+        )
+        expected = {
+            'filepath': os.path.join(self.tmp_dir, 'a.wav'),
+            'channels': 1,
+            'sample_rate': 44100.0,
+            'bitdepth': 16,
+            'duration': 10.0,
+            'num_samples': 441000,
+            'encoding': 'Signed Integer PCM',
+            'error': None
+        }
+        self.assertEqual(expected, actual[0])
+        self.assertEqual(3, actual[1]['channels'])
+
+    def test_header_without_soxi(self):
+        with mock.patch.object(file_info, 'soxi') as soxi:
+            actual = list(file_info.scan(self.tmp_dir))
+        soxi.assert_not_called()
+        self.assertEqual(441000, actual[0]['num_samples'])
+        self.assertEqual(80000, actual[1]['num_samples'])
+
+    def test_glob(self):
+        pattern = os.path.join(self.tmp_dir, '**', '*.aiff')
+        actual = list(file_info.scan(pattern))
+        self.assertEqual(1, len(actual))
+        self.assertEqual(8000.0, actual[0]['sample_rate'])
+
+    def test_error(self):
+        actual = list(file_info.scan([EMPTY_FILE, relpath('data/empty.aiff')]))
+        self.assertIsNotNone(actual[1]['error'])
+        self.assertIsNone(actual[1]['channels'])
+
+    def test_manifest(self):
+        rows = list(file_info.scan(self.tmp_dir, manifest_path=self.manifest))
+        with open(self.manifest, newline='') as fhandle:
+            manifest_rows = list(csv.DictReader(fhandle))
+        self.assertEqual(
+            [row['filepath'] for row in rows],
+            [row['filepath'] for row in manifest_rows]
+        )
+        self.assertEqual('441000', manifest_rows[0]['num_samples'])
+
+    def test_resume(self):
+        a_file = os.path.join(self.tmp_dir, 'a.wav')
+        list(file_info.scan(a_file, manifest_path=self.manifest))
+        actual = list(
+            file_info.scan(self.tmp_dir, manifest_path=self.manifest)
+        )
+        self.assertEqual(
+            [os.path.join(self.tmp_dir, 'sub', 'b.aiff')],
+            [row['filepath'] for row in actual]
+        )
+        with open(self.manifest, newline='') as fhandle:
+            self.assertEqual(2, len(list(csv.DictReader(fhandle))))
+
+    def test_invalid_paths(self):
+        with self.assertRaises(TypeError):
+            list(file_info.scan(1))
+
+    def test_invalid_n_jobs(self):
+        with self.assertRaises(ValueError):
+            list(file_info.scan(self.tmp_dir, n_jobs=0))
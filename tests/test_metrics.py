@@ -0,0 +1,187 @@
+import asyncio
+import unittest
+import os
+
+import numpy as np
+
+from sox import array_stat
+from sox import core
+from sox import metrics
+from sox import transform
+from sox import combine
+from sox.core import SoxError
+
+
+def relpath(f):
+    return os.path.join(os.path.dirname(__file__), f)
+
+
+INPUT_FILE = relpath('data/input.wav')
+OUTPUT_FILE = relpath('data/output.wav')
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.records = []
+        metrics.set_metrics_hook(self.records.append)
+
+    def tearDown(self):
+        metrics.set_metrics_hook(None)
+
+
+class TestSetMetricsHook(unittest.TestCase):
+
+    def tearDown(self):
+        metrics.set_metrics_hook(None)
+
+    def test_default(self):
+        self.assertIsNone(metrics.get_metrics_hook())
+
+    def test_set(self):
+        metrics.set_metrics_hook(print)
+        self.assertIs(print, metrics.get_metrics_hook())
+
+    def test_invalid(self):
+        with self.assertRaises(TypeError):
+            metrics.set_metrics_hook('hook')
+
+    def test_no_hook(self):
+        with metrics._measure() as record:
+            self.assertIsNone(record)
+
+    def test_hook_error_ignored(self):
+        def hook(record):
+            raise RuntimeError()
+        metrics.set_metrics_hook(hook)
+        with metrics._measure():
+            pass
+
+
+class TestBuildMetrics(MetricsTestCase):
+
+    def test_phases(self):
+        with metrics._measure(['vol']) as record:
+            with metrics._phase('args'):
+                with metrics._phase('probe'):
+                    pass
+            with metrics._phase('sox'):
+                pass
+        self.assertEqual([record], self.records)
+        self.assertEqual(['vol'], record.effects)
+        self.assertEqual(['args', 'probe', 'sox'], list(record.phases))
+        self.assertLessEqual(sum(record.phases.values()), record.wall_time)
+
+    def test_nested_measure(self):
+        with metrics._measure() as outer:
+            with metrics._measure() as inner:
+                self.assertIs(outer, inner)
+        self.assertEqual([outer], self.records)
+
+    def test_probe_processes_not_counted(self):
+        with metrics._measure() as record:
+            with metrics._phase('probe'):
+                with metrics._phase('sox'):
+                    metrics._record_process(['sox'], 0, 10, 10)
+            metrics._record_process(['sox', '-n'], 0, 1, 2)
+        self.assertEqual(['probe'], list(record.phases))
+        self.assertEqual(1, record.n_processes)
+        self.assertEqual(['sox', '-n'], record.args)
+        self.assertEqual((1, 2), (record.bytes_in, record.bytes_out))
+
+    def test_to_dict(self):
+        with metrics._measure() as record:
+            pass
+        actual = record.to_dict()
+        self.assertEqual(0, actual['n_processes'])
+        self.assertNotIn('_stack', actual)
+
+
+class TestSoxMetrics(MetricsTestCase):
+
+    def test_sox(self):
+        args = ['-n', '-t', 's16', '-', 'synth', '1', 'sine', '440']
+        core.sox(args, decode_out_with_utf=False)
+        record, = self.records
+        self.assertEqual(1, record.n_processes)
+        self.assertEqual(0, record.status)
+        self.assertEqual(16000, record.bytes_out)
+        self.assertIn('spawn', record.phases)
+        self.assertIn('sox', record.phases)
+        if hasattr(os, 'wait4'):
+            self.assertGreater(record.max_rss, 0)
+            self.assertGreaterEqual(record.cpu_time, 0)
+
+    def test_src_array(self):
+        src_array = np.arange(1000, dtype=np.int16)
+        args = ['-t', 's16', '-r', '8000', '-c', '1', '-', '-t', 's16', '-']
+        core.sox(args, src_array)
+        record, = self.records
+        self.assertEqual(2000, record.bytes_in)
+        self.assertEqual(2000, record.bytes_out)
+
+    def test_asox(self):
+        args = ['-n', '-t', 's16', '-', 'synth', '1', 'sine', '440']
+        asyncio.run(core.asox(args, decode_out_with_utf=False))
+        record, = self.records
+        self.assertEqual(16000, record.bytes_out)
+        self.assertIsNone(record.cpu_time)
+
+    def test_stat_file(self):
+        array_stat.stat_file(INPUT_FILE)
+        record, = self.records
+        self.assertEqual(1, record.n_processes)
+        self.assertEqual(0, record.status)
+        self.assertEqual(441000 * 8, record.bytes_out)
+
+
+class TestTransformerMetrics(MetricsTestCase):
+
+    def test_build(self):
+        tfm = transform.Transformer()
+        tfm.vol(0.5)
+        tfm.build(INPUT_FILE, OUTPUT_FILE)
+        record, = self.records
+        self.assertEqual(['vol'], record.effects)
+        self.assertEqual(1, record.n_processes)
+        self.assertEqual(
+            ['args', 'probe', 'spawn', 'sox', 'decode'], list(record.phases)
+        )
+
+    def test_build_array(self):
+        tfm = transform.Transformer()
+        input_array = np.zeros((1000, 2), dtype=np.float32)
+        tfm.build(input_array=input_array, sample_rate_in=8000)
+        record, = self.records
+        self.assertEqual(8000, record.bytes_in)
+        self.assertEqual(8000, record.bytes_out)
+
+    def test_build_numpy_engine(self):
+        tfm = transform.Transformer()
+        tfm.vol(0.5)
+        input_array = np.zeros(1000, dtype=np.float32)
+        tfm.build(
+            input_array=input_array, sample_rate_in=8000, engine='numpy'
+        )
+        record, = self.records
+        self.assertEqual(0, record.n_processes)
+        self.assertIn('numpy', record.phases)
+
+    def test_failed_build(self):
+        tfm = transform.Transformer()
+        tfm.effects = ['channels', '-1']
+        with self.assertRaises(SoxError):
+            tfm.build(INPUT_FILE, OUTPUT_FILE)
+        record, = self.records
+        self.assertNotEqual(0, record.status)
+
+
+class TestCombinerMetrics(MetricsTestCase):
+
+    def test_build(self):
+        cbn = combine.Combiner()
+        cbn.build([INPUT_FILE, INPUT_FILE], OUTPUT_FILE, 'concatenate')
+        record, = self.records
+        self.assertEqual(1, record.n_processes)
+        self.assertIn('probe', record.phases)
+
@@ -0,0 +1,233 @@
+import math
+import unittest
+
+from sox import optimize, transform
+from sox.effect import Effect
+
+
+def new_transformer():
+    return transform.Transformer()
+
+
+def optimize_tfm(tfm):
+    return optimize.optimize_effects(tfm.effects, tfm.effects_log)
+
+
+class TestSplitEffects(unittest.TestCase):
+
+    def test_simple(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).trim(0.1, 0.2).reverse()
+        actual = optimize.split_effects(tfm.effects, tfm.effects_log)
+        expected = [
+            ('vol', [('vol', ['0.500000', 'amplitude'])]),
+            ('trim', [('trim', ['0.100000', '0.100000'])]),
+            ('reverse', [('reverse', [])]),
+        ]
+        self.assertEqual(expected, actual)
+
+    def test_compound(self):
+        tfm = new_transformer()
+        tfm.reverse().fade(0, 0.5).fade(0.5).silence(location=-1)
+        actual = optimize.split_effects(tfm.effects, tfm.effects_log)
+        self.assertEqual(
+            ['reverse', 'fade', 'fade', 'silence'],
+            [log_name for log_name, _ in actual]
+        )
+        self.assertEqual(
+            [['reverse'], ['reverse', 'fade', 'reverse'], ['fade'],
+             ['reverse', 'silence', 'reverse']],
+            [[name for name, _ in groups] for _, groups in actual]
+        )
+
+    def test_vad_normalize(self):
+        tfm = new_transformer()
+        tfm.vad(location=-1, normalize=True).norm()
+        actual = optimize.split_effects(tfm.effects, tfm.effects_log)
+        self.assertEqual(
+            [['norm', 'reverse', 'vad', 'reverse'], ['norm']],
+            [[name for name, _ in groups] for _, groups in actual]
+        )
+
+    def test_mismatch(self):
+        with self.assertRaises(ValueError):
+            optimize.split_effects(['vol', '0.5', 'amplitude'], ['gain'])
+        with self.assertRaises(ValueError):
+            optimize.split_effects(['reverse', 'reverse'], ['reverse'])
+
+
+class TestOptimizeEffects(unittest.TestCase):
+
+    def test_no_changes(self):
+        tfm = new_transformer()
+        tfm.highpass(100).vol(2.0).reverb().trim(1.0)
+        effects, effects_log, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+        self.assertEqual(tfm.effects_log, effects_log)
+        self.assertEqual([], changes)
+
+    def test_no_ops(self):
+        tfm = new_transformer()
+        tfm.vol(1.0).gain(0.0, normalize=False).trim(0).pad(0, 0).bass(3.0)
+        effects, effects_log, changes = optimize_tfm(tfm)
+        self.assertEqual(['bass'], effects_log)
+        self.assertEqual(4, len(changes))
+
+    def test_unparsable_no_ops_kept(self):
+        effects = ['trim', '=1:00', 'pad', '0', '1.5@2', 'pad', '0@1']
+        actual = optimize.optimize_effects(
+            effects, ['trim', 'pad', 'pad']
+        )
+        self.assertEqual((effects, ['trim', 'pad', 'pad'], []), actual)
+
+    def test_reverse_pairs(self):
+        tfm = new_transformer()
+        tfm.reverse().reverse().reverse()
+        effects, effects_log, changes = optimize_tfm(tfm)
+        self.assertEqual(['reverse'], effects)
+        self.assertEqual(['removed reverse reverse (no-op)'], changes)
+
+    def test_fade_reverse_kept(self):
+        tfm = new_transformer()
+        tfm.fade(fade_in_len=0, fade_out_len=0.5).reverse()
+        effects, _, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+        self.assertEqual([], changes)
+
+    def test_fuse_gains(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).gain(-6.0, normalize=False).vol(4.0)
+        effects, effects_log, changes = optimize_tfm(tfm)
+        self.assertEqual(['vol'], effects_log)
+        self.assertEqual('vol', effects[0])
+        self.assertEqual('dB', effects[2])
+        self.assertAlmostEqual(
+            20 * math.log10(0.5 * 4.0) - 6.0, float(effects[1]), places=5
+        )
+        self.assertEqual(2, len(changes))
+
+    def test_no_fuse_after_clipping_gain(self):
+        tfm = new_transformer()
+        tfm.vol(4.0).vol(0.5)
+        effects, _, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+        self.assertEqual([], changes)
+
+    def test_negative_gain_not_fused(self):
+        tfm = new_transformer()
+        tfm.set_effect_chain([
+            Effect('vol', {}, ['vol', '0.5', 'amplitude']),
+            Effect('vol', {}, ['vol', '-0.5', 'amplitude']),
+        ])
+        effects, _, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+        self.assertEqual([], changes)
+
+    def test_negative_gain_not_folded(self):
+        tfm = new_transformer()
+        tfm.set_effect_chain([
+            Effect('norm', {}, ['norm', '-3.000000']),
+            Effect('vol', {}, ['vol', '-0.5', 'amplitude']),
+        ])
+        effects, _, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+        self.assertEqual([], changes)
+
+    def test_limiter_not_fused(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).gain(3.0, normalize=False, limiter=True)
+        effects, _, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+
+    def test_gain_before_normalize(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).norm(-3.0)
+        effects, effects_log, changes = optimize_tfm(tfm)
+        self.assertEqual(['norm', '-3.000000'], effects)
+        self.assertEqual(['norm'], effects_log)
+        self.assertEqual(
+            ['removed vol 0.500000 amplitude before norm -3.000000'], changes
+        )
+
+    def test_normalize_twice(self):
+        tfm = new_transformer()
+        tfm.gain(-1.0, normalize=True).norm(-3.0)
+        effects, _, _ = optimize_tfm(tfm)
+        self.assertEqual(['norm', '-3.000000'], effects)
+
+    def test_clipping_normalize_kept(self):
+        tfm = new_transformer()
+        tfm.norm(3.0).norm(-3.0)
+        effects, _, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+
+    def test_gain_after_normalize(self):
+        tfm = new_transformer()
+        tfm.gain(-1.0).vol(0.5).vol(-3.0, gain_type='db')
+        effects, effects_log, changes = optimize_tfm(tfm)
+        self.assertEqual(['gain'], effects_log)
+        self.assertEqual(['gain', '-n'], effects[:2])
+        self.assertAlmostEqual(
+            -1.0 + 20 * math.log10(0.5) - 3.0, float(effects[2]), places=5
+        )
+
+    def test_gain_after_clipping_normalize(self):
+        tfm = new_transformer()
+        tfm.norm(1.0).vol(0.5)
+        effects, _, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+
+    def test_rates(self):
+        tfm = new_transformer()
+        tfm.rate(22050).rate(16000, quality='v')
+        effects, effects_log, _ = optimize_tfm(tfm)
+        self.assertEqual(['rate', '-v', '16000.000000'], effects)
+        self.assertEqual(['rate'], effects_log)
+
+    def test_increasing_rates_kept(self):
+        tfm = new_transformer()
+        tfm.rate(8000).rate(16000)
+        effects, _, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+
+    def test_move_trim(self):
+        tfm = new_transformer()
+        tfm.lowpass(1000).channels(1).vol(2.0).trim(1.0, 2.0)
+        effects, effects_log, changes = optimize_tfm(tfm)
+        self.assertEqual(['lowpass', 'trim', 'channels', 'vol'], effects_log)
+        self.assertEqual(2, len(changes))
+        self.assertTrue(changes[0].startswith('moved trim'))
+
+    def test_trim_not_moved_before_normalize(self):
+        tfm = new_transformer()
+        tfm.gain(normalize=True).trim(1.0)
+        effects, _, changes = optimize_tfm(tfm)
+        self.assertEqual(tfm.effects, effects)
+
+    def test_trim_then_fuse(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).trim(1.0).vol(0.5)
+        effects, effects_log, changes = optimize_tfm(tfm)
+        self.assertEqual(['trim', 'vol'], effects_log)
+        self.assertEqual(['trim', '1.000000'], effects[:2])
+
+
+class TestTransformerOptimize(unittest.TestCase):
+
+    def test_optimize(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).vol(0.5).reverse().reverse()
+        changes = tfm.optimize()
+        self.assertEqual(2, len(changes))
+        self.assertEqual(['vol', '-12.041200', 'dB'], tfm.effects)
+        self.assertEqual(['vol'], tfm.effects_log)
+
+    def test_modified_effects(self):
+        tfm = new_transformer()
+        tfm.vol(0.5)
+        tfm.effects.extend(['reverse', 'reverse'])
+        self.assertEqual([], tfm.optimize())
+        self.assertEqual(
+            ['vol', '0.500000', 'amplitude', 'reverse', 'reverse'],
+            tfm.effects
+        )
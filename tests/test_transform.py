@@ -1,5 +1,11 @@
+import asyncio
 import unittest
 import os
+import pickle
+import random
+import shutil
+import tempfile
+from unittest import mock
 
 from sox import transform, file_info
 from sox.core import SoxError
@@ -80,6 +86,97 @@ class TestTransformDefault(unittest.TestCase):
         actual = self.transformer.effects_log
         self.assertEqual(expected, actual)
 
+    def test_effect_chain(self):
+        expected = []
+        actual = self.transformer.effect_chain
+        self.assertEqual(expected, actual)
+
+
+class TestTransformerEffectChain(unittest.TestCase):
+
+    def test_records(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).fade(0.1, 0.2).pitch(2.0)
+        self.assertEqual(
+            ['vol', 'fade', 'pitch'],
+            [effect.name for effect in tfm.effect_chain]
+        )
+        self.assertEqual(
+            {'gain': 0.5, 'gain_type': 'amplitude', 'limiter_gain': None},
+            tfm.effect_chain[0].params
+        )
+        self.assertEqual(
+            tfm.effects,
+            [arg for effect in tfm.effect_chain for arg in effect.args]
+        )
+
+    def test_params_copied(self):
+        b, a = [1.0, 0.5, 0.25], [1.0, 0.5, 0.25]
+        tfm = new_transformer()
+        tfm.biquad(b, a)
+        b[0] = 2.0
+        self.assertEqual([1.0, 0.5, 0.25], tfm.effect_chain[0].params['b'])
+
+    def test_failed_effect(self):
+        tfm = new_transformer()
+        with self.assertRaises(ValueError):
+            tfm.vol('x')
+        self.assertEqual([], tfm.effect_chain)
+
+    def test_compare(self):
+        tfm1 = transform.Transformer(seed=3)
+        tfm1.chorus().vol(0.5)
+        tfm2 = transform.Transformer(seed=3)
+        tfm2.chorus().vol(0.5)
+        self.assertEqual(tfm1.effect_chain, tfm2.effect_chain)
+        tfm2.vol(0.5)
+        self.assertNotEqual(tfm1.effect_chain, tfm2.effect_chain)
+
+    def test_clear_effects(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).clear_effects()
+        self.assertEqual([], tfm.effect_chain)
+
+    def test_set_effect_chain(self):
+        tfm1 = new_transformer()
+        tfm1.vol(0.5).reverse()
+        tfm2 = new_transformer()
+        tfm2.set_effect_chain(tfm1.effect_chain[::-1])
+        self.assertEqual(
+            ['reverse', 'vol', '0.500000', 'amplitude'], tfm2.effects
+        )
+        self.assertEqual(['reverse', 'vol'], tfm2.effects_log)
+        tfm2.trim(1.0)
+        self.assertEqual(2, len(tfm1.effect_chain))
+
+    def test_set_effect_chain_invalid(self):
+        tfm = new_transformer()
+        with self.assertRaises(ValueError):
+            tfm.set_effect_chain(['vol', '0.5'])
+        with self.assertRaises(ValueError):
+            tfm.set_effect_chain(None)
+
+    def test_optimize(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).reverse().reverse().highpass(100.0)
+        highpass = tfm.effect_chain[-1]
+        tfm.optimize()
+        self.assertEqual(['vol', 'highpass'], tfm.effects_log)
+        self.assertIs(highpass, tfm.effect_chain[-1])
+        self.assertEqual(
+            {'gain': 0.5, 'gain_type': 'amplitude', 'limiter_gain': None},
+            tfm.effect_chain[0].params
+        )
+
+    def test_optimize_modified_effects(self):
+        tfm = new_transformer()
+        tfm.vol(0.5).vol(0.5)
+        tfm.effects[1] = '0.250000'
+        tfm.optimize()
+        self.assertEqual(['vol', '-18.061800', 'dB'], tfm.effects)
+        self.assertEqual(1, len(tfm.effect_chain))
+        self.assertEqual('db', tfm.effect_chain[0].params['gain_type'])
+
 
 class TestTransformSetGlobals(unittest.TestCase):
 
@@ -506,6 +603,914 @@ class TestTransformerBuild(unittest.TestCase):
         self.tfm.set_output_format(file_type='wav', bits=64)
         self.tfm.build(INPUT_FILE, OUTPUT_FILE)
 
+
+class TestTransformerBuildOut(unittest.TestCase):
+    def setUp(self):
+        self.tfm = new_transformer()
+        self.input_array, self.rate = sf.read(INPUT_FILE4, dtype='float32')
+
+    def test_array_input(self):
+        _, expected, _ = self.tfm.build(
+            input_array=self.input_array, sample_rate_in=self.rate
+        )
+        buffer = np.zeros((len(self.input_array) + 100, 2), dtype=np.float32)
+        status, actual, _ = self.tfm.build(
+            input_array=self.input_array, sample_rate_in=self.rate,
+            out=buffer
+        )
+        self.assertEqual(0, status)
+        self.assertTrue(np.shares_memory(buffer, actual))
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_reuse(self):
+        buffer = np.zeros((len(self.input_array), 2), dtype=np.float32)
+        self.tfm.vol(0.5)
+        _, first, _ = self.tfm.build(
+            input_array=self.input_array, sample_rate_in=self.rate,
+            out=buffer
+        )
+        self.assertTrue(np.allclose(self.input_array * 0.5, first))
+        self.tfm.clear_effects()
+        _, second, _ = self.tfm.build(
+            input_array=self.input_array, sample_rate_in=self.rate,
+            out=buffer
+        )
+        self.assertTrue(np.array_equal(self.input_array, second))
+
+    def test_file_input_mono(self):
+        self.tfm.set_output_format(channels=1)
+        _, expected, _ = self.tfm.build(INPUT_FILE)
+        buffer = np.zeros(len(expected), dtype=np.int16)
+        _, actual, _ = self.tfm.build(INPUT_FILE, out=buffer)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_too_short(self):
+        buffer = np.zeros((100, 2), dtype=np.float32)
+        with self.assertRaises(ValueError):
+            self.tfm.build(
+                input_array=self.input_array, sample_rate_in=self.rate,
+                out=buffer
+            )
+
+    def test_invalid_dtype(self):
+        buffer = np.zeros((len(self.input_array), 2), dtype=np.float64)
+        with self.assertRaises(ValueError):
+            self.tfm.build(
+                input_array=self.input_array, sample_rate_in=self.rate,
+                out=buffer
+            )
+
+    def test_invalid_channels(self):
+        buffer = np.zeros(len(self.input_array) * 2, dtype=np.float32)
+        with self.assertRaises(ValueError):
+            self.tfm.build(
+                input_array=self.input_array, sample_rate_in=self.rate,
+                out=buffer
+            )
+
+    def test_not_contiguous(self):
+        buffer = np.zeros((2, len(self.input_array)), dtype=np.float32).T
+        with self.assertRaises(ValueError):
+            self.tfm.build(
+                input_array=self.input_array, sample_rate_in=self.rate,
+                out=buffer
+            )
+
+    def test_not_array(self):
+        with self.assertRaises(TypeError):
+            self.tfm.build(
+                input_array=self.input_array, sample_rate_in=self.rate,
+                out=[0] * 10
+            )
+
+    def test_output_filepath(self):
+        buffer = np.zeros((len(self.input_array), 2), dtype=np.float32)
+        with self.assertRaises(ValueError):
+            self.tfm.build(
+                input_array=self.input_array, sample_rate_in=self.rate,
+                output_filepath=OUTPUT_FILE, out=buffer
+            )
+
+
+def to_int24(array):
+    """Pack the upper 24 bits of an int32 array into INT24 samples."""
+    as_bytes = array.astype('<i4').view(np.uint8).reshape(array.shape + (4,))
+    return np.ascontiguousarray(as_bytes[..., 1:]).view(transform.INT24)[
+        ..., 0
+    ]
+
+
+class TestTransformerBuildDtypes(unittest.TestCase):
+    def setUp(self):
+        self.tfm = new_transformer()
+        self.input_array, self.rate = sf.read(INPUT_FILE4, dtype='int32')
+
+    def assert_round_trip(self, input_array):
+        _, actual, _ = self.tfm.build(
+            input_array=input_array, sample_rate_in=self.rate
+        )
+        self.assertEqual(input_array.dtype, actual.dtype)
+        self.assertEqual(input_array.shape, actual.shape)
+        self.assertTrue(np.array_equal(input_array, actual))
+
+    def test_int32(self):
+        self.assert_round_trip(self.input_array)
+
+    def test_uint8(self):
+        self.assert_round_trip(
+            ((self.input_array >> 24) + 128).astype(np.uint8)
+        )
+
+    def test_uint16(self):
+        self.assert_round_trip(
+            ((self.input_array >> 16) + 32768).astype(np.uint16)
+        )
+
+    def test_int24(self):
+        self.assert_round_trip(to_int24(self.input_array))
+
+    def test_bits32_int_input(self):
+        input_array = (self.input_array >> 16).astype(np.int16)
+        self.tfm.set_output_format(bits=32)
+        _, actual, _ = self.tfm.build(
+            input_array=input_array, sample_rate_in=self.rate
+        )
+        self.assertEqual(np.int32, actual.dtype)
+        self.assertTrue(
+            np.array_equal(input_array.astype(np.int32) << 16, actual)
+        )
+
+    def test_bits24_file_input(self):
+        self.tfm.set_output_format(bits=24)
+        _, actual, _ = self.tfm.build(INPUT_FILE4)
+        self.assertEqual(transform.INT24, actual.dtype)
+        self.assertTrue(np.array_equal(to_int24(self.input_array), actual))
+
+    def test_default_args(self):
+        actual = self.tfm._array_output_args(1, np.dtype(np.uint8), 8000)
+        expected = (
+            ['-t', 'raw', '-r', '8000.000000', '-b', '8', '-c', '1',
+             '-e', 'unsigned-integer'],
+            1, np.dtype(np.uint8)
+        )
+        self.assertEqual(expected, actual)
+
+    def test_int24_args(self):
+        input_format, _, _, encoding = self.tfm._parse_inputs(
+            None, to_int24(self.input_array), self.rate
+        )
+        self.assertEqual(['-t', 's24'], input_format[:2])
+        actual = self.tfm._array_output_args(2, encoding, self.rate)[0]
+        self.assertEqual(['-b', '24'], actual[4:6])
+        self.assertEqual(['-e', 'signed-integer'], actual[-2:])
+
+    def test_bits_args(self):
+        self.tfm.set_output_format(bits=32)
+        actual = self.tfm._array_output_args(2, np.dtype(np.float32), 8000)
+        self.assertEqual(
+            (['-b', '32', '-e', 'floating-point'], 2, np.dtype(np.float32)),
+            actual
+        )
+        actual = self.tfm._array_output_args(2, None, 8000)
+        self.assertEqual(
+            (['-b', '32', '-e', 'signed-integer'], 2, np.dtype(np.int32)),
+            actual
+        )
+        self.assertEqual(['-b', '32'], self.tfm.output_format)
+
+    def test_encoding_args(self):
+        self.tfm.set_output_format(encoding='floating-point')
+        actual = self.tfm._array_output_args(1, np.dtype(np.int16), 8000)
+        self.assertEqual(
+            (['-e', 'floating-point', '-b', '32'], 1, np.dtype(np.float32)),
+            actual
+        )
+
+    def test_invalid_encoding(self):
+        self.tfm.set_output_format(encoding='u-law')
+        with self.assertRaises(ValueError):
+            self.tfm._array_output_args(1, np.dtype(np.int16), 8000)
+
+    def test_invalid_bits(self):
+        self.tfm.set_output_format(bits=12)
+        with self.assertRaises(ValueError):
+            self.tfm._array_output_args(1, np.dtype(np.int16), 8000)
+
+    def test_unsupported_dtype(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build(
+                input_array=np.zeros(10, dtype=np.int64), sample_rate_in=8000
+            )
+
+    def test_non_native_dtype(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build(
+                input_array=np.zeros(10, dtype='>i2' if
+                                     np.little_endian else '<i2'),
+                sample_rate_in=8000
+            )
+
+
+class TestTransformerBuildMemmap(unittest.TestCase):
+    def setUp(self):
+        self.tfm = new_transformer()
+        self.memmap_file = relpath('data/output.raw')
+
+    def tearDown(self):
+        if os.path.exists(self.memmap_file):
+            os.remove(self.memmap_file)
+
+    def test_file_input(self):
+        _, expected, _ = self.tfm.build(INPUT_FILE)
+        status, actual, _ = self.tfm.build(
+            INPUT_FILE, memmap_filepath=self.memmap_file
+        )
+        self.assertEqual(0, status)
+        self.assertIsInstance(actual, np.memmap)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_array_input(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='float32')
+        self.tfm.vol(0.5)
+        _, expected, _ = self.tfm.build(
+            input_array=input_array, sample_rate_in=rate
+        )
+        _, actual, _ = self.tfm.build(
+            input_array=input_array, sample_rate_in=rate,
+            memmap_filepath=self.memmap_file
+        )
+        self.assertEqual((len(input_array), 2), actual.shape)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_with_out(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build(
+                INPUT_FILE, memmap_filepath=self.memmap_file,
+                out=np.zeros(10, dtype=np.int16)
+            )
+
+    def test_with_output_filepath(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build(
+                INPUT_FILE, OUTPUT_FILE, memmap_filepath=self.memmap_file
+            )
+
+    def test_same_as_input(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build(INPUT_FILE, memmap_filepath=INPUT_FILE)
+
+
+class TestOpenMemmap(unittest.TestCase):
+    def setUp(self):
+        self.memmap_file = relpath('data/output.raw')
+
+    def tearDown(self):
+        if os.path.exists(self.memmap_file):
+            os.remove(self.memmap_file)
+
+    def test_stereo(self):
+        expected = np.arange(200, dtype=np.int16).reshape(100, 2)
+        expected.tofile(self.memmap_file)
+        actual = transform._open_memmap(self.memmap_file, 2, np.int16)
+        self.assertIsInstance(actual, np.memmap)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_mono(self):
+        expected = np.linspace(-1, 1, 100, dtype=np.float32)
+        expected.tofile(self.memmap_file)
+        actual = transform._open_memmap(self.memmap_file, 1, np.float32)
+        self.assertEqual((100, ), actual.shape)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_empty(self):
+        open(self.memmap_file, 'wb').close()
+        actual = transform._open_memmap(self.memmap_file, 2, np.float64)
+        self.assertEqual((0, 2), actual.shape)
+
+
+class TestTransformerBuildEngine(unittest.TestCase):
+    def setUp(self):
+        self.tfm = new_transformer()
+        self.input_array, self.rate = sf.read(INPUT_FILE4, dtype='float32')
+
+    def test_numpy(self):
+        self.tfm.vol(0.5).reverse()
+        status, actual, err = self.tfm.build(
+            input_array=self.input_array, sample_rate_in=self.rate,
+            engine='numpy'
+        )
+        self.assertEqual(0, status)
+        self.assertEqual('', err)
+        self.assertTrue(
+            np.allclose(self.input_array[::-1] * 0.5, actual, atol=1e-6)
+        )
+
+    def test_auto_fallback(self):
+        self.tfm.vol(0.5).tempo(1.1)
+        _, expected, _ = self.tfm.build(
+            input_array=self.input_array, sample_rate_in=self.rate
+        )
+        _, actual, _ = self.tfm.build(
+            input_array=self.input_array, sample_rate_in=self.rate,
+            engine='auto'
+        )
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_invalid_engine(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build(INPUT_FILE, engine='python')
+
+    def test_unsupported(self):
+        unsupported = transform._numpy_engine_unsupported
+        args = (['-D', '-V2'], [], self.input_array, True, None, None, None)
+        self.assertIsNone(unsupported(*args))
+        self.assertIsNotNone(unsupported(args[0], args[1], None, *args[3:]))
+        self.assertIsNotNone(unsupported(*args[:3], False, *args[4:]))
+        self.assertIsNotNone(unsupported(args[0], ['-c', '1'], *args[2:]))
+        self.assertIsNotNone(unsupported(*args[:4], ['-n'], *args[5:]))
+        self.assertIsNotNone(unsupported(*args[:5], self.input_array, None))
+        self.assertIsNotNone(unsupported(*args[:6], OUTPUT_FILE))
+        self.assertIsNotNone(unsupported(['-D', '-G'], *args[1:]))
+        self.assertIsNone(unsupported(['-V2'], *args[1:]))
+        self.assertIsNotNone(unsupported(
+            ['-V2'], [], self.input_array.astype(np.int16), *args[3:]
+        ))
+
+
+class TestTransformerStream(unittest.TestCase):
+    def setUp(self):
+        self.tfm = new_transformer()
+
+    def test_file_input(self):
+        self.tfm.trim(0, 1)
+        _, expected, _ = self.tfm.build(INPUT_FILE)
+        blocks = list(self.tfm.stream(INPUT_FILE, blocksize=1000))
+        self.assertEqual(1000, len(blocks[0]))
+        self.assertTrue(np.array_equal(expected, np.concatenate(blocks)))
+
+    def test_array_input(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='float32')
+        self.tfm.vol(0.5)
+        _, expected, _ = self.tfm.build(
+            input_array=input_array, sample_rate_in=rate
+        )
+        blocks = list(self.tfm.stream(
+            input_array=input_array, sample_rate_in=rate, blocksize=4096
+        ))
+        self.assertEqual((4096, 2), blocks[0].shape)
+        self.assertEqual(np.float32, blocks[0].dtype)
+        self.assertTrue(np.array_equal(expected, np.concatenate(blocks)))
+
+    def test_close_early(self):
+        blocks = self.tfm.stream(INPUT_FILE, blocksize=100)
+        self.assertEqual(100, len(next(blocks)))
+        blocks.close()
+
+    def test_failed_sox(self):
+        self.tfm.effects = ['channels', '-1']
+        with self.assertRaises(SoxError):
+            list(self.tfm.stream(INPUT_FILE))
+
+    def test_invalid_blocksize(self):
+        with self.assertRaises(ValueError):
+            list(self.tfm.stream(INPUT_FILE, blocksize=0))
+
+    def test_no_input(self):
+        with self.assertRaises(ValueError):
+            list(self.tfm.stream())
+
+    def test_extra_args_invalid(self):
+        with self.assertRaises(ValueError):
+            list(self.tfm.stream(INPUT_FILE, extra_args=0))
+
+    def test_block_input(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='float32')
+        self.tfm.vol(0.5)
+        _, expected, _ = self.tfm.build(
+            input_array=input_array, sample_rate_in=rate
+        )
+        blocks = list(self.tfm.stream(
+            input_array=iter(np.array_split(input_array, 10)),
+            sample_rate_in=rate, blocksize=4096
+        ))
+        self.assertTrue(np.array_equal(expected, np.concatenate(blocks)))
+
+
+class TestTransformerBuildBlocks(unittest.TestCase):
+    def setUp(self):
+        self.tfm = new_transformer()
+        self.tfm.vol(0.5)
+        self.input_array, self.rate = sf.read(INPUT_FILE4, dtype='float32')
+        _, self.expected, _ = self.tfm.build(
+            input_array=self.input_array, sample_rate_in=self.rate
+        )
+
+    def tearDown(self):
+        transform.clear_build_cache(disable=True)
+        if os.path.exists(OUTPUT_FILE):
+            os.remove(OUTPUT_FILE)
+
+    def blocks(self, n_blocks=10):
+        for block in np.array_split(self.input_array, n_blocks):
+            yield block
+
+    def test_array_out(self):
+        _, actual, _ = self.tfm.build(
+            input_array=self.blocks(), sample_rate_in=self.rate
+        )
+        self.assertTrue(np.array_equal(self.expected, actual))
+
+    def test_file_out(self):
+        self.tfm.build(
+            input_array=self.blocks(), sample_rate_in=self.rate,
+            output_filepath=OUTPUT_FILE
+        )
+        actual, _ = sf.read(OUTPUT_FILE, dtype='float32')
+        self.assertTrue(np.allclose(self.expected, actual, atol=1e-4))
+
+    def test_out(self):
+        buffer = np.zeros((len(self.input_array) + 10, 2), dtype=np.float32)
+        _, actual, _ = self.tfm.build(
+            input_array=self.blocks(), sample_rate_in=self.rate, out=buffer
+        )
+        self.assertTrue(np.array_equal(self.expected, actual))
+
+    def test_mono_blocks(self):
+        blocks = (block[:, 0].copy() for block in self.blocks())
+        _, actual, _ = self.tfm.build(
+            input_array=blocks, sample_rate_in=self.rate
+        )
+        self.assertTrue(np.array_equal(self.expected[:, 0], actual))
+
+    def test_numpy_engine_falls_back(self):
+        _, actual, _ = self.tfm.build(
+            input_array=self.blocks(), sample_rate_in=self.rate,
+            engine='auto'
+        )
+        self.assertTrue(np.array_equal(self.expected, actual))
+
+    def test_not_cached(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            transform.set_build_cache(cache_dir)
+            self.tfm.build(input_array=self.blocks(), sample_rate_in=self.rate)
+            self.assertEqual([], os.listdir(cache_dir))
+        finally:
+            transform.clear_build_cache(disable=True)
+            shutil.rmtree(cache_dir)
+
+    def test_iterator_error(self):
+        def blocks():
+            yield self.input_array[:1000]
+            raise IOError("connection lost")
+        with self.assertRaises(IOError):
+            self.tfm.build(input_array=blocks(), sample_rate_in=self.rate)
+
+    def test_mismatched_blocks(self):
+        blocks = iter([self.input_array, self.input_array[:, :1]])
+        with self.assertRaises(ValueError):
+            self.tfm.build(input_array=blocks, sample_rate_in=self.rate)
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build(input_array=iter([]), sample_rate_in=self.rate)
+
+    def test_missing_sr(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build(input_array=self.blocks())
+
+    def test_list_invalid(self):
+        with self.assertRaises(TypeError):
+            self.tfm.build(
+                input_array=list(self.blocks()), sample_rate_in=self.rate
+            )
+
+    def test_abuild_invalid(self):
+        with self.assertRaises(TypeError):
+            asyncio.run(self.tfm.abuild(
+                input_array=self.blocks(), sample_rate_in=self.rate
+            ))
+
+
+class TestBuildCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = transform._BuildCache(self.cache_dir)
+
+    def tearDown(self):
+        transform.clear_build_cache(disable=True)
+        shutil.rmtree(self.cache_dir)
+        if os.path.exists(OUTPUT_FILE):
+            os.remove(OUTPUT_FILE)
+
+    def test_key_file(self):
+        key = self.cache.key(INPUT_FILE, None, None, [['vol', '0.5']])
+        self.assertEqual(
+            key, self.cache.key(INPUT_FILE, None, None, [['vol', '0.5']])
+        )
+        self.assertNotEqual(
+            key, self.cache.key(INPUT_FILE, None, None, [['vol', '0.6']])
+        )
+        self.assertNotEqual(
+            key, self.cache.key(INPUT_FILE4, None, None, [['vol', '0.5']])
+        )
+
+    def test_key_array(self):
+        input_array = np.zeros((100, 2))
+        key = self.cache.key(None, input_array, 8000, [])
+        self.assertEqual(
+            key, self.cache.key(None, input_array.copy(), 8000, [])
+        )
+        self.assertNotEqual(key, self.cache.key(None, input_array, 16000, []))
+        self.assertNotEqual(
+            key, self.cache.key(None, input_array.reshape(200, 1), 8000, [])
+        )
+        self.assertNotEqual(
+            key, self.cache.key(None, np.ones((100, 2)), 8000, [])
+        )
+
+    def test_store_load_array(self):
+        expected = np.arange(200, dtype=np.int16).reshape(100, 2)
+        self.assertIsNone(self.cache.load('a'))
+        self.cache.store('a', array=expected)
+        self.assertTrue(np.array_equal(expected, self.cache.load('a')))
+
+    def test_store_load_file(self):
+        self.assertIsNone(self.cache.load('a', OUTPUT_FILE))
+        self.cache.store('a', filepath=INPUT_FILE)
+        self.assertTrue(self.cache.load('a', OUTPUT_FILE))
+        with open(INPUT_FILE, 'rb') as expected:
+            with open(OUTPUT_FILE, 'rb') as actual:
+                self.assertEqual(expected.read(), actual.read())
+
+    def test_link(self):
+        self.cache.link = True
+        self.cache.store('a', filepath=INPUT_FILE4)
+        self.assertTrue(self.cache.load('a', OUTPUT_FILE))
+        self.assertTrue(self.cache.load('a', OUTPUT_FILE))
+        self.assertEqual(
+            os.path.getsize(INPUT_FILE4), os.path.getsize(OUTPUT_FILE)
+        )
+
+    def test_evict(self):
+        self.cache.max_size = 5000
+        for i in range(2):
+            self.cache.store(str(i), array=np.zeros(1000, dtype=np.int16))
+            os.utime(
+                os.path.join(self.cache_dir, '{}.npy'.format(i)), (i, i)
+            )
+        self.assertIsNotNone(self.cache.load('0'))
+        self.cache.store('2', array=np.zeros(1000, dtype=np.int16))
+        self.assertEqual(
+            ['0.npy', '2.npy'], sorted(os.listdir(self.cache_dir))
+        )
+
+    def test_clear(self):
+        self.cache.store('a', array=np.zeros(10))
+        self.cache.clear()
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+    def test_is_cacheable(self):
+        self.assertTrue(transform._is_cacheable(
+            ['-D'], True, ['vol'], None, OUTPUT_FILE, None, None, False
+        ))
+        self.assertFalse(transform._is_cacheable(
+            [], True, ['vol'], None, OUTPUT_FILE, None, None, False
+        ))
+        self.assertFalse(transform._is_cacheable(
+            ['-D'], False, ['vol'], None, OUTPUT_FILE, None, None, False
+        ))
+        self.assertFalse(transform._is_cacheable(
+            ['-D'], True, ['vol'], None, '-n', None, None, False
+        ))
+        self.assertFalse(transform._is_cacheable(
+            ['-D'], True, ['vol'], ['noiseprof', 'x.prof'], '-', None, None,
+            False
+        ))
+        self.assertFalse(transform._is_cacheable(
+            ['-D'], True, ['noisered'], None, '-', None, None, False
+        ))
+        self.assertFalse(transform._is_cacheable(
+            ['-D'], True, ['vol'], None, '-', np.zeros(10), None, False
+        ))
+        self.assertFalse(transform._is_cacheable(
+            ['-D'], True, ['vol'], None, OUTPUT_FILE, None, None, True
+        ))
+
+    def test_index(self):
+        self.cache.store('a', array=np.zeros(1000, dtype=np.int16))
+        self.cache.store('b', array=np.zeros(10, dtype=np.int16))
+        self.assertEqual(
+            sum(os.path.getsize(os.path.join(self.cache_dir, name))
+                for name in os.listdir(self.cache_dir)),
+            self.cache._size
+        )
+        self.cache.load('a')
+        self.assertEqual(
+            ['b.npy', 'a.npy'],
+            [os.path.basename(path) for path in self.cache._index]
+        )
+
+    def test_index_existing_entries(self):
+        self.cache.store('a', array=np.zeros(1000, dtype=np.int16))
+        cache = transform._BuildCache(self.cache_dir, max_size=5000)
+        cache.store('b', array=np.zeros(1000, dtype=np.int16))
+        self.assertEqual(self.cache._size * 2, cache._size)
+        cache.store('c', array=np.zeros(1000, dtype=np.int16))
+        self.assertEqual(
+            ['b.npy', 'c.npy'], sorted(os.listdir(self.cache_dir))
+        )
+
+    def test_set_build_cache(self):
+        transform.set_build_cache(self.cache_dir, max_size=100)
+        self.assertEqual(self.cache_dir, transform._BUILD_CACHE.cache_dir)
+        self.assertEqual(100, transform._BUILD_CACHE.max_size)
+        transform.clear_build_cache(disable=True)
+        self.assertIsNone(transform._BUILD_CACHE)
+
+    def test_set_build_cache_invalid(self):
+        with self.assertRaises(ValueError):
+            transform.set_build_cache(0)
+        with self.assertRaises(ValueError):
+            transform.set_build_cache(self.cache_dir, max_size=0)
+        with self.assertRaises(ValueError):
+            transform.set_build_cache(self.cache_dir, link=1)
+
+    def test_build_file(self):
+        transform.set_build_cache(self.cache_dir)
+        tfm = transform.Transformer(seed=0)
+        tfm.vol(0.5)
+        self.assertTrue(tfm.build(INPUT_FILE, OUTPUT_FILE))
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+        expected = sf.read(OUTPUT_FILE)[0]
+        os.remove(OUTPUT_FILE)
+        self.assertTrue(tfm.build(INPUT_FILE, OUTPUT_FILE))
+        self.assertTrue(np.array_equal(expected, sf.read(OUTPUT_FILE)[0]))
+
+    def test_build_array(self):
+        transform.set_build_cache(self.cache_dir)
+        tfm = transform.Transformer(seed=0)
+        tfm.vol(0.5)
+        _, expected, _ = tfm.build(INPUT_FILE)
+        status, actual, err = tfm.build(INPUT_FILE)
+        self.assertEqual(0, status)
+        self.assertEqual('', err)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_build_not_reproducible(self):
+        transform.set_build_cache(self.cache_dir)
+        tfm = new_transformer()
+        tfm.vol(0.5)
+        self.assertTrue(tfm.build(INPUT_FILE, OUTPUT_FILE))
+        tfm = transform.Transformer(seed=0)
+        tfm.set_globals(dither=True)
+        tfm.vol(0.5)
+        self.assertTrue(tfm.build(INPUT_FILE, OUTPUT_FILE))
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+
+class TestTransformerBuildMany(unittest.TestCase):
+    def setUp(self):
+        self.tfm = new_transformer()
+
+    def test_valid(self):
+        results = self.tfm.build_many(
+            [INPUT_FILE, SPACEY_FILE], [OUTPUT_FILE, OUTPUT_FILE_ALT],
+            n_jobs=2
+        )
+        self.assertEqual([True, True], [r['status'] for r in results])
+        self.assertEqual([None, None], [r['error'] for r in results])
+
+    def test_default_n_jobs(self):
+        with mock.patch.object(
+                transform, 'ThreadPoolExecutor',
+                wraps=transform.ThreadPoolExecutor) as executor:
+            self.tfm.build_many(['blah/asdf.wav'], [OUTPUT_FILE])
+        executor.assert_called_once_with(max_workers=os.cpu_count() or 1)
+
+    def test_timings(self):
+        results = self.tfm.build_many(
+            [INPUT_FILE, 'blah/asdf.wav'], [OUTPUT_FILE, OUTPUT_FILE_ALT]
+        )
+        for result in results:
+            self.assertLessEqual(result['start_time'], result['end_time'])
+            self.assertAlmostEqual(
+                result['end_time'] - result['start_time'], result['elapsed']
+            )
+
+    def test_collects_errors(self):
+        results = self.tfm.build_many(
+            ['blah/asdf.wav', INPUT_FILE], [OUTPUT_FILE, INPUT_FILE]
+        )
+        self.assertEqual([False, False], [r['status'] for r in results])
+        self.assertIsInstance(results[0]['error'], IOError)
+        self.assertIsInstance(results[1]['error'], ValueError)
+        self.assertEqual('blah/asdf.wav', results[0]['input_filepath'])
+        self.assertEqual(INPUT_FILE, results[1]['output_filepath'])
+
+    def test_failed_sox(self):
+        self.tfm.effects = ['channels', '-1']
+        results = self.tfm.build_many([INPUT_FILE], [OUTPUT_FILE])
+        self.assertFalse(results[0]['status'])
+        self.assertIsInstance(results[0]['error'], SoxError)
+
+    def test_empty(self):
+        self.assertEqual([], self.tfm.build_many([], []))
+
+    def test_invalid_input_list(self):
+        with self.assertRaises(TypeError):
+            self.tfm.build_many(INPUT_FILE, [OUTPUT_FILE])
+
+    def test_invalid_output_list(self):
+        with self.assertRaises(TypeError):
+            self.tfm.build_many([INPUT_FILE], OUTPUT_FILE)
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build_many([INPUT_FILE], [OUTPUT_FILE, OUTPUT_FILE_ALT])
+
+    def test_invalid_n_jobs(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build_many([INPUT_FILE], [OUTPUT_FILE], n_jobs=0)
+
+
+class TestTransformerAbuild(unittest.TestCase):
+    def setUp(self):
+        self.tfm = new_transformer()
+
+    def test_valid(self):
+        status = asyncio.run(self.tfm.abuild(INPUT_FILE, OUTPUT_FILE))
+        self.assertTrue(status)
+
+    def test_array_output(self):
+        expected = self.tfm.build(INPUT_FILE)[1]
+        status, actual, _ = asyncio.run(self.tfm.abuild(INPUT_FILE))
+        self.assertEqual(0, status)
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_array_input(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='float32')
+        self.tfm.vol(0.5)
+        expected = self.tfm.build(
+            input_array=input_array, sample_rate_in=rate
+        )[1]
+        _, actual, _ = asyncio.run(self.tfm.abuild(
+            input_array=input_array, sample_rate_in=rate
+        ))
+        self.assertTrue(np.array_equal(expected, actual))
+
+    def test_gather(self):
+        async def run():
+            return await asyncio.gather(
+                self.tfm.abuild(INPUT_FILE, OUTPUT_FILE),
+                self.tfm.abuild(SPACEY_FILE, OUTPUT_FILE_ALT)
+            )
+
+        self.assertEqual([True, True], asyncio.run(run()))
+
+    def test_invalid(self):
+        with self.assertRaises(IOError):
+            asyncio.run(self.tfm.abuild('blah/asdf.wav', OUTPUT_FILE))
+
+    def test_failed_sox(self):
+        self.tfm.effects = ['channels', '-1']
+        with self.assertRaises(SoxError):
+            asyncio.run(self.tfm.abuild(INPUT_FILE, OUTPUT_FILE))
+
+
+class TestTransformerBuildBatch(unittest.TestCase):
+    def setUp(self):
+        self.tfm = new_transformer()
+        rng = np.random.RandomState(0)
+        self.arrays = [
+            rng.uniform(-0.5, 0.5, n).astype(np.float32)
+            for n in [8000, 6000, 8000, 9000]
+        ]
+
+    def separate_builds(self, arrays):
+        return [
+            self.tfm.build(input_array=array, sample_rate_in=8000)[1]
+            for array in arrays
+        ]
+
+    def test_channels(self):
+        self.tfm.vol(0.5)
+        self.tfm.highpass(100)
+        expected = self.separate_builds(self.arrays)
+        actual = self.tfm.build_batch(self.arrays, 8000, mode='channels')
+        self.assertEqual(len(expected), len(actual))
+        for expected_array, actual_array in zip(expected, actual):
+            self.assertEqual(expected_array.shape, actual_array.shape)
+            self.assertTrue(np.allclose(expected_array, actual_array))
+
+    def test_mono_column_shape(self):
+        self.tfm.vol(0.5)
+        arrays = [array.reshape(-1, 1) for array in self.arrays]
+        expected = self.separate_builds(arrays)
+        for mode in ['channels', 'concatenate']:
+            actual = self.tfm.build_batch(arrays, 8000, mode=mode)
+            for expected_array, actual_array in zip(expected, actual):
+                self.assertEqual(expected_array.shape, actual_array.shape)
+
+    def test_channels_max_channels(self):
+        self.tfm.vol(0.5)
+        arrays = [np.stack([array, array], axis=1) for array in self.arrays]
+        expected = self.separate_builds(arrays)
+        actual = self.tfm.build_batch(
+            arrays, 8000, mode='channels', max_channels=3
+        )
+        for expected_array, actual_array in zip(expected, actual):
+            self.assertEqual((len(expected_array), 2), actual_array.shape)
+            self.assertTrue(np.allclose(expected_array, actual_array))
+
+    def test_concatenate(self):
+        self.tfm.vol(0.5)
+        self.tfm.remix({1: [1], 2: [1]})
+        expected = self.separate_builds(self.arrays)
+        actual = self.tfm.build_batch(self.arrays, 8000, mode='concatenate')
+        for expected_array, actual_array in zip(expected, actual):
+            self.assertEqual(expected_array.shape, actual_array.shape)
+            self.assertTrue(np.allclose(expected_array, actual_array))
+
+    def test_concatenate_filter(self):
+        self.tfm.lowpass(1000)
+        expected = self.separate_builds(self.arrays)
+        actual = self.tfm.build_batch(
+            self.arrays, 8000, mode='concatenate', guard=0.5
+        )
+        for expected_array, actual_array in zip(expected, actual):
+            self.assertTrue(
+                np.allclose(expected_array, actual_array, atol=1e-4)
+            )
+
+    def test_rate_change(self):
+        self.tfm.set_output_format(rate=16000)
+        actual = self.tfm.build_batch(self.arrays, 8000)
+        self.assertEqual(
+            [2 * len(array) for array in self.arrays],
+            [len(array) for array in actual]
+        )
+
+    def test_auto(self):
+        self.tfm.vol(0.5)
+        self.assertEqual(['channels', 'concatenate'], self.tfm._batch_modes())
+        self.tfm.swap()
+        self.assertEqual(['concatenate'], self.tfm._batch_modes())
+
+    def test_auto_fallback(self):
+        self.tfm.reverse()
+        self.assertEqual([], self.tfm._batch_modes())
+        expected = self.separate_builds(self.arrays)
+        actual = self.tfm.build_batch(self.arrays, 8000)
+        for expected_array, actual_array in zip(expected, actual):
+            self.assertTrue(np.array_equal(expected_array, actual_array))
+
+    def test_normalize_not_batched(self):
+        self.tfm.gain(-3.0)
+        self.assertEqual([], self.tfm._batch_modes())
+        with self.assertRaises(ValueError):
+            self.tfm.build_batch(self.arrays, 8000, mode='concatenate')
+
+    def test_output_channels_not_stacked(self):
+        self.tfm.set_output_format(channels=2)
+        self.assertEqual(['concatenate'], self.tfm._batch_modes())
+
+    def test_edited_effects_not_batched(self):
+        self.tfm.effects = ['vol', '0.5']
+        self.assertEqual([], self.tfm._batch_modes())
+
+    def test_empty(self):
+        self.assertEqual([], self.tfm.build_batch([], 8000))
+
+    def test_invalid_arrays(self):
+        with self.assertRaises(TypeError):
+            self.tfm.build_batch(self.arrays[0], 8000)
+        with self.assertRaises(TypeError):
+            self.tfm.build_batch([[0.0, 1.0]], 8000)
+
+    def test_mismatched_channels(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build_batch(
+                [self.arrays[0], np.zeros((10, 2), dtype=np.float32)], 8000
+            )
+
+    def test_mismatched_dtype(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build_batch(
+                [self.arrays[0], np.zeros(10, dtype=np.float64)], 8000
+            )
+
+    def test_invalid_args(self):
+        with self.assertRaises(ValueError):
+            self.tfm.build_batch(self.arrays, 0)
+        with self.assertRaises(ValueError):
+            self.tfm.build_batch(self.arrays, 8000, mode='stack')
+        with self.assertRaises(ValueError):
+            self.tfm.build_batch(self.arrays, 8000, guard=-1)
+        with self.assertRaises(ValueError):
+            self.tfm.build_batch(self.arrays, 8000, max_channels=0)
+
+
 class TestTransformerClearEffects(unittest.TestCase):
 
     def test_clear(self):
@@ -968,6 +1973,47 @@ class TestTransformerChorus(unittest.TestCase):
 
         tfm_assert_array_to_file_output(INPUT_FILE, OUTPUT_FILE, tfm)
 
+    def test_transformer_seed(self):
+        tfm1 = transform.Transformer(seed=42)
+        tfm1.chorus().chorus()
+        tfm2 = transform.Transformer(seed=42)
+        tfm2.chorus().chorus()
+        self.assertEqual(tfm1.effects, tfm2.effects)
+
+        tfm3 = transform.Transformer(seed=43)
+        tfm3.chorus().chorus()
+        self.assertNotEqual(tfm1.effects, tfm3.effects)
+
+    def test_effect_seed(self):
+        tfm1 = new_transformer()
+        tfm1.chorus(seed=1)
+        tfm2 = transform.Transformer(seed=7)
+        tfm2.chorus(seed=1)
+        self.assertEqual(tfm1.effects, tfm2.effects)
+
+    def test_effect_seed_does_not_advance_rng(self):
+        tfm1 = transform.Transformer(seed=42)
+        tfm1.chorus(seed=1)
+        tfm1.clear_effects()
+        tfm1.chorus()
+        tfm2 = transform.Transformer(seed=42)
+        tfm2.chorus()
+        self.assertEqual(tfm1.effects, tfm2.effects)
+
+    def test_global_seed(self):
+        random.seed(5)
+        tfm1 = new_transformer()
+        tfm1.chorus()
+        random.seed(5)
+        tfm2 = new_transformer()
+        tfm2.chorus()
+        self.assertEqual(tfm1.effects, tfm2.effects)
+
+    def test_invalid_seed(self):
+        tfm = new_transformer()
+        with self.assertRaises(ValueError):
+            tfm.chorus(seed='a')
+
     def test_explicit_args(self):
         tfm = new_transformer()
         tfm.chorus(
@@ -2041,6 +3087,11 @@ class TestTransformerFir(unittest.TestCase):
 
         tfm_assert_array_to_file_output(INPUT_FILE, OUTPUT_FILE, tfm)
 
+    def test_array(self):
+        tfm = new_transformer()
+        tfm.fir(np.array([0.5, 0.25]))
+        self.assertEqual(['fir', '0.500000', '0.250000'], tfm.effects)
+
     def test_invalid_coeffs_nonlist(self):
         tfm = new_transformer()
         with self.assertRaises(ValueError):
@@ -2052,6 +3103,82 @@ class TestTransformerFir(unittest.TestCase):
             tfm.fir(['a', 'b', 'c'])
 
 
+class TestTransformerFirFile(unittest.TestCase):
+
+    def test_precision(self):
+        coefficients = [0.1234567891, -0.5, 1e-9]
+        tfm = new_transformer()
+        tfm.fir(coefficients)
+        self.assertEqual(2, len(tfm.effects))
+        self.assertEqual('fir', tfm.effects[0])
+        self.assertFalse(os.path.isabs(tfm.effects[1]))
+        self.assertEqual(coefficients, tfm.effects[1].coefficients)
+
+    def test_long(self):
+        coefficients = np.hanning(transform.FIR_MAX_ARGS + 1)
+        tfm = new_transformer()
+        tfm.fir(coefficients)
+        self.assertEqual(2, len(tfm.effects))
+        self.assertTrue(np.array_equal(
+            coefficients, tfm.effects[1].coefficients
+        ))
+
+    def test_same_name(self):
+        tfm = new_transformer()
+        tfm.fir([0.1234567891]).fir([0.1234567891]).fir([0.1234567892])
+        self.assertEqual(tfm.effects[1], tfm.effects[3])
+        self.assertNotEqual(tfm.effects[1], tfm.effects[5])
+
+    def test_pickle(self):
+        tfm = new_transformer()
+        tfm.fir([0.1234567891, -0.5])
+        copied = pickle.loads(pickle.dumps(tfm))
+        self.assertEqual(tfm.effects, copied.effects)
+        self.assertEqual(
+            [0.1234567891, -0.5], copied.effects[1].coefficients
+        )
+
+    def test_file_removed(self):
+        coefficients = [0.1234567891, -0.5, 1e-9]
+        tfm = new_transformer()
+        tfm.fir(coefficients)
+        fir_files = []
+
+        def fake_sox(args, src_array=None, decode_out_with_utf=True):
+            path = args[args.index('fir') + 1]
+            fir_files.append(path)
+            self.assertEqual(coefficients, list(np.loadtxt(path)))
+            return 0, '', ''
+
+        with mock.patch.object(transform, 'sox', fake_sox):
+            tfm.build(INPUT_FILE, OUTPUT_FILE)
+        self.assertFalse(os.path.exists(fir_files[0]))
+
+    def test_file_removed_on_error(self):
+        tfm = new_transformer()
+        tfm.fir([0.1234567891])
+        fir_files = []
+
+        def fake_sox(args, src_array=None, decode_out_with_utf=True):
+            fir_files.append(args[args.index('fir') + 1])
+            return 1, '', 'error'
+
+        with mock.patch.object(transform, 'sox', fake_sox):
+            with self.assertRaises(SoxError):
+                tfm.build(INPUT_FILE, OUTPUT_FILE)
+        self.assertFalse(os.path.exists(fir_files[0]))
+
+    def test_build(self):
+        input_array, rate = sf.read(INPUT_FILE4, dtype='float32')
+        tfm = new_transformer()
+        tfm.fir(np.hanning(2049) / 1024.0)
+        status, output_array, _ = tfm.build(
+            input_array=input_array, sample_rate_in=rate
+        )
+        self.assertEqual(0, status)
+        self.assertEqual(input_array.shape, output_array.shape)
+
+
 class TestTransformerFlanger(unittest.TestCase):
 
     def test_default(self):